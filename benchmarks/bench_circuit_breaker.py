@@ -0,0 +1,132 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Replays cron cycles with one powered off sensor board, with and without circuit breakers:
+    python benchmarks/bench_circuit_breaker.py
+
+The dead board is a socket which accepts connections and never answers, so every call
+waits for the read timeout like a hung ESP board. A fake clock advances one cron interval
+per cycle, so that backoff and probes follow the configured times.
+"""
+import os
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import FixtureServer, load_config, make_service_routes, use_fixture_server
+
+import circuit_breaker
+from circuit_breaker import CircuitBreakers, BREAKER_CLOSED, BREAKER_OPEN
+from data_loader import fetch_services
+from services import sensor_service
+from metrics import get_metrics
+
+CYCLES = 24
+CYCLE = 300
+SENSOR_KEYS = ['wifiiot_sensors_1', 'wifiiot_sensors_2']
+# Shorter than configured timeouts, so that the benchmark runs in seconds
+SENSOR_TIMEOUT = 1000
+PROBE_TIMEOUT = 200
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self) -> float:
+        return self.now
+
+def run(config, breakers: CircuitBreakers, clock: FakeClock, dead_endpoint: str):
+    circuit_breaker._breakers = breakers
+    rows = []
+    for cycle in range(CYCLES):
+        state = breakers.get_state(dead_endpoint)
+        start = time.perf_counter()
+        results = fetch_services(config, SENSOR_KEYS)
+        elapsed = time.perf_counter() - start
+        assert results['wifiiot_sensors_2'], "Live sensor was not fetched"
+        assert results['wifiiot_sensors_1'] is None
+        rows.append((cycle, state, elapsed))
+        clock.now += CYCLE
+    return rows
+
+def check_raising_probe(config, live_endpoint: str):
+    """Checks that a probe failing with an error other than a request error ends,
+    so that the endpoint is probed again after its backoff"""
+    clock = FakeClock()
+    breakers = CircuitBreakers(None, failure_threshold=1, backoff=CYCLE * 1000, clock=clock)
+    circuit_breaker._breakers = breakers
+    breakers.record_failure(live_endpoint)
+    clock.now += CYCLE
+
+    parse_sensor_text = sensor_service.parse_sensor_text
+    def fail_parsing(text):
+        raise ValueError("malformed sensor text")
+    sensor_service.parse_sensor_text = fail_parsing
+    try:
+        assert sensor_service.fetch_sensor_data(config, 'wifiiot_sensors_2') is None
+    finally:
+        sensor_service.parse_sensor_text = parse_sensor_text
+    assert live_endpoint not in breakers.probing, "Raising probe was not ended"
+    assert breakers.get_state(live_endpoint) == BREAKER_OPEN, "Raising probe was not counted as failure"
+
+    clock.now += 2 * CYCLE
+    assert sensor_service.fetch_sensor_data(config, 'wifiiot_sensors_2'), "Endpoint was not probed again"
+    assert breakers.get_state(live_endpoint) == BREAKER_CLOSED
+    print("Probe raising a parse error ends, endpoint is probed again after backoff")
+
+def main():
+    server = FixtureServer(make_service_routes())
+    dead = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    dead.bind(('127.0.0.1', 0))
+    dead.listen(64)
+    dead_endpoint = f"127.0.0.1:{dead.getsockname()[1]}"
+
+    config = use_fixture_server(load_config(), server)
+    config['runtime']['httpCacheFile'] = None
+    services = config['services']
+    services['wifiiot_sensors_1']['url'] = f"http://{dead_endpoint}/sensors"
+    for service_key in SENSOR_KEYS:
+        services[service_key]['timeout'] = SENSOR_TIMEOUT
+
+    runtime_config = config['runtime']
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            clock = FakeClock()
+            plain = run(config, CircuitBreakers(None, failure_threshold=10 ** 9, clock=clock), clock, dead_endpoint)
+
+            clock = FakeClock()
+            state_file = os.path.join(temp_dir, 'breaker_state.json')
+            breakers = CircuitBreakers(state_file, runtime_config['breakerFailures'],
+                                       runtime_config['breakerBackoff'], runtime_config['breakerMaxBackoff'],
+                                       PROBE_TIMEOUT, clock=clock)
+            guarded = run(config, breakers, clock, dead_endpoint)
+
+            restarted = CircuitBreakers(state_file, runtime_config['breakerFailures'], clock=clock)
+            assert restarted.endpoints == breakers.endpoints, "Breaker state was not persisted"
+
+            check_raising_probe(config, circuit_breaker.get_endpoint(services['wifiiot_sensors_2']['url']))
+    finally:
+        dead.close()
+        server.close()
+
+    print(f"{CYCLES} cycles of {CYCLE} s, sensor timeout {SENSOR_TIMEOUT} ms, probe timeout {PROBE_TIMEOUT} ms")
+    print(f"{'cycle':>5} {'no breaker ms':>14} {'breaker ms':>11} {'breaker state':>14}")
+    for (cycle, _, plain_elapsed), (_, state, elapsed) in zip(plain, guarded):
+        print(f"{cycle:>5} {plain_elapsed * 1000:>14.0f} {elapsed * 1000:>11.0f} {state:>14}")
+
+    plain_total = sum(row[2] for row in plain)
+    guarded_total = sum(row[2] for row in guarded)
+    calls = sum(1 for row in guarded if row[1] != 'open')
+    rejections = get_metrics().get_counter('dashboard_breaker_rejections_total', endpoint=dead_endpoint)
+    print(f"Total fetch time: {plain_total:.1f} s without breaker, {guarded_total:.1f} s with breaker")
+    print(f"Calls to dead board: {CYCLES} without breaker, {calls} with breaker, {rejections:.0f} rejected")
+
+    threshold = runtime_config['breakerFailures']
+    assert all(row[1] == BREAKER_CLOSED for row in guarded[:threshold])
+    assert guarded_total < plain_total / 2, "Breaker did not shorten fetch cycles"
+    for cycle, state, elapsed in guarded[threshold:]:
+        assert elapsed < SENSOR_TIMEOUT / 1000.0, f"Cycle {cycle} waited for the dead board ({state})"
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Measures configuration loading from snapshot and checks partial rebuild on reload:
+    python benchmarks/bench_config_reload.py
+
+A copy of the configuration is edited in a temporary directory while a watcher runs,
+once with inotify and once with polling. Each edit is applied with reload_config and
+checked to rebuild only what depends on the changed section.
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import HEADLESS_DISPLAY, REPO_DIR, SAMPLE_DATA, SAMPLE_AGES, time_call
+
+import config_watcher
+from config_loader import load_config, load_config_snapshot, validate_config
+from config_watcher import ConfigWatcher
+from display_renderer import DisplayRenderer
+from epaper_dashboard_v1 import load_checked_config, reload_config
+from data_loader import get_data_service_keys
+from refresh_policy import RefreshPolicy
+from scheduler import ServiceScheduler
+from services.value_decoder import get_decoder
+
+CONFIG_FILE = 'dashboard.config.json'
+POLL_INTERVAL = 100
+
+def edit_config(edit):
+    """Rewrites configuration like an editor, through a temporary file and rename"""
+    with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    edit(config)
+    with open(f"{CONFIG_FILE}.swp", 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=4)
+    os.replace(f"{CONFIG_FILE}.swp", CONFIG_FILE)
+
+def set_weather_city(config):
+    params = config['services']['weather']['params']
+    params['q'] = 'Minsk' if params['q'] != 'Minsk' else 'Mogilev'
+
+def set_line_height(config):
+    config['layout']['lineHeight'] += 1
+
+def set_font_size(config):
+    font_file, font_size = config['fonts']['font18']
+    config['fonts']['font18'] = [font_file, font_size + 1]
+
+def check_reloads(use_inotify: bool):
+    changed = threading.Event()
+    watcher = ConfigWatcher(CONFIG_FILE, changed.set, poll_interval=POLL_INTERVAL)
+    if not use_inotify:
+        watcher_init = config_watcher._init_inotify
+        config_watcher._init_inotify = lambda directory: None
+    try:
+        assert watcher.start() == use_inotify
+    finally:
+        if not use_inotify:
+            config_watcher._init_inotify = watcher_init
+
+    config = load_checked_config(CONFIG_FILE)
+    renderer = DisplayRenderer(config)
+    renderer.render(SAMPLE_DATA, SAMPLE_AGES)
+    service_keys = get_data_service_keys(config)
+    scheduler = ServiceScheduler(config, service_keys)
+    scheduler.mark_fetched(service_keys)
+    policy = RefreshPolicy(config, state_file=None)
+
+    name = 'inotify' if use_inotify else 'polling'
+    try:
+        for edit, keeps_layout, keeps_fonts in ((set_weather_city, True, True),
+                                                (set_line_height, False, True),
+                                                (set_font_size, False, False)):
+            layout, fonts, decoder = renderer.get_layout(), renderer.fonts, get_decoder(config, 'kucoin')
+            changed.clear()
+            start = time.perf_counter()
+            edit_config(edit)
+            assert changed.wait(5.0), f"{name} did not notice {edit.__name__}"
+            detected = time.perf_counter() - start
+            start = time.perf_counter()
+            config = reload_config(CONFIG_FILE, config, renderer, scheduler, policy, None)
+            renderer.render(SAMPLE_DATA, SAMPLE_AGES)
+            applied = time.perf_counter() - start
+            print(f"{name:<8} {edit.__name__:<16} detected {detected * 1000:>6.0f} ms, "
+                  f"applied and rendered {applied * 1000:>6.1f} ms")
+
+            assert (renderer.get_layout() is layout) == keeps_layout, f"{edit.__name__}: layout"
+            assert (renderer.fonts is fonts) == keeps_fonts, f"{edit.__name__}: fonts"
+            assert get_decoder(config, 'kucoin') is decoder, f"{edit.__name__}: unchanged decoder rebuilt"
+            due = scheduler.due_services()
+            assert due == (['weather'] if edit is set_weather_city else []), f"{edit.__name__}: due {due}"
+            scheduler.mark_fetched(due)
+    finally:
+        watcher.stop()
+
+def main():
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        try:
+            shutil.copy(os.path.join(REPO_DIR, CONFIG_FILE), CONFIG_FILE)
+            edit_config(lambda config: config['display'].update(HEADLESS_DISPLAY))
+
+            def parse():
+                config = load_config(CONFIG_FILE)
+                validate_config(config)
+
+            print("Loading configuration, ms:")
+            print(f"  parse and validate  {time_call(parse, number=200):.3f}")
+            assert load_config_snapshot(CONFIG_FILE) == load_config(CONFIG_FILE)
+            print(f"  snapshot            {time_call(lambda: load_config_snapshot(CONFIG_FILE), number=200):.3f}")
+            os.utime(CONFIG_FILE)
+            assert load_config_snapshot(CONFIG_FILE) == load_config(CONFIG_FILE)
+            # Only mtime changes, contents are hashed and snapshot is rewritten
+            touched = time_call(lambda: load_config_snapshot(CONFIG_FILE), number=200, setup=lambda: os.utime(CONFIG_FILE))
+            print(f"  snapshot, touched   {touched:.3f}")
+
+            check_reloads(use_inotify=True)
+            check_reloads(use_inotify=False)
+        finally:
+            os.chdir(previous_dir)
+
+if __name__ == '__main__':
+    main()
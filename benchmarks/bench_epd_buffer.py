@@ -0,0 +1,68 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Compares waveshare getbuffer with NumPy packing of P-mode and RGB frames.
+
+Buffers are first checked to be bit-exact and to unpack to the same panel colours, then timed:
+    python benchmarks/bench_epd_buffer.py
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import SAMPLE_DATA, SAMPLE_AGES, use_fake_driver, load_config, time_call
+
+use_fake_driver()
+from PIL import Image
+from display_renderer import DisplayRenderer
+from display_backends import create_display
+import epd_buffer
+
+def noise_frame(width: int, height: int) -> Image.Image:
+    """Returns RGB frame with arbitrary colours which need dithering"""
+    rng = random.Random(2615)
+    return Image.frombytes('RGB', (width, height), bytes(rng.randrange(256) for _ in range(width * height * 3)))
+
+def check_equivalence(epd, frames):
+    """Asserts that pack_buffer output is bit-exact with driver getbuffer"""
+    for name, frame in frames.items():
+        expected = bytes(epd.getbuffer(frame))
+        actual = bytes(epd_buffer.pack_buffer(frame, epd.width, epd.height))
+        assert actual == expected, f"Buffer of {name} frame differs from getbuffer"
+        unpacked = epd_buffer.unpack_buffer(actual, epd.width, epd.height)
+        assert unpacked.tobytes() == epd_buffer.to_panel_codes(frame, epd.width, epd.height), \
+            f"Buffer of {name} frame does not unpack to its panel colours"
+        print(f"  {name:<12} bit-exact ({len(actual)} bytes)")
+
+def main():
+    rgb_renderer = DisplayRenderer(load_config(epdColourMode='RGB'))
+    p_renderer = DisplayRenderer(load_config(epdColourMode='P'))
+    # Renderers are headless, the driver is only loaded for its getbuffer
+    epd = create_display(load_config(epdDisplayType='epd2in15g'))
+
+    rgb_frame = rgb_renderer.render(SAMPLE_DATA, SAMPLE_AGES)
+    p_frame = p_renderer.render(SAMPLE_DATA, SAMPLE_AGES)
+
+    print(f"numpy: {'yes' if epd_buffer.np is not None else 'no (pure Python packer)'}")
+    print("Equivalence:")
+    check_equivalence(epd, {
+        'rgb': rgb_frame,
+        'p': p_frame,
+        'p-landscape': p_frame.rotate(-90, expand=True),
+        'noise': noise_frame(epd.width, epd.height)
+    })
+
+    print("Timing, ms per frame:")
+    results = [
+        ('render rgb', time_call(lambda: rgb_renderer.render(SAMPLE_DATA, SAMPLE_AGES))),
+        ('render p', time_call(lambda: p_renderer.render(SAMPLE_DATA, SAMPLE_AGES))),
+        ('getbuffer rgb', time_call(lambda: epd.getbuffer(rgb_frame), number=5)),
+        ('getbuffer p', time_call(lambda: epd.getbuffer(p_frame), number=5)),
+        ('pack_buffer rgb', time_call(lambda: epd_buffer.pack_buffer(rgb_frame, epd.width, epd.height))),
+        ('pack_buffer p', time_call(lambda: epd_buffer.pack_buffer(p_frame, epd.width, epd.height)))
+    ]
+    for name, elapsed in results:
+        print(f"  {name:<16} {elapsed:8.3f}")
+
+if __name__ == '__main__':
+    main()
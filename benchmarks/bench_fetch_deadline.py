@@ -0,0 +1,71 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Checks that a hung service does not keep a cron run alive past the fetch deadline:
+    python benchmarks/bench_fetch_deadline.py
+
+A child process fetches all services while one sensor board and the KuCoin per-symbol
+endpoint accept connections and never answer, with read timeouts much longer than
+the cycle deadline. The child
+reports when fetch_services returned, and the whole process, including interpreter
+exit, is timed from outside.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import FixtureServer, load_config, make_service_routes, use_fixture_server
+
+SENSOR_TIMEOUT = 10000
+DEADLINE = 1000
+
+def run_child(server_url: str, dead_endpoint: str):
+    from data_loader import fetch_services, get_data_service_keys
+
+    class Server:
+        url = server_url
+
+    config = use_fixture_server(load_config(), Server)
+    config['runtime'].update({'httpCacheFile': None, 'breakerFile': None, 'fetchDeadline': DEADLINE})
+    services = config['services']
+    services['wifiiot_sensors_1']['url'] = f"http://{dead_endpoint}/sensors"
+    services['wifiiot_sensors_1']['timeout'] = SENSOR_TIMEOUT
+    services['kucoin'].update({'fetchMode': 'symbols', 'symbolUrl': f"http://{dead_endpoint}/stats",
+                               'timeout': SENSOR_TIMEOUT})
+
+    start = time.perf_counter()
+    results = fetch_services(config, get_data_service_keys(config))
+    elapsed = time.perf_counter() - start
+    assert (results['wifiiot_sensors_1'] is None and results['kucoin'] is None
+            and results['wifiiot_sensors_2']), "Unexpected results"
+    print(json.dumps({'fetch': elapsed}))
+
+def main():
+    server = FixtureServer(make_service_routes())
+    dead = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    dead.bind(('127.0.0.1', 0))
+    dead.listen(64)
+    dead_endpoint = f"127.0.0.1:{dead.getsockname()[1]}"
+    try:
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, os.path.realpath(__file__), '--child', server.url, dead_endpoint],
+                                check=True, capture_output=True, text=True, timeout=SENSOR_TIMEOUT / 1000.0 * 2).stdout
+        total = time.perf_counter() - start
+    finally:
+        dead.close()
+        server.close()
+
+    fetch = json.loads(output.strip().splitlines()[-1])['fetch']
+    print(f"Deadline {DEADLINE} ms, hung sensor and KuCoin read timeout {SENSOR_TIMEOUT} ms")
+    print(f"fetch_services returned after {fetch * 1000:.0f} ms, process exited after {total * 1000:.0f} ms")
+    assert fetch < DEADLINE / 1000.0 + 0.5, "fetch_services waited past the deadline"
+    assert total < SENSOR_TIMEOUT / 1000.0 / 2, "Process waited for the hung request at exit"
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], sys.argv[3])
+    else:
+        main()
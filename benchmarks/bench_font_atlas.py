@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Measures cold start of the renderer with and without shared fonts and glyph atlas:
+    python benchmarks/bench_font_atlas.py
+
+Every start runs in a fresh process, which loads fonts, compiles the layout and renders
+the first frame, and reports time and growth of resident memory. Frames drawn from
+the atlas are checked to be equal to frames rasterized from fonts, and the atlas is
+checked not to grow when later runs draw other dates, descriptions and values.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import SAMPLE_DATA, SAMPLE_AGES, load_config
+
+STARTS = 5
+RUNS = 20
+
+def get_rss() -> int:
+    """Returns resident memory of this process in KiB"""
+    with open('/proc/self/status', 'r') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+def run_child(mode: str, atlas_file: str):
+    from PIL import ImageFont
+    import display_renderer
+    from display_renderer import DisplayRenderer
+
+    config = load_config()
+    if mode == 'truetype':
+        # Previous loading: every fonts entry parses the file again
+        def load_fonts(renderer):
+            return {name: ImageFont.truetype(os.path.join(display_renderer.fontsdir, font_file), size)
+                    for name, (font_file, size) in renderer.config['fonts'].items()}
+        DisplayRenderer._load_fonts = load_fonts
+    if mode == 'atlas':
+        config['layout']['glyphAtlasFile'] = atlas_file
+
+    rss = get_rss()
+    start = time.perf_counter()
+    renderer = DisplayRenderer(config)
+    fonts = time.perf_counter() - start
+    image = renderer.render(SAMPLE_DATA, SAMPLE_AGES)
+    total = time.perf_counter() - start
+    print(json.dumps({'fonts': fonts * 1000, 'total': total * 1000, 'rss': get_rss() - rss,
+                      'pixels': image.tobytes().hex()}))
+
+def start_child(mode: str, atlas_file: str):
+    output = subprocess.run([sys.executable, os.path.realpath(__file__), '--child', mode, atlas_file],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def check_atlas_size(atlas_file: str):
+    """Starts renderers as cron runs do, each drawing other data, returns atlas sizes"""
+    from display_renderer import DisplayRenderer
+
+    config = load_config()
+    config['layout']['glyphAtlasFile'] = atlas_file
+    sizes = []
+    for run in range(RUNS):
+        weather = dict(SAMPLE_DATA['weather'], description=f"description {run}",
+                       sunrise=SAMPLE_DATA['weather']['sunrise'] + run * 60, temp=run / 10.0)
+        DisplayRenderer(config).render(dict(SAMPLE_DATA, weather=weather), SAMPLE_AGES)
+        sizes.append(os.path.getsize(atlas_file))
+    return sizes
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        atlas_file = os.path.join(temp_dir, 'glyph_atlas.bin')
+        start_child('atlas', atlas_file)
+        print(f"Atlas of {os.path.getsize(atlas_file) / 1024:.1f} KiB")
+
+        print(f"{'start':<22} {'fonts ms':>9} {'first frame ms':>15} {'RSS KiB':>8}")
+        frames = {}
+        for mode, name in (('truetype', 'truetype per entry'), ('shared', 'shared fonts'),
+                           ('atlas', 'shared fonts, atlas')):
+            results = [start_child(mode, atlas_file) for _ in range(STARTS)]
+            best = min(results, key=lambda result: result['total'])
+            frames[mode] = {result['pixels'] for result in results}
+            print(f"{name:<22} {best['fonts']:>9.2f} {best['total']:>15.1f} "
+                  f"{min(result['rss'] for result in results):>8}")
+
+        assert len(frames['atlas']) == 1 and frames['atlas'] == frames['shared'] == frames['truetype'], \
+            "Frames drawn from atlas differ"
+        print("Frames are equal")
+
+        sizes = check_atlas_size(atlas_file)
+        print(f"Atlas after {RUNS} runs with other data: {sizes[0]} to {sizes[-1]} bytes")
+        assert len(set(sizes)) == 1, "Atlas grows with drawn data"
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,55 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Simulates a month of dashboard history and times range queries used for rendering:
+    python benchmarks/bench_history_store.py
+"""
+import math
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import time_call
+
+from history_store import HistoryStore
+
+SERIES = ['sensors.dsw1', 'sensors.dsw2', 'sensors.bmpt', 'sensors.bmpp', 'weather.temp',
+          'weather.feels_like', 'weather.humidity', 'weather.pressure', 'kucoin.BTC-USDC',
+          'kucoin.LTC-USDC', 'kucoin.LINK-USDC', 'kucoin.SOL-USDC']
+STEP = 600
+DAYS = 35
+START = 1757000000
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'history.db')
+        history = HistoryStore(path)
+
+        started = time.perf_counter()
+        end = START + DAYS * 24 * 3600
+        for ts in range(START, end, STEP):
+            history.record({name: 10 + 5 * math.sin(ts / 86400.0 + i) for i, name in enumerate(SERIES)}, ts)
+            history.compact_if_due(ts)
+        elapsed = time.perf_counter() - started
+        steps = (end - START) // STEP
+
+        rows = history.query('sensors.bmpp', end - 7 * 24 * 3600, end)
+        assert rows == sorted(rows), "Rows are not ordered by time"
+        assert rows[-1][0] == end - STEP
+        assert all(low <= mean <= high for _, low, high, mean in rows)
+        assert not history.query('sensors.bmpp', START, START + 24 * 3600), "Retention was not applied"
+
+        stats = history.get_stats()
+        print(f"{DAYS} days x {len(SERIES)} series every {STEP}s: {steps} cycles, "
+              f"{elapsed / steps * 1000:.2f} ms per cycle")
+        print(f"kept {stats['samples']} samples and {stats['rollups']} buckets, "
+              f"database {os.path.getsize(path) // 1024} KiB")
+        for hours in (6, 24, 7 * 24, 30 * 24):
+            count = len(history.query('sensors.bmpp', end - hours * 3600, end))
+            query_ms = time_call(lambda: history.query('sensors.bmpp', end - hours * 3600, end), number=50)
+            print(f"query {hours:>4}h: {count:>4} rows {query_ms:7.3f} ms")
+        history.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Compares per-call requests.get with the shared pooled client on a local server:
+    python benchmarks/bench_http_client.py
+
+- requests: module-level requests.get, new connection for every fetch
+- pooled:   HttpClient keep-alive session, server without validators
+- etag:     HttpClient against server sending ETag, unchanged bodies come back as 304
+
+Requests are also checked not to wait for a pooled connection held by a hung request.
+"""
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import FixtureServer, time_call
+
+import requests
+from http_client import HttpClient
+
+FETCHES = 20
+WEATHER_PATH = '/data/2.5/weather'
+SENSOR_PATH = '/sensors'
+HANG_PATH = '/hang'
+
+WEATHER_BODY = json.dumps({
+    'coord': {'lon': 30.34, 'lat': 53.91},
+    'weather': [{'id': 803, 'main': 'Clouds', 'description': 'воблачна', 'icon': '04d'}],
+    'main': {'temp': 5.23, 'feels_like': 2.0, 'pressure': 1012, 'humidity': 81},
+    'wind': {'speed': 3.5, 'deg': 200},
+    'clouds': {'all': 75},
+    'sys': {'sunrise': 1760760000, 'sunset': 1760797000},
+    'name': 'Mogilev'
+}, ensure_ascii=False).encode('utf-8')
+SENSOR_BODY = b'dsw1:4.50;dsw2:12.25;bmpt:21.00;bmpp:1011.30'
+
+def fetch_all(get, base_url: str):
+    """Fetches weather and sensor resources like one daemon cycle does"""
+    weather = get(f"{base_url}{WEATHER_PATH}", params={'q': 'Mogilev', 'appid': 'key'}, timeout=10)
+    weather.raise_for_status()
+    sensors = get(f"{base_url}{SENSOR_PATH}", timeout=10)
+    sensors.raise_for_status()
+    return weather.json(), sensors.text
+
+def check_held_pool():
+    """Holds the only pooled connection of a host with a hung request and fetches again"""
+    released = threading.Event()
+    server = FixtureServer({HANG_PATH: lambda query: released.wait(30) and b'', SENSOR_PATH: SENSOR_BODY})
+    client = HttpClient(pool_size=1, cache_file=None)
+    hung = threading.Thread(target=lambda: client.get(f"{server.url}{HANG_PATH}", timeout=30), daemon=True)
+    result = []
+    fetch = threading.Thread(target=lambda: result.append(client.get(f"{server.url}{SENSOR_PATH}", timeout=10).text),
+                             daemon=True)
+    try:
+        hung.start()
+        while not server.requests:
+            released.wait(0.01)
+        fetch.start()
+        fetch.join(5)
+        assert result == [SENSOR_BODY.decode('utf-8')], "Request waited for connection held by hung request"
+        print("Request next to hung one got its own connection")
+    finally:
+        released.set()
+        hung.join(5)
+        client.close()
+        server.close()
+
+def main():
+    routes = {WEATHER_PATH: WEATHER_BODY, SENSOR_PATH: SENSOR_BODY}
+    plain_server = FixtureServer(routes)
+    etag_server = FixtureServer(routes, etags=True)
+    pooled = HttpClient(cache_file=None)
+    conditional = HttpClient(cache_file=None)
+
+    expected = fetch_all(requests.get, plain_server.url)
+    assert fetch_all(pooled.get, plain_server.url) == expected
+    assert fetch_all(conditional.get, etag_server.url) == expected
+    assert fetch_all(conditional.get, etag_server.url) == expected, "Cached 304 body differs"
+    assert conditional.not_modified == 2
+
+    modes = [
+        ('requests', plain_server, lambda: fetch_all(requests.get, plain_server.url)),
+        ('pooled', plain_server, lambda: fetch_all(pooled.get, plain_server.url)),
+        ('etag', etag_server, lambda: fetch_all(conditional.get, etag_server.url))
+    ]
+
+    print(f"{FETCHES} cycles of weather and sensor fetch")
+    print(f"{'mode':<9} {'connections':>11} {'body bytes':>10} {'ms/cycle':>9}")
+    try:
+        for name, server, func in modes:
+            server.reset_counters()
+            for _ in range(FETCHES):
+                func()
+            connections, bytes_sent = server.connections, server.bytes_sent
+            elapsed = time_call(func, number=FETCHES, repeat=3)
+            print(f"{name:<9} {connections:>11} {bytes_sent:>10} {elapsed:>9.2f}")
+    finally:
+        pooled.close()
+        conditional.close()
+        plain_server.close()
+        etag_server.close()
+
+    check_held_pool()
+
+if __name__ == '__main__':
+    main()
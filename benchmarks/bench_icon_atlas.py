@@ -0,0 +1,94 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Measures drawing of weather icons from the icon atlas:
+    python benchmarks/bench_icon_atlas.py
+
+Compares converting all icons with mapping an existing atlas, and blitting an icon
+with decoding, resampling and quantizing its PNG for every frame. Frames drawn from
+the mapped atlas are checked to be equal to frames with directly converted icons,
+and rendering is checked not to open any icon file.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import SAMPLE_DATA, SAMPLE_AGES, load_config, time_call
+
+from PIL import Image
+from icon_atlas import IconAtlas, convert_icon
+from display_renderer import DisplayRenderer, iconsdir
+from frame_canvas import FrameCanvas
+
+ICON = '04d'
+
+def count_opens(func) -> int:
+    """Calls func, returns number of images opened by Pillow meanwhile"""
+    opened = []
+    image_open = Image.open
+    Image.open = lambda *args, **kwargs: opened.append(args) or image_open(*args, **kwargs)
+    try:
+        func()
+    finally:
+        Image.open = image_open
+    return len(opened)
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for mode in ('RGB', 'P'):
+            config = load_config(epdColourMode=mode)
+            config['layout']['iconAtlasFile'] = os.path.join(temp_dir, f"icon_atlas_{mode}.bin")
+            renderer = DisplayRenderer(config)
+            sizes = renderer.get_layout().get_icon_sizes()
+            atlas = renderer.icon_atlas
+            size = sizes[0]
+            colours, rotation = atlas.colours, atlas.rotation
+
+            def build():
+                os.remove(atlas.atlas_file)
+                IconAtlas(atlas.atlas_file, iconsdir, mode, colours, rotation).prepare(sizes)
+
+            def load():
+                IconAtlas(atlas.atlas_file, iconsdir, mode, colours, rotation).prepare(sizes)
+
+            print(f"{mode}: {len(atlas.icons)} icons at {sizes}, atlas of "
+                  f"{os.path.getsize(atlas.atlas_file) / 1024:.1f} KiB")
+            print(f"  convert and save atlas      {time_call(build, number=5):>8.3f} ms")
+            print(f"  map atlas                   {time_call(load, number=50):>8.3f} ms")
+
+            canvas = FrameCanvas(mode, (renderer.image_width, renderer.image_height),
+                                 renderer.rotation, renderer.background)
+            icon = atlas.get(ICON, size)
+
+            def blit():
+                canvas.blit(10, 10, icon.width, icon.height, icon.image, icon.mask)
+
+            def convert_and_paste():
+                pixels, mask = convert_icon(os.path.join(iconsdir, f"{ICON}.png"), size, mode, colours, rotation)
+                rotated_size = (size, size)
+                canvas.blit(10, 10, size, size, Image.frombytes(mode, rotated_size, pixels),
+                            Image.frombytes('L', rotated_size, mask))
+
+            print(f"  icon per frame, PNG         {time_call(convert_and_paste, number=50):>8.3f} ms")
+            print(f"  icon per frame, atlas       {time_call(blit, number=500):>8.4f} ms")
+            print(f"  frame                       {time_call(lambda: renderer.render(SAMPLE_DATA, SAMPLE_AGES)):>8.3f} ms")
+
+            frame = renderer.render(SAMPLE_DATA, SAMPLE_AGES)
+            assert atlas.mmap is not None, "Atlas is not mapped"
+            assert count_opens(lambda: renderer.render(SAMPLE_DATA, SAMPLE_AGES)) == 0, "Icon opened per frame"
+
+            # Icons converted directly, without atlas file
+            config['layout']['iconAtlasFile'] = None
+            direct = DisplayRenderer(config)
+            assert direct.render(SAMPLE_DATA, SAMPLE_AGES).tobytes() == frame.tobytes(), "Frames differ"
+            for code, path in direct.icon_atlas._get_icon_files().items():
+                pixels, mask = convert_icon(path, size, mode, colours, rotation)
+                icon = atlas.get(code, size)
+                assert icon.image.tobytes() == pixels and icon.mask.tobytes() == mask, f"Icon {code} differs"
+            without_icon = direct.render(dict(SAMPLE_DATA, weather=dict(SAMPLE_DATA['weather'], weather_icon=None)),
+                                         SAMPLE_AGES)
+            assert without_icon.tobytes() != frame.tobytes(), "Icon is not drawn"
+            print("  frames and icons are equal")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Compares per-call path splitting with compiled JSON paths:
+    python benchmarks/bench_json_path.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import load_config, time_call
+
+from json_path import compile_path
+
+DEVICES = 50
+WEATHER_RESPONSE = {
+    'weather': [{'id': 803, 'main': 'Clouds', 'description': 'воблачна', 'icon': '04d'}],
+    'main': {'temp': 5.23, 'feels_like': 2.0, 'pressure': 1012, 'humidity': 81},
+    'wind': {'speed': 3.5, 'deg': 200},
+    'clouds': {'all': 75},
+    'sys': {'sunrise': 1760760000, 'sunset': 1760797000},
+    'name': 'Mogilev'
+}
+
+def split_json_value(data, path: str):
+    """Previous weather_service.get_json_value, path is split on every call"""
+    current = data
+    for key in path.split('.'):
+        if '[' in key and ']' in key:
+            name, index = key.split('[')
+            index = int(index.rstrip(']'))
+            if name:
+                current = current[name]
+            current = current[index]
+        else:
+            current = current[key]
+    return current
+
+def main():
+    config = load_config()
+    data_config = config['services']['weather']['data']
+    paths = [value_config.get('path', key) for key, value_config in data_config.items()] * DEVICES
+
+    for path in paths:
+        assert compile_path(path).resolve(WEATHER_RESPONSE) == split_json_value(WEATHER_RESPONSE, path), path
+
+    def run_split():
+        return [split_json_value(WEATHER_RESPONSE, path) for path in paths]
+
+    def run_compiled():
+        return [compile_path(path).resolve(WEATHER_RESPONSE) for path in paths]
+
+    compiled = [compile_path(path) for path in paths]
+
+    def run_precompiled():
+        return [json_path.resolve(WEATHER_RESPONSE) for json_path in compiled]
+
+    print(f"{len(paths)} value lookups ({len(data_config)} weather paths x {DEVICES})")
+    for name, func in [('split', run_split), ('compiled', run_compiled), ('precompiled', run_precompiled)]:
+        print(f"{name:<12} {time_call(func, number=200) * 1000:8.1f} us")
+
+if __name__ == '__main__':
+    main()
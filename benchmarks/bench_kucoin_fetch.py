@@ -0,0 +1,90 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Compares KuCoin fetch modes against a local server with the allTickers fixture:
+    python benchmarks/bench_kucoin_fetch.py
+
+- bulk:    download and decode whole allTickers, as done before
+- stream:  incremental allTickers parse which stops after the last configured pair
+- symbols: parallel requests of configured pairs only
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import FixtureServer, load_config, make_kucoin_routes, measure_peak_memory, time_call
+
+import requests
+from services import kucoin_service
+
+class ReadCounter:
+    """Counts response bytes actually read by the client"""
+
+    def __init__(self):
+        self.bytes_read = 0
+        self.original = requests.models.Response.iter_content
+
+    def __enter__(self):
+        counter = self
+
+        def iter_content(response, *args, **kwargs):
+            for chunk in counter.original(response, *args, **kwargs):
+                counter.bytes_read += len(chunk)
+                yield chunk
+
+        requests.models.Response.iter_content = iter_content
+        return self
+
+    def __exit__(self, *exc_info):
+        requests.models.Response.iter_content = self.original
+
+def fetch_bulk(url: str, pairs):
+    """Previous implementation: whole response decoded and indexed"""
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    ticker_data = response.json().get('data', {}).get('ticker', [])
+    ticker_dict = {ticker.get('symbol'): ticker for ticker in ticker_data}
+    return {pair: ticker_dict[pair] for pair in pairs if pair in ticker_dict}
+
+def main():
+    routes = make_kucoin_routes()
+    all_tickers = routes['/api/v1/market/allTickers']
+    tickers = json.loads(all_tickers)['data']['ticker']
+    server = FixtureServer(routes)
+    config = load_config()
+    service_config = config['services']['kucoin']
+    service_config['url'] = f"{server.url}/api/v1/market/allTickers"
+    service_config['symbolUrl'] = f"{server.url}/api/v1/market/stats"
+    pairs = service_config['pairs']
+
+    def run_mode(mode):
+        service_config['fetchMode'] = mode
+        return kucoin_service.fetch_kucoin_data(config)
+
+    modes = [
+        ('bulk', lambda: fetch_bulk(service_config['url'], pairs)),
+        ('stream', lambda: run_mode(kucoin_service.FETCH_MODE_ALL_TICKERS)),
+        ('symbols', lambda: run_mode(kucoin_service.FETCH_MODE_SYMBOLS))
+    ]
+
+    expected = run_mode(kucoin_service.FETCH_MODE_ALL_TICKERS)
+    assert run_mode(kucoin_service.FETCH_MODE_SYMBOLS) == expected, "Fetch modes return different data"
+    assert sorted(expected) == sorted(pairs), "Not all pairs were found"
+
+    print(f"allTickers fixture: {len(all_tickers)} bytes, {len(tickers)} tickers")
+    print(f"{'mode':<8} {'requests':>8} {'bytes read':>11} {'ms':>9} {'peak KiB':>9}")
+    try:
+        for name, func in modes:
+            server.reset_counters()
+            with ReadCounter() as counter:
+                func()
+            bytes_read = counter.bytes_read or server.bytes_sent
+            requests_made = server.requests
+            elapsed = time_call(func, number=5, repeat=3)
+            peak = measure_peak_memory(func)
+            print(f"{name:<8} {requests_made:>8} {bytes_read:>11} {elapsed:>9.2f} {peak:>9.0f}")
+    finally:
+        server.close()
+
+if __name__ == '__main__':
+    main()
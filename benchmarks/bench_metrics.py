@@ -0,0 +1,98 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Checks metrics export and measures instrumentation overhead:
+    python benchmarks/bench_metrics.py
+
+One instrumented pipeline cycle is run against the fixture server. Its Prometheus output
+is checked to be well formed, to keep cumulative histogram buckets, and to survive
+a restart through the state file. The same output is served over HTTP.
+"""
+import os
+import re
+import sys
+import tempfile
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import SAMPLE_DATA, SAMPLE_AGES, FixtureServer, load_config, make_service_routes, time_call, use_fixture_server
+
+import metrics
+from data_loader import load_all_data
+from display_renderer import DisplayRenderer
+
+SAMPLE_PATTERN = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[^}]*\})? -?[0-9.e+-]+$')
+
+def check_exposition(text: str):
+    """Asserts that every line is a comment or a valid sample and buckets are cumulative"""
+    previous = {}
+    for line in text.splitlines():
+        if line.startswith('#'):
+            continue
+        assert SAMPLE_PATTERN.match(line), f"Malformed sample: {line}"
+        if '_bucket{' in line:
+            series = re.sub(r',?le="[^"]*"', '', line.rsplit(' ', 1)[0])
+            count = int(line.rsplit(' ', 1)[1])
+            assert count >= previous.get(series, 0), f"Bucket counts decrease: {line}"
+            previous[series] = count
+
+def timed_block(registry):
+    with registry.timer('bench_duration_seconds', stage='bench'):
+        pass
+
+def run_cycle(config, renderer):
+    all_data, data_ages = load_all_data(config, use_cache=False)
+    image = renderer.render(all_data, data_ages)
+    renderer.display_image(image)
+
+def main():
+    server = FixtureServer(make_service_routes())
+    config = use_fixture_server(load_config(), server)
+    config['runtime']['httpCacheFile'] = None
+
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        try:
+            config['metrics'] = {'enabled': True, 'stateFile': 'state.json', 'textfile': 'dashboard.prom'}
+            registry = metrics.load_metrics(config)
+            renderer = DisplayRenderer(config)
+            run_cycle(config, renderer)
+            registry.finish_cycle()
+
+            with open('dashboard.prom', 'r', encoding='utf-8') as f:
+                text = f.read()
+            check_exposition(text)
+            stages = sorted(set(re.findall(r'stage="(\w+)"', text)))
+            services = sorted(set(re.findall(r'service="(\w+)"', text)))
+            print(f"Exported stages: {', '.join(stages)}")
+            print(f"Exported services: {', '.join(services)}")
+            assert {'load', 'render', 'getbuffer', 'display'} <= set(stages)
+
+            restarted = metrics.load_metrics(config)
+            assert restarted is not registry
+            assert restarted.format_prometheus() == registry.format_prometheus(), "State was not restored"
+            run_cycle(config, DisplayRenderer(config))
+            restarted.finish_cycle()
+            assert restarted.get_counter('dashboard_cycles_total') == 2
+            print("State file restored across restart")
+
+            assert restarted.start_server(0)
+            port = restarted.server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+                assert response.read().decode('utf-8') == restarted.format_prometheus()
+            restarted.stop_server()
+            print("HTTP endpoint serves the same metrics")
+
+            renderer = DisplayRenderer(config)
+            plain = DisplayRenderer.render.__wrapped__
+            print("Overhead, ms per call:")
+            print(f"  timer                {time_call(lambda: timed_block(restarted), number=1000):.4f}")
+            print(f"  render               {time_call(lambda: plain(renderer, SAMPLE_DATA, SAMPLE_AGES)):.4f}")
+            print(f"  render instrumented  {time_call(lambda: renderer.render(SAMPLE_DATA, SAMPLE_AGES)):.4f}")
+            print(f"  format_prometheus    {time_call(restarted.format_prometheus):.4f}")
+        finally:
+            os.chdir(previous_dir)
+            server.close()
+
+if __name__ == '__main__':
+    main()
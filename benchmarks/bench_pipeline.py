@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Times every stage of fetch -> merge -> render -> buffer -> save offline, with services
+answered by a local server from recorded fixtures and the headless display:
+    python benchmarks/bench_pipeline.py                  # compare with baseline.json
+    python benchmarks/bench_pipeline.py --save-baseline  # store results as new baseline
+
+Stages slower than the baseline by more than --tolerance are reported as regressions
+and make the script exit with status 1. Baselines are only comparable on the same machine.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import (BENCH_DIR, FixtureServer, load_config, make_service_routes, measure_peak_memory,
+                    time_call, use_fixture_server)
+
+from data_loader import load_all_data, merge_data_with_cache
+from data_storage import load_data, save_data, DEFAULT_DATA_FILE
+from display_renderer import DisplayRenderer
+
+DEFAULT_BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_TOLERANCE = 0.25
+# Differences below this are timer noise for sub-millisecond stages
+MIN_REGRESSION_MS = 0.1
+
+def remove_data_file():
+    if os.path.exists(DEFAULT_DATA_FILE):
+        os.remove(DEFAULT_DATA_FILE)
+
+def get_stages(config):
+    """Returns (name, function, setup) of every pipeline stage"""
+    remove_data_file()
+    all_data, data_ages = load_all_data(config, use_cache=True)
+    assert all_data['weather']['temp'] == 5.23, "Weather fixture was not fetched"
+    assert all(all_data['kucoin'].get(pair) for pair in config['services']['kucoin']['pairs'])
+    assert sorted(all_data['sensors']) == ['bmpp', 'bmpt', 'dsw1', 'dsw2']
+    save_data(all_data)
+    cached_data = load_data()
+    weather = dict(all_data['weather'], temp=None)
+
+    renderer = DisplayRenderer(config)
+    image = renderer.render(all_data, data_ages)
+
+    return [
+        ('load_all_data (fetch)', lambda: load_all_data(config, use_cache=True), remove_data_file),
+        ('load_all_data (cached)', lambda: load_all_data(config, use_cache=True), lambda: save_data(all_data)),
+        ('merge_data_with_cache', lambda: merge_data_with_cache(weather, cached_data, 'weather'), None),
+        ('render', lambda: renderer.render(all_data, data_ages), None),
+        ('get_buffer', lambda: renderer.get_buffer(image), None),
+        ('save_data', lambda: save_data(all_data), None)
+    ]
+
+def run_stages(config, number: int):
+    results = {}
+    for name, func, setup in get_stages(config):
+        # Warm-up call, lazily imported modules are not counted as stage memory
+        for _ in range(2):
+            if setup:
+                setup()
+            peak = measure_peak_memory(func)
+        elapsed = time_call(func, number=number, repeat=5, setup=setup)
+        results[name] = {'ms': round(elapsed, 4), 'peak_kib': round(peak, 1)}
+    return results
+
+def compare(results, baseline, tolerance: float) -> int:
+    """Prints results next to baseline, returns number of regressed stages"""
+    regressions = 0
+    print(f"{'stage':<24} {'ms':>9} {'base ms':>9} {'change':>8} {'peak KiB':>9} {'base KiB':>9}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<24} {result['ms']:>9.3f} {'-':>9} {'-':>8} {result['peak_kib']:>9.0f} {'-':>9}")
+            continue
+        change = result['ms'] / base['ms'] - 1 if base['ms'] else 0.0
+        marker = ''
+        if change > tolerance and result['ms'] - base['ms'] > MIN_REGRESSION_MS:
+            regressions += 1
+            marker = ' REGRESSION'
+        print(f"{name:<24} {result['ms']:>9.3f} {base['ms']:>9.3f} {change:>+7.0%} "
+              f"{result['peak_kib']:>9.0f} {base['peak_kib']:>9.0f}{marker}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline pipeline benchmark')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_FILE, help='baseline results file')
+    parser.add_argument('--save-baseline', action='store_true', help='store results as baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown against baseline, 0.25 is 25%%')
+    parser.add_argument('--number', type=int, default=10, help='calls per timing')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    server = FixtureServer(make_service_routes())
+    config = use_fixture_server(load_config(), server)
+    config['runtime']['httpCacheFile'] = None
+    config['history']['enabled'] = False
+
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Data files are written relative to working directory
+        os.chdir(temp_dir)
+        try:
+            results = run_stages(config, args.number)
+        finally:
+            os.chdir(previous_dir)
+            server.close()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"{regressions} stages regressed by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Replays one day of 5 minute cycles with noisy sensors and one stale value, comparing
+panel refreshes of the previous rule with the refresh policy using example values:
+    python benchmarks/bench_refresh_policy.py
+
+Previous rule: any changed pixel refreshes the panel, partially if the change is small,
+and every full refresh clears the panel first while any value is old. On panels with partial
+refresh the policy spends some panel time on forced full refreshes against ghosting.
+"""
+import copy
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import EXAMPLE_REFRESH_POLICY, SAMPLE_DATA, SAMPLE_AGES, load_config
+
+from display_renderer import DisplayRenderer
+from frame_diff import FrameDiffer, choose_refresh, get_region_area, REFRESH_SKIP, REFRESH_PARTIAL, REFRESH_FULL
+from refresh_policy import RefreshPolicy, RefreshDecision
+
+CYCLES = 288
+CYCLE = 300
+# Typical panel times in seconds, used to estimate time the panel is busy
+REFRESH_TIMES = {REFRESH_SKIP: 0.0, REFRESH_PARTIAL: 0.5, REFRESH_FULL: 15.0, 'clear': 15.0}
+
+def simulate_day(seed: int = 2619):
+    """Yields (time, data) of every cycle, values drift with sensor noise"""
+    rng = random.Random(seed)
+    data = copy.deepcopy(SAMPLE_DATA)
+    start = time.mktime((2026, 10, 18, 0, 0, 0, 0, 0, -1))
+    for cycle in range(CYCLES):
+        sensors = data['sensors']
+        for key, noise in (('dsw1', 0.06), ('dsw2', 0.06), ('bmpt', 0.04), ('bmpp', 0.3)):
+            sensors[key] = round(sensors[key] + rng.gauss(0, noise), 2)
+        if cycle % 2 == 0:
+            data['weather']['temp'] = round(data['weather']['temp'] + rng.gauss(0, 0.1), 2)
+        btc = data['kucoin']['BTC-USDC']
+        btc['last'] = round(btc['last'] * (1 + rng.gauss(0, 0.0005)), 1)
+        yield start + cycle * CYCLE, copy.deepcopy(data)
+
+def previous_rule(region, size, partial_supported, partial_area, has_old_data):
+    refresh_type = choose_refresh(region, size, partial_supported, partial_area)
+    return RefreshDecision(refresh_type, refresh_type == REFRESH_FULL and has_old_data)
+
+def run(config, use_policy: bool):
+    renderer = DisplayRenderer(config)
+    differ = FrameDiffer(frame_file=None, stats_file=None)
+    policy = RefreshPolicy(config, state_file=None)
+    counts = {REFRESH_SKIP: 0, REFRESH_PARTIAL: 0, REFRESH_FULL: 0, 'clear': 0}
+    partial_area = config['display']['partialRefreshArea']
+    changed_area = 0.0
+    streak = longest_streak = 0
+    for now, data in simulate_day():
+        renderer._format_datetime = lambda fmt, now=now: time.strftime(fmt, time.localtime(now))
+        display_data = policy.apply_deadbands(data) if use_policy else data
+        image = renderer.render(display_data, SAMPLE_AGES)
+        region = differ.get_changed_region(image)
+        if region is not None:
+            changed_area += get_region_area(region, image.size)
+        if use_policy:
+            decision = policy.decide(region, image.size, renderer.supports_partial_refresh, now)
+        else:
+            decision = previous_rule(region, image.size, renderer.supports_partial_refresh(), partial_area,
+                                     renderer.has_old_data(SAMPLE_AGES))
+        counts[decision.refresh_type] += 1
+        counts['clear'] += decision.clear
+        streak = streak + 1 if decision.refresh_type == REFRESH_PARTIAL else 0
+        longest_streak = max(longest_streak, streak)
+        differ.record(image, decision.refresh_type)
+        policy.record(decision, display_data, now)
+    busy = sum(REFRESH_TIMES[name] * count for name, count in counts.items())
+    return {'counts': counts, 'busy': busy, 'area': changed_area / CYCLES, 'streak': longest_streak}
+
+def main():
+    print(f"{CYCLES} cycles of {CYCLE} s")
+    print(f"{'panel':<12} {'rule':<9} {'skip':>5} {'partial':>8} {'full':>5} {'clear':>6} {'busy s':>7} "
+          f"{'area':>6} {'partials in row':>16}")
+    for panel, partial_refresh in (('full only', False), ('partial', True)):
+        config = load_config(headless={'output': 'none', 'partialRefresh': partial_refresh})
+        config['display']['refreshPolicy'].update(EXAMPLE_REFRESH_POLICY)
+        results = {}
+        for rule, use_policy in (('previous', False), ('policy', True)):
+            result = results[rule] = run(config, use_policy)
+            counts = result['counts']
+            print(f"{panel:<12} {rule:<9} {counts[REFRESH_SKIP]:>5} {counts[REFRESH_PARTIAL]:>8} "
+                  f"{counts[REFRESH_FULL]:>5} {counts['clear']:>6} {result['busy']:>7.0f} "
+                  f"{result['area']:>6.1%} {result['streak']:>16}")
+
+        if not partial_refresh:
+            assert results['policy']['busy'] < results['previous']['busy'], "Policy did not save panel time"
+        assert results['policy']['area'] < results['previous']['area'], "Deadbands did not shrink changes"
+        assert results['policy']['streak'] <= config['display']['refreshPolicy']['maxPartialRefreshes']
+
+if __name__ == '__main__':
+    main()
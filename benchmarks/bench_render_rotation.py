@@ -0,0 +1,34 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Compares render cost of unrotated and rotated frames, drawn natively in panel
+orientation and with the full-frame rotate, and checks they are pixel-identical:
+    python benchmarks/bench_render_rotation.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import SAMPLE_DATA, SAMPLE_AGES, load_config, time_call
+
+from display_renderer import DisplayRenderer
+
+def main():
+    print(f"{'mode':<5} {'rotation':>8} {'native ms':>10} {'rotate ms':>10}")
+    for mode in ('RGB', 'P'):
+        for rotation in (0, 90, 180, 270):
+            native = DisplayRenderer(load_config(epdColourMode=mode, epdDisplayRotation=rotation))
+            legacy = DisplayRenderer(load_config(epdColourMode=mode, epdDisplayRotation=rotation))
+            legacy.native_rotation = False
+
+            native_frame = native.render(SAMPLE_DATA, SAMPLE_AGES)
+            legacy_frame = legacy.render(SAMPLE_DATA, SAMPLE_AGES)
+            assert native_frame.size == legacy_frame.size, f"Frame size differs for rotation {rotation}"
+            assert native_frame.tobytes() == legacy_frame.tobytes(), f"Frame differs for rotation {rotation}"
+
+            native_ms = time_call(lambda: native.render(SAMPLE_DATA, SAMPLE_AGES), number=50)
+            legacy_ms = time_call(lambda: legacy.render(SAMPLE_DATA, SAMPLE_AGES), number=50)
+            print(f"{mode:<5} {rotation:>8} {native_ms:>10.3f} {legacy_ms:>10.3f}")
+    print("Native frames are pixel-identical to rotated frames")
+
+if __name__ == '__main__':
+    main()
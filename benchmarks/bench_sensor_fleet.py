@@ -0,0 +1,119 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Discovers and polls fleets of stand-in wifiiot sensors on loopback addresses:
+    python benchmarks/bench_sensor_fleet.py
+
+Every device is an HTTP server on its own 127.0.1.x address answering after a delay
+like an ESP board. The fleet is found by sweeping 127.0.1.0/24, then polled serially,
+one device after another, and with bounded concurrency of fetch_services.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import load_config
+
+import circuit_breaker
+import sensor_registry
+from data_loader import fetch_services, _group_results
+from sensor_registry import SensorRegistry, apply_sensor_registry, get_sensor_service_keys
+from services.sensor_service import fetch_sensor_data
+
+FLEET_SIZES = [8, 32, 128, 250]
+SUBNET = '127.0.1.0/24'
+RESPONSE_DELAY = 0.02
+POLL_WORKERS = 32
+
+class SensorFleet:
+    """Stand-in sensors answering 'key:value;' text, all with the same value keys"""
+
+    def __init__(self, size: int):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if self.path != '/sensors':
+                    self.send_error(404)
+                    return
+                time.sleep(RESPONSE_DELAY)
+                index = int(self.connection.getsockname()[0].rsplit('.', 1)[1])
+                body = f"t:{20 + index / 100:.2f};h:{40 + index % 50};".encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.servers = []
+        self.port = 0
+        for index in range(1, size + 1):
+            httpd = ThreadingHTTPServer((f'127.0.1.{index}', self.port), Handler)
+            httpd.daemon_threads = True
+            self.port = httpd.server_address[1]
+            threading.Thread(target=httpd.serve_forever, daemon=True).start()
+            self.servers.append(httpd)
+
+    def close(self):
+        for httpd in self.servers:
+            httpd.shutdown()
+            httpd.server_close()
+
+def make_config(fleet: SensorFleet, temp_dir: str):
+    config = load_config()
+    config['runtime'].update(httpCacheFile=None, fetchWorkers=POLL_WORKERS,
+                             breakerFile=os.path.join(temp_dir, 'breaker_state.json'))
+    config['services'] = {}
+    config['sensorDiscovery'] = {'enabled': True, 'subnets': [SUBNET], 'port': fleet.port,
+                                 'cacheFile': os.path.join(temp_dir, 'sensor_devices.json'),
+                                 'sweepTimeout': 200, 'sweepWorkers': 64}
+    return config
+
+def main():
+    print(f"{'devices':>7} {'sweep ms':>9} {'serial ms':>10} {'bounded ms':>11} {'values':>7}")
+    rows = []
+    for size in FLEET_SIZES:
+        fleet = SensorFleet(size)
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                config = make_config(fleet, temp_dir)
+                sensor_registry._registry = None
+                circuit_breaker._breakers = None
+                start = time.perf_counter()
+                apply_sensor_registry(config)
+                sweep = time.perf_counter() - start
+                service_keys = get_sensor_service_keys(config)
+                assert len(service_keys) == size, f"Found {len(service_keys)} of {size} devices"
+
+                cached = SensorRegistry(config['sensorDiscovery'])
+                assert not cached.is_stale() and len(cached.devices) == size, "Devices were not cached"
+
+                start = time.perf_counter()
+                for service_key in service_keys:
+                    fetch_sensor_data(config, service_key)
+                serial = time.perf_counter() - start
+
+                start = time.perf_counter()
+                results = fetch_services(config, service_keys)
+                bounded = time.perf_counter() - start
+                sensors = _group_results(config, results)['sensors']
+                assert len(sensors) == 2 * size, "Values of devices overwrote each other"
+                assert all(value is not None for value in sensors.values())
+        finally:
+            fleet.close()
+        rows.append((size, serial, bounded))
+        print(f"{size:>7} {sweep * 1000:>9.0f} {serial * 1000:>10.0f} {bounded * 1000:>11.0f} {len(sensors):>7}")
+
+    (small, small_serial, small_bounded), (large, large_serial, large_bounded) = rows[0], rows[-1]
+    print(f"{large / small:.0f}x devices: serial {large_serial / small_serial:.1f}x, "
+          f"bounded {large_bounded / small_bounded:.1f}x cycle time")
+    assert large_bounded / small_bounded < large / small, "Bounded polling did not grow sub-linearly"
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Measures latency from a sensor pushing a reading to the daemon deciding to redraw:
+    python benchmarks/bench_sensor_push.py
+
+Readings are POSTed to the ingest listener from another thread while the main thread
+runs the daemon loop body: wait, drain, merge, compare deadbanded state and render.
+With polling the same change waits half of refreshInterval on average.
+"""
+import copy
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import (EXAMPLE_REFRESH_POLICY, FixtureServer, load_config, make_service_routes, time_call,
+                    use_fixture_server)
+
+from data_loader import load_all_data, merge_results
+from data_storage import strip_metadata
+from display_renderer import DisplayRenderer
+from frame_diff import REFRESH_FULL
+from refresh_policy import RefreshPolicy, RefreshDecision
+from sensor_ingest import SensorIngest
+from services.sensor_service import fetch_sensor_data
+
+PUSHES = 20
+DEBOUNCE = 50
+
+def post_reading(url: str, text: str) -> int:
+    request = urllib.request.Request(url, data=text.encode('utf-8'), method='POST')
+    with urllib.request.urlopen(request) as response:
+        return response.status
+
+def main():
+    server = FixtureServer(make_service_routes())
+    config = use_fixture_server(load_config(), server)
+    config['runtime'].update(httpCacheFile=None, breakerFile=None)
+    config['ingest'] = {'enabled': True, 'debounce': DEBOUNCE}
+    config['display']['refreshPolicy'].update(EXAMPLE_REFRESH_POLICY)
+
+    ingest = SensorIngest(config)
+    assert ingest.start_server(0)
+    push_url = f"http://127.0.0.1:{ingest.server.server_address[1]}/sensors/wifiiot_sensors_1"
+    try:
+        renderer = DisplayRenderer(config)
+        policy = RefreshPolicy(config, state_file=None)
+        all_data, data_ages = load_all_data(config, use_cache=False)
+        drawn_state = copy.deepcopy(strip_metadata(policy.apply_deadbands(all_data)))
+
+        latencies = []
+        redraws = 0
+        for push in range(PUSHES):
+            # Every other reading moves within the deadband of dsw1 and must not redraw
+            significant = push % 2 == 0
+            value = all_data['sensors']['dsw1'] + (1.0 if significant else 0.01)
+            sent = []
+            sender = threading.Thread(target=lambda: (sent.append(time.perf_counter()),
+                                                      post_reading(push_url, f"dsw1:{value:.2f};dsw2:12.25")))
+            sender.start()
+            assert ingest.wait(5.0), "Pushed reading did not wake the daemon"
+            readings = ingest.drain()
+            merge_results(config, all_data, data_ages, readings)
+            state = strip_metadata(policy.apply_deadbands(all_data))
+            redrawn = state != drawn_state
+            if redrawn:
+                renderer.render(state, data_ages)
+                drawn_state = copy.deepcopy(state)
+                redraws += 1
+                latencies.append(time.perf_counter() - sent[0])
+            sender.join()
+            assert all_data['sensors']['dsw1'] == round(value, 2), "Reading was not merged"
+            assert redrawn == significant, f"Reading {value:.2f} {'did not redraw' if significant else 'redrew'}"
+            if redrawn:
+                policy.record(RefreshDecision(REFRESH_FULL), state)
+
+        rejected = urllib.request.Request(push_url.replace('wifiiot_sensors_1', 'unknown'), data=b'x:1', method='POST')
+        try:
+            urllib.request.urlopen(rejected)
+            raise AssertionError("Reading of unknown service was accepted")
+        except urllib.error.HTTPError as e:
+            assert e.code == 404
+
+        latencies.sort()
+        interval = config['services']['wifiiot_sensors_1']['refreshInterval'] / 1000.0
+        print(f"{PUSHES} pushed readings, {redraws} redraws, debounce {DEBOUNCE} ms")
+        print(f"Push to redraw decision, ms: median {latencies[len(latencies) // 2] * 1000:.1f}, "
+              f"max {latencies[-1] * 1000:.1f}")
+        print(f"Polling every {interval:.0f} s: {interval / 2:.0f} s on average, {interval:.0f} s at worst")
+        print("Cost per reading, ms:")
+        print(f"  poll round trip  {time_call(lambda: fetch_sensor_data(config, 'wifiiot_sensors_1')):.3f}")
+        print(f"  ingest           {time_call(lambda: ingest.ingest('wifiiot_sensors_1', 'dsw1:4.50;dsw2:12.25')):.3f}")
+        assert redraws == PUSHES // 2
+        assert latencies[-1] < 1.0, "Pushed reading took longer than a second to reach the renderer"
+    finally:
+        ingest.stop()
+        server.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Times history widgets: NumPy bucket downsampling against the per-point loop,
+and frames with sparkline, minmax and trend items with warm and cold caches:
+    python benchmarks/bench_sparkline.py
+"""
+import math
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import SAMPLE_DATA, SAMPLE_AGES, load_config, time_call
+
+import sparkline
+from display_renderer import DisplayRenderer
+from history_store import HistoryStore
+
+DAYS = 3
+STEP = 60
+WIDTH = 120
+HISTORY_LINE = {
+    "startX": 5,
+    "afterY": 30,
+    "items": [
+        {"type": "sparkline", "key": "bmpp", "window": DAYS * 24 * 3600 * 1000, "width": WIDTH,
+         "height": 20, "colour": "BLACK", "startY": 0, "afterX": 4},
+        {"type": "minmax", "key": "bmpp", "window": DAYS * 24 * 3600 * 1000, "width": WIDTH,
+         "font": "font15", "colour": "BLACK", "startY": 0, "suffix": " "},
+        {"type": "trend", "key": "bmpp", "window": 3 * 3600 * 1000, "threshold": 0.5,
+         "font": "font18", "colour": "RED", "startY": 0}
+    ]
+}
+
+def compare_downsample(rows, start, end):
+    """Checks NumPy and per-point downsampling agree and times both"""
+    numpy_module = sparkline.np
+    try:
+        vectorized = sparkline.downsample(rows, start, end, WIDTH)
+        vectorized_ms = time_call(lambda: sparkline.downsample(rows, start, end, WIDTH))
+        vectorized_mask = sparkline.render_sparkline(vectorized, WIDTH, 20)
+        sparkline.np = None
+        looped = sparkline.downsample(rows, start, end, WIDTH)
+        looped_ms = time_call(lambda: sparkline.downsample(rows, start, end, WIDTH))
+        looped_mask = sparkline.render_sparkline(looped, WIDTH, 20)
+    finally:
+        sparkline.np = numpy_module
+
+    assert list(vectorized.counts) == looped.counts, "Bucket counts differ"
+    for name in ('mins', 'maxs', 'means'):
+        assert all(abs(a - b) < 1e-9 for a, b in zip(getattr(vectorized, name), getattr(looped, name))), name
+    assert vectorized_mask.tobytes() == looped_mask.tobytes(), "Sparkline masks differ"
+    print(f"downsample {len(rows)} rows to {WIDTH} buckets: numpy {vectorized_ms:.3f} ms, "
+          f"loop {looped_ms:.3f} ms")
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        history = HistoryStore(os.path.join(temp_dir, 'history.db'))
+        end = time.time()
+        start = end - DAYS * 24 * 3600
+        for ts in range(int(start), int(end), STEP):
+            history.record({'sensors.bmpp': 1010 + 8 * math.sin(ts / 20000.0)}, ts)
+        history.compact(end)
+
+        compare_downsample(history.query('sensors.bmpp', start, end), start, end)
+
+        config = load_config()
+        config['dashboard']['lines'] = [HISTORY_LINE] + config['dashboard']['lines']
+        renderer = DisplayRenderer(config, history)
+        renderer.render(SAMPLE_DATA, SAMPLE_AGES)
+
+        def render_cold():
+            history.version += 1
+            renderer.render(SAMPLE_DATA, SAMPLE_AGES)
+
+        warm_ms = time_call(lambda: renderer.render(SAMPLE_DATA, SAMPLE_AGES))
+        cold_ms = time_call(render_cold)
+        print(f"frame with history widgets: cached {warm_ms:.3f} ms, after new samples {cold_ms:.3f} ms")
+        history.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Checks startup cost of cron runs against the budget:
+    python benchmarks/bench_startup.py
+
+Import time of epaper_dashboard_v1 is measured in fresh interpreters and must fit
+runtime.startupBudget. Cron runs are then replayed on fresh cached data to check which
+lazy modules each one loads: no run may import requests, and the display driver
+may only be imported when the panel is refreshed, not when the frame is unchanged or
+the refresh policy skips a changed frame. Exits with status 1 on failure.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import FAKE_DRIVER_DIR, REPO_DIR, FixtureServer, load_config, make_service_routes, use_fixture_server
+
+from data_loader import load_all_data
+from data_storage import save_data
+from startup import measure_import_times, format_startup_report, get_startup_stats, check_startup, LAZY_MODULES
+
+# Runs run_once in a fresh interpreter and prints lazy modules it loaded
+RUN_ONCE_SCRIPT = """
+import sys, json
+sys.path[:0] = [{repo!r}, {driver!r}]
+import epaper_dashboard_v1
+from startup import is_loaded
+epaper_dashboard_v1.run_once('config.json')
+print(json.dumps(sorted(name for name in {lazy!r} if is_loaded(name))))
+"""
+
+def run_cron(config_path: str) -> list:
+    script = RUN_ONCE_SCRIPT.format(repo=REPO_DIR, driver=FAKE_DRIVER_DIR, lazy=LAZY_MODULES)
+    result = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(config_path),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+def check_cron_runs() -> bool:
+    """Replays cron runs on fresh cached data, returns False if a stage imported too much"""
+    server = FixtureServer(make_service_routes())
+    config = use_fixture_server(load_config(epdDisplayType='epd2in15g'), server)
+    config['runtime']['httpCacheFile'] = None
+    # History widgets need NumPy while rendering, that is expected and not checked here
+    config['history']['enabled'] = False
+
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        try:
+            all_data, _ = load_all_data(config, use_cache=False)
+            save_data(all_data)
+        finally:
+            os.chdir(previous_dir)
+            server.close()
+        config_path = os.path.join(temp_dir, 'config.json')
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+
+        changed = run_cron(config_path)
+        unchanged = run_cron(config_path)
+        if 'waveshare_epd' in unchanged:
+            # Clock line changes every minute, a frame drawn across the boundary did change
+            unchanged = run_cron(config_path)
+
+        # Without the last frame the whole frame changed, but the refresh done above spent the budget
+        config['display']['refreshPolicy']['dailyRefreshBudget'] = 1
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        os.remove(os.path.join(temp_dir, 'last_frame.png'))
+        skipped = run_cron(config_path)
+
+    print(f"  cron run, frame changed:   {', '.join(changed) or 'no lazy modules'}")
+    print(f"  cron run, frame unchanged: {', '.join(unchanged) or 'no lazy modules'}")
+    print(f"  cron run, refresh skipped: {', '.join(skipped) or 'no lazy modules'}")
+    return ('requests' not in changed and 'waveshare_epd' in changed
+            and 'requests' not in unchanged and 'waveshare_epd' not in unchanged
+            and 'requests' not in skipped and 'waveshare_epd' not in skipped)
+
+def main():
+    budget = load_config()['runtime'].get('startupBudget')
+    # Best of several runs, single runs are disturbed by disk cache and scheduling
+    runs = [measure_import_times() for _ in range(5)]
+    entries = min(runs, key=lambda run: get_startup_stats(run)['total_ms'])
+    print(format_startup_report(entries, budget))
+
+    ok = check_startup(entries, budget)
+    print("Lazy imports:")
+    ok = check_cron_runs() and ok
+    print("Startup within budget" if ok else "Startup check FAILED")
+    if not ok:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Checks values composed from glyph sprites against ImageDraw.text for the shipped fonts:
+    python benchmarks/bench_text_cache.py
+
+For every configured font in both font modes the glyph check of TextCache is run and
+timed. Then prices, temperatures and percentages are drawn with the text cache, and every
+one of them has to be pixel-identical to the text drawn whole. Counts of values that
+would differ if glyphs were composed regardless of the check are shown for comparison.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import load_config
+
+from PIL import ImageFont
+import text_cache
+from text_cache import TextCache, merge_sprites, rasterize_text
+from display_renderer import fontsdir
+
+VALUES = 300
+
+def get_values(seed: int = 2619):
+    """Returns texts like the values drawn on the dashboard"""
+    rng = random.Random(seed)
+    values = []
+    for _ in range(VALUES // 3):
+        values.append(f"${rng.randint(10, 99999)}")
+        values.append(f"{rng.uniform(-30, 40):.2f}")
+        values.append(f"{rng.randint(0, 100)}%")
+    return values
+
+def is_drawn_whole(cache: TextCache, font, text: str, fontmode: str) -> bool:
+    """Checks if sprites of text equal text rasterized by ImageDraw.text"""
+    composed = merge_sprites(cache.get_text_sprites(font, text, '', fontmode))
+    whole = rasterize_text(font, text, fontmode)
+    return ((composed.offset_x, composed.offset_y) == (whole.offset_x, whole.offset_y)
+            and composed.mask.tobytes() == whole.mask.tobytes())
+
+def main():
+    config = load_config()
+    values = get_values()
+    print(f"{'font':<8} {'mode':<5} {'glyphs match':>12} {'check ms':>9} {'differ if composed':>19}")
+    failed = []
+    for font_name, (font_file, size) in config['fonts'].items():
+        font = ImageFont.truetype(os.path.join(fontsdir, font_file), size)
+        for fontmode in ('L', '1'):
+            cache = TextCache()
+            start = time.perf_counter()
+            match = cache.glyphs_match(font, fontmode)
+            elapsed = (time.perf_counter() - start) * 1000.0
+            failed += [(font_name, fontmode, text) for text in values
+                       if not is_drawn_whole(cache, font, text, fontmode)]
+
+            # Glyphs composed without the check, as before it was added
+            forced = TextCache()
+            forced.set_glyphs_match(font, fontmode, True)
+            differ = sum(not is_drawn_whole(forced, font, text, fontmode) for text in values)
+            forced.set_glyphs_match(font, fontmode, match)
+            print(f"{font_name:<8} {fontmode:<5} {str(match):>12} {elapsed:>9.1f} {differ:>19}")
+    text_cache._glyph_fonts.clear()
+
+    assert not failed, f"Values differ from ImageDraw.text: {failed[:5]}"
+    print(f"All {len(values)} values of every font are equal to ImageDraw.text")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Compares per-value configuration lookups with compiled service decoders:
+    python benchmarks/bench_value_decoder.py
+
+Best times swing with load of the machine, so the ratio of alternating runs is printed too.
+Both are bound by float() and round() of the values rather than by configuration lookups.
+"""
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from common import load_config, time_call
+
+from services.sensor_service import parse_sensor_text
+from services.value_decoder import compile_decoder
+
+DEVICES = 50
+RATIO_RUNS = 300
+SENSOR_TEXT = 'dsw1:4.50;dsw2:12.25;bmpt:21.00;bmpp:1011.30;hum:45;state:ok'
+SENSOR_DATA = {
+    'dsw1': {'path': 'dsw1', 'type': 'float', 'round': 2},
+    'dsw2': {'path': 'dsw2', 'type': 'float', 'round': 2},
+    'bmpt': {'path': 'bmpt', 'type': 'float', 'round': 2},
+    'bmpp': {'path': 'bmpp', 'type': 'float', 'round': 1},
+    'hum': {'path': 'hum', 'type': 'int'},
+    'state': {'path': 'state', 'type': 'string'}
+}
+
+def format_value(value, value_config):
+    """Previous sensor_service.format_value, configuration is read for every value"""
+    if not value:
+        return None
+    value_type = value_config.get('type', 'string')
+    try:
+        if value_type == 'int':
+            return int(float(value))
+        elif value_type == 'float':
+            result = float(value)
+            if 'round' in value_config:
+                return round(result, value_config['round'])
+            return result
+    except (ValueError, TypeError):
+        pass
+    return str(value)
+
+def main():
+    load_config()
+    devices = [{f"{key}_{device}": dict(value_config) for key, value_config in SENSOR_DATA.items()}
+               for device in range(DEVICES)]
+    decoders = [compile_decoder(f"wifiiot_{device}", data_config) for device, data_config in enumerate(devices)]
+    parsed = parse_sensor_text(SENSOR_TEXT)
+
+    # Every device is fetched as its own service, so each gets its own values
+    def run_format():
+        results = []
+        for data_config in devices:
+            result = {}
+            for key, value_config in data_config.items():
+                path = value_config.get('path', key)
+                if path in parsed:
+                    result[key] = format_value(parsed[path], value_config)
+            results.append(result)
+        return results
+
+    def run_decoder():
+        return [decoder.decode(parsed, flat=True) for decoder in decoders]
+
+    assert run_format() == run_decoder(), "Decoders give different values"
+
+    print(f"{DEVICES} devices x {len(SENSOR_DATA)} values")
+    for name, func in [('format_value', run_format), ('decoder', run_decoder)]:
+        print(f"{name:<13} {time_call(func, number=20, repeat=200) * 1000:8.1f} us")
+    # Runs alternate, so that load of the machine affects both alike
+    ratios = [time_call(run_decoder, number=5, repeat=1) / time_call(run_format, number=5, repeat=1)
+              for _ in range(RATIO_RUNS)]
+    print(f"decoder time / format_value time, median of {RATIO_RUNS} alternating runs: "
+          f"{statistics.median(ratios):.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import os
+import sys
+import json
+import time
+from typing import Dict, Any, Callable
+
+BENCH_DIR = os.path.dirname(os.path.realpath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+FAKE_DRIVER_DIR = os.path.join(BENCH_DIR, 'fake_driver')
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+SAMPLE_DATA = {
+    'weather': {'temp': 5.23, 'feels_like': 2.0, 'humidity': 81, 'pressure': 1012, 'wind_speed': 3.5,
+                'wind_deg': 200, 'clouds': 75, 'description': 'пахмурна', 'sunrise': 1760760000,
+                'sunset': 1760797000, 'weather_icon': '04d'},
+    'kucoin': {'BTC-USDC': {'last': 67012, 'change_rate': 0.01, 'change_price': 670.0},
+               'LTC-USDC': {'last': 70, 'change_rate': -0.02, 'change_price': -1.4},
+               'LINK-USDC': {'last': 12.34, 'change_rate': 0.0, 'change_price': 0.0},
+               'SOL-USDC': {'last': 150.5, 'change_rate': 0.03, 'change_price': 4.5}},
+    'sensors': {'dsw1': 4.5, 'dsw2': 12.25, 'bmpt': 21.0, 'bmpp': 1011.3}
+}
+SAMPLE_AGES = {'weather': {'temp': 0.0}, 'kucoin': {}, 'sensors': {'dsw1': 10 ** 9}}
+
+HEADLESS_DISPLAY = {'epdDisplayType': 'headless', 'headless': {'output': 'none'}}
+# Example values of refresh_policy.py, the configuration ships neutral ones
+EXAMPLE_REFRESH_POLICY = {
+    'deadbands': {'sensors': 0.1, 'sensors.bmpp': 0.5, 'weather.temp': 0.2, 'kucoin.BTC-USDC': 50},
+    'clearEvery': 24,
+    'dailyRefreshBudget': 288
+}
+
+def use_fake_driver():
+    """Uses stand-in waveshare driver when the real one is not installed"""
+    try:
+        import waveshare_epd.epd2in15g
+    except (ImportError, RuntimeError, OSError):
+        sys.path.insert(0, FAKE_DRIVER_DIR)
+        for name in list(sys.modules):
+            if name.startswith('waveshare_epd'):
+                del sys.modules[name]
+
+def load_config(**display_overrides) -> Dict[str, Any]:
+    """Loads repository configuration with display overrides.
+    Display is headless without frame files or refresh waits unless overridden,
+    and no glyph or icon atlas is written."""
+    with open(os.path.join(REPO_DIR, 'dashboard.config.json'), 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config['display'].update(HEADLESS_DISPLAY)
+    config['display'].update(display_overrides)
+    config['layout']['glyphAtlasFile'] = None
+    config['layout']['iconAtlasFile'] = None
+    return config
+
+def time_call(func: Callable, number: int = 20, repeat: int = 5, setup: Callable = None) -> float:
+    """Returns best time of one call in milliseconds.
+    setup is called before every call and is not timed."""
+    best = None
+    for _ in range(repeat):
+        elapsed = 0.0
+        if setup is None:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            elapsed = time.perf_counter() - start
+        else:
+            for _ in range(number):
+                setup()
+                start = time.perf_counter()
+                func()
+                elapsed += time.perf_counter() - start
+        elapsed /= number
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000.0
+
+class FixtureServer:
+    """Local stand-in HTTP server answering GET requests from fixtures.
+    routes maps path to bytes or to function(query) -> bytes.
+    With etags responses carry ETag and matching If-None-Match is answered with 304."""
+
+    def __init__(self, routes: Dict[str, Any], etags: bool = False):
+        import hashlib
+        import threading
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        from urllib.parse import urlsplit, parse_qs
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately, Nagle would delay kept-alive responses
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                server.connections += 1
+                super().setup()
+
+            def do_GET(self):
+                server.requests += 1
+                parts = urlsplit(self.path)
+                route = routes.get(parts.path)
+                if route is None:
+                    self.send_error(404)
+                    return
+                body = route(parse_qs(parts.query)) if callable(route) else route
+                if etags:
+                    etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+                    if self.headers.get('If-None-Match') == etag:
+                        self.send_response(304)
+                        self.send_header('ETag', etag)
+                        self.end_headers()
+                        return
+                self.send_response(200)
+                if etags:
+                    self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                server.bytes_sent += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.requests = 0
+        self.connections = 0
+        self.bytes_sent = 0
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        # Clients which stop reading early reset connections, that is expected
+        self.httpd.handle_error = lambda request, client_address: None
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def reset_counters(self):
+        self.requests = 0
+        self.connections = 0
+        self.bytes_sent = 0
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def measure_peak_memory(func: Callable) -> float:
+    """Returns peak Python memory allocated by one call in KiB"""
+    import tracemalloc
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024.0
+    finally:
+        tracemalloc.stop()
+
+def read_fixture(name: str) -> bytes:
+    """Reads recorded response, gzipped fixtures are decompressed"""
+    import gzip
+    path = os.path.join(FIXTURES_DIR, name)
+    opener = gzip.open if name.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        return f.read()
+
+def make_kucoin_routes() -> Dict[str, Any]:
+    """Routes of KuCoin allTickers and per-symbol stats answered from allTickers fixture"""
+    all_tickers = read_fixture('kucoin_all_tickers.json.gz')
+    tickers = {ticker['symbol']: ticker for ticker in json.loads(all_tickers)['data']['ticker']}
+
+    def stats_route(query):
+        ticker = dict(tickers[query['symbol'][0]], time=1760781600000)
+        return json.dumps({'code': '200000', 'data': ticker}).encode('utf-8')
+
+    return {
+        '/api/v1/market/allTickers': all_tickers,
+        '/api/v1/market/stats': stats_route
+    }
+
+def make_service_routes() -> Dict[str, Any]:
+    """Routes of every configured service answered from fixtures"""
+    routes = make_kucoin_routes()
+    routes['/data/2.5/weather'] = read_fixture('openweathermap_weather.json')
+    routes['/wifiiot_sensors_1/sensors'] = read_fixture('wifiiot_sensors_1.txt')
+    routes['/wifiiot_sensors_2/sensors'] = read_fixture('wifiiot_sensors_2.txt')
+    return routes
+
+def use_fixture_server(config: Dict[str, Any], server: 'FixtureServer') -> Dict[str, Any]:
+    """Points service URLs of configuration to fixture server"""
+    services = config['services']
+    services['weather']['url'] = f"{server.url}/data/2.5/weather?units=metric"
+    services['kucoin']['url'] = f"{server.url}/api/v1/market/allTickers"
+    services['kucoin']['symbolUrl'] = f"{server.url}/api/v1/market/stats"
+    for service_key in ('wifiiot_sensors_1', 'wifiiot_sensors_2'):
+        services[service_key]['url'] = f"{server.url}/{service_key}/sensors"
+    return config
@@ -0,0 +1,61 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+# Stand-in for the waveshare epd2in15g driver used by benchmarks on machines
+# without a panel. getbuffer follows the driver implementation.
+import logging
+from PIL import Image
+from . import epdconfig
+
+EPD_WIDTH = 160
+EPD_HEIGHT = 296
+
+logger = logging.getLogger(__name__)
+
+class EPD:
+    def __init__(self):
+        self.width = EPD_WIDTH
+        self.height = EPD_HEIGHT
+        self.BLACK = 0x000000
+        self.WHITE = 0xffffff
+        self.YELLOW = 0x00ffff
+        self.RED = 0x0000ff
+        self.frames = []
+
+    def init(self):
+        return epdconfig.module_init()
+
+    def getbuffer(self, image):
+        # Create a pallette with the 4 colors supported by the panel
+        pal_image = Image.new("P", (1, 1))
+        pal_image.putpalette((0, 0, 0, 255, 255, 255, 255, 255, 0, 255, 0, 0) + (0, 0, 0) * 252)
+
+        # Check if we need to rotate the image
+        imwidth, imheight = image.size
+        if imwidth == self.width and imheight == self.height:
+            image_temp = image
+        elif imwidth == self.height and imheight == self.width:
+            image_temp = image.rotate(90, expand=True)
+        else:
+            logger.warning("Invalid image dimensions: %d x %d, expected %d x %d" % (imwidth, imheight, self.width, self.height))
+            image_temp = image
+
+        # Convert the soruce image to the 4 colors, dithering if needed
+        image_4color = image_temp.convert("RGB").quantize(palette=pal_image)
+        buf_4color = bytearray(image_4color.tobytes('raw'))
+
+        # into a single byte to transfer to the panel
+        buf = [0x00] * int(self.width * self.height / 4)
+        idx = 0
+        for i in range(0, len(buf_4color), 4):
+            buf[idx] = (buf_4color[i] << 6) + (buf_4color[i + 1] << 4) + (buf_4color[i + 2] << 2) + buf_4color[i + 3]
+            idx += 1
+        return buf
+
+    def display(self, image):
+        self.frames.append(bytes(image))
+
+    def Clear(self, color=0x55):
+        pass
+
+    def sleep(self):
+        pass
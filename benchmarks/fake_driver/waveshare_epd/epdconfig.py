@@ -0,0 +1,9 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+# Stand-in for the waveshare epdconfig module, no GPIO or SPI is touched
+
+def module_init():
+    return 0
+
+def module_exit(cleanup=False):
+    pass
@@ -0,0 +1,60 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Writes kucoin_all_tickers.json.gz with the layout of a real allTickers response.
+
+A live response can be recorded instead with:
+    curl -s https://api.kucoin.com/api/v1/market/allTickers | gzip > benchmarks/fixtures/kucoin_all_tickers.json.gz
+"""
+import gzip
+import json
+import os
+import random
+
+FIXTURE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'kucoin_all_tickers.json.gz')
+TICKER_COUNT = 1300
+# Configured pairs are spread over the list like in the live response
+PAIR_POSITIONS = {'BTC-USDC': 212, 'LTC-USDC': 488, 'LINK-USDC': 631, 'SOL-USDC': 904}
+
+def make_ticker(rng: random.Random, symbol: str) -> dict:
+    last = rng.uniform(0.0001, 70000)
+    change_rate = rng.uniform(-0.1, 0.1)
+    vol = rng.uniform(10, 10 ** 7)
+    return {
+        'symbol': symbol,
+        'symbolName': symbol,
+        'buy': f"{last * 0.9995:.8g}",
+        'bestBidSize': f"{rng.uniform(0.01, 1000):.4f}",
+        'sell': f"{last * 1.0005:.8g}",
+        'bestAskSize': f"{rng.uniform(0.01, 1000):.4f}",
+        'changeRate': f"{change_rate:.4f}",
+        'changePrice': f"{last * change_rate:.8g}",
+        'high': f"{last * 1.05:.8g}",
+        'low': f"{last * 0.95:.8g}",
+        'vol': f"{vol:.8f}",
+        'volValue': f"{vol * last:.8f}",
+        'last': f"{last:.8g}",
+        'averagePrice': f"{last * 0.99:.8f}",
+        'takerFeeRate': '0.001',
+        'makerFeeRate': '0.001',
+        'takerCoefficient': '1',
+        'makerCoefficient': '1'
+    }
+
+def main():
+    rng = random.Random(20261018)
+    pair_at = {position: pair for pair, position in PAIR_POSITIONS.items()}
+    tickers = []
+    for index in range(TICKER_COUNT):
+        symbol = pair_at.get(index)
+        if symbol is None:
+            base = ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(rng.randint(2, 6)))
+            symbol = f"{base}-{rng.choice(['USDT', 'BTC', 'ETH', 'KCS'])}"
+        tickers.append(make_ticker(rng, symbol))
+
+    response = {'code': '200000', 'data': {'time': 1760781600000, 'ticker': tickers}}
+    with gzip.open(FIXTURE_FILE, 'wt', encoding='utf-8') as f:
+        json.dump(response, f, separators=(',', ':'))
+    print(f"Written {FIXTURE_FILE}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import os
+import json
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+from typing import Dict, Any, Optional, Tuple, Callable
+
+from metrics import get_metrics
+
+DEFAULT_BREAKER_FILE = 'breaker_state.json'
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_BACKOFF = 60000
+DEFAULT_MAX_BACKOFF = 3600000
+DEFAULT_PROBE_TIMEOUT = 1500
+
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half_open'
+# Values of dashboard_breaker_state gauge
+BREAKER_STATE_VALUES = {BREAKER_CLOSED: 0, BREAKER_OPEN: 1, BREAKER_HALF_OPEN: 2}
+
+def get_endpoint(url: str) -> str:
+    """Returns host:port of URL, services of one device share its breaker"""
+    return urlsplit(url).netloc or url
+
+class CircuitBreakers:
+    """Circuit breaker of every endpoint, persisted between runs.
+    After failure_threshold failures in a row the endpoint is not called until its backoff
+    passes. Then one probe with short timeout is let through: success closes the breaker,
+    failure doubles the backoff up to max_backoff. Times are in ms like the configuration."""
+
+    def __init__(self, state_file: Optional[str] = DEFAULT_BREAKER_FILE,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, backoff: int = DEFAULT_BACKOFF,
+                 max_backoff: int = DEFAULT_MAX_BACKOFF, probe_timeout: int = DEFAULT_PROBE_TIMEOUT,
+                 clock: Callable[[], float] = time.time):
+        self.state_file = state_file
+        self.failure_threshold = max(failure_threshold, 1)
+        self.backoff = backoff / 1000.0
+        self.max_backoff = max_backoff / 1000.0
+        self.probe_timeout = probe_timeout / 1000.0
+        self.clock = clock
+        self.lock = threading.Lock()
+        # Endpoint state: failures in a row, time until which it is open and current backoff
+        self.endpoints: Dict[str, Dict[str, float]] = self._load_state()
+        self.probing = set()
+
+    def _load_state(self) -> Dict[str, Dict[str, float]]:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logging.warning(f"Failed to load breaker state from {self.state_file}: {e}")
+            return {}
+
+    def _save_state(self):
+        """Saves state, called with lock held whenever an endpoint changes"""
+        if not self.state_file:
+            return
+        try:
+            temp_file = f"{self.state_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.endpoints, f)
+            os.replace(temp_file, self.state_file)
+        except IOError as e:
+            logging.error(f"Failed to save breaker state to {self.state_file}: {e}")
+
+    def _get_state(self, entry: Optional[Dict[str, float]], now: float) -> str:
+        if not entry or entry['failures'] < self.failure_threshold:
+            return BREAKER_CLOSED
+        return BREAKER_OPEN if now < entry['open_until'] else BREAKER_HALF_OPEN
+
+    def get_state(self, endpoint: str) -> str:
+        with self.lock:
+            return self._get_state(self.endpoints.get(endpoint), self.clock())
+
+    def _set_gauge(self, endpoint: str, state: str):
+        get_metrics().set_gauge('dashboard_breaker_state', BREAKER_STATE_VALUES[state], endpoint=endpoint)
+
+    def allow(self, endpoint: str) -> Tuple[bool, bool]:
+        """Returns whether endpoint may be called now and whether the call is a probe.
+        Only one probe of an endpoint runs at a time."""
+        with self.lock:
+            entry = self.endpoints.get(endpoint)
+            state = self._get_state(entry, self.clock())
+            if state == BREAKER_CLOSED:
+                return True, False
+            if state == BREAKER_HALF_OPEN and endpoint not in self.probing:
+                self.probing.add(endpoint)
+                self._set_gauge(endpoint, state)
+                return True, True
+        get_metrics().inc('dashboard_breaker_rejections_total', endpoint=endpoint)
+        return False, False
+
+    def get_timeout(self, timeout: Tuple[float, float], probe: bool) -> Tuple[float, float]:
+        """Returns (connect, read) timeout of call, shortened to probe timeout for probes"""
+        if not probe:
+            return timeout
+        return min(timeout[0], self.probe_timeout), min(timeout[1], self.probe_timeout)
+
+    def record_success(self, endpoint: str):
+        with self.lock:
+            self.probing.discard(endpoint)
+            entry = self.endpoints.pop(endpoint, None)
+            if entry is None:
+                return
+            if entry['failures'] >= self.failure_threshold:
+                logging.info(f"Endpoint {endpoint} recovered, closing breaker")
+            self._set_gauge(endpoint, BREAKER_CLOSED)
+            self._save_state()
+
+    def record_failure(self, endpoint: str):
+        with self.lock:
+            now = self.clock()
+            self.probing.discard(endpoint)
+            entry = self.endpoints.setdefault(endpoint, {'failures': 0, 'open_until': 0.0, 'backoff': 0.0})
+            entry['failures'] += 1
+            if entry['failures'] >= self.failure_threshold:
+                if entry['backoff']:
+                    entry['backoff'] = min(entry['backoff'] * 2, self.max_backoff)
+                else:
+                    entry['backoff'] = self.backoff
+                    get_metrics().inc('dashboard_breaker_opened_total', endpoint=endpoint)
+                entry['open_until'] = now + entry['backoff']
+                logging.warning(f"Endpoint {endpoint} failed {entry['failures']} times, "
+                                f"not calling it for {entry['backoff']:.0f}s")
+                self._set_gauge(endpoint, BREAKER_OPEN)
+            self._save_state()
+
+_breakers: Optional[CircuitBreakers] = None
+_breakers_lock = threading.Lock()
+
+def get_breakers(config: Dict[str, Any]) -> CircuitBreakers:
+    """Returns breakers shared by all services, created from runtime configuration"""
+    global _breakers
+    with _breakers_lock:
+        if _breakers is None:
+            runtime_config = config.get('runtime', {})
+            _breakers = CircuitBreakers(
+                state_file=runtime_config.get('breakerFile', DEFAULT_BREAKER_FILE),
+                failure_threshold=runtime_config.get('breakerFailures', DEFAULT_FAILURE_THRESHOLD),
+                backoff=runtime_config.get('breakerBackoff', DEFAULT_BACKOFF),
+                max_backoff=runtime_config.get('breakerMaxBackoff', DEFAULT_MAX_BACKOFF),
+                probe_timeout=runtime_config.get('breakerProbeTimeout', DEFAULT_PROBE_TIMEOUT)
+            )
+        return _breakers
@@ -2,8 +2,12 @@
 # -*- coding:utf-8 -*-
 import json
 import os
+import hashlib
 import logging
-from typing import Dict, Any, Optional
+import marshal
+from typing import Dict, Any, Optional, Tuple
+
+DEFAULT_SNAPSHOT_FILE = 'config_snapshot.bin'
 
 def load_env_file(env_path: str = '.env') -> bool:
     """Loads environment variables from .env file"""
@@ -82,6 +86,84 @@ def validate_config(config: Dict[str, Any]) -> bool:
     logging.info("Configuration is valid")
     return True
 
+def _read_snapshot(snapshot_file: str) -> Optional[Dict[str, Any]]:
+    if not snapshot_file or not os.path.exists(snapshot_file):
+        return None
+    try:
+        with open(snapshot_file, 'rb') as f:
+            # marshal.load reads files in small pieces, one read is several times faster
+            snapshot = marshal.loads(f.read())
+        return snapshot if isinstance(snapshot, dict) and snapshot.get('version') == marshal.version else None
+    except (EOFError, ValueError, TypeError, IOError) as e:
+        logging.warning(f"Failed to read configuration snapshot {snapshot_file}: {e}")
+        return None
+
+def _write_snapshot(snapshot_file: str, snapshot: Dict[str, Any]):
+    try:
+        temp_file = f"{snapshot_file}.tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(marshal.dumps(snapshot))
+        os.replace(temp_file, snapshot_file)
+    except (IOError, ValueError) as e:
+        logging.warning(f"Failed to write configuration snapshot {snapshot_file}: {e}")
+
+def load_config_snapshot(config_path: str = 'dashboard.config.json',
+                         snapshot_file: Optional[str] = DEFAULT_SNAPSHOT_FILE) -> Optional[Dict[str, Any]]:
+    """Loads validated configuration, from snapshot of previous run if the file did not change.
+    Snapshot is valid for the same path, mtime and size, or for the same SHA-1 of contents
+    when only mtime changed. Returns None if configuration is missing or invalid."""
+    try:
+        stat = os.stat(config_path)
+    except OSError:
+        logging.error(f"Configuration file not found: {config_path}")
+        return None
+    
+    path = os.path.abspath(config_path)
+    snapshot = _read_snapshot(snapshot_file)
+    if snapshot and snapshot.get('path') != path:
+        snapshot = None
+    if snapshot and snapshot['mtime_ns'] == stat.st_mtime_ns and snapshot['size'] == stat.st_size:
+        logging.info(f"Configuration loaded from snapshot of {config_path}")
+        return snapshot['config']
+    
+    try:
+        with open(config_path, 'rb') as f:
+            raw = f.read()
+    except IOError as e:
+        logging.error(f"File reading error {config_path}: {e}")
+        return None
+    digest = hashlib.sha1(raw).hexdigest()
+    
+    if snapshot and snapshot['sha1'] == digest:
+        config = snapshot['config']
+        logging.info(f"Configuration loaded from snapshot of {config_path}, contents unchanged")
+    else:
+        try:
+            config = json.loads(raw.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logging.error(f"JSON parsing error in {config_path}: {e}")
+            return None
+        if not isinstance(config, dict) or not validate_config(config):
+            return None
+        logging.info(f"Configuration loaded from {config_path}")
+    
+    if snapshot_file:
+        _write_snapshot(snapshot_file, {'version': marshal.version, 'path': path, 'mtime_ns': stat.st_mtime_ns,
+                                        'size': stat.st_size, 'sha1': digest, 'config': config})
+    return config
+
+def share_unchanged(old: Any, new: Any) -> Any:
+    """Returns new configuration reusing objects of old one wherever they are equal.
+    Caches checking configuration identity, like compiled layout and value decoders,
+    then stay valid for parts which did not change."""
+    if old == new:
+        return old
+    if isinstance(old, dict) and isinstance(new, dict):
+        return {key: share_unchanged(old[key], value) if key in old else value for key, value in new.items()}
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        return [share_unchanged(old_item, new_item) for old_item, new_item in zip(old, new)]
+    return new
+
 def get_display_colour(config: Dict[str, Any], colour_name: str, default_colour: str = "BLACK") -> str:
     """Gets display color from configuration"""
     display_colours = config.get('display', {})
@@ -91,3 +173,27 @@ def get_display_colour(config: Dict[str, Any], colour_name: str, default_colour:
     
     return default_colour
 
+def get_service_category(service_key: str) -> Optional[str]:
+    """Returns data category for service key"""
+    if service_key == 'weather':
+        return 'weather'
+    if service_key == 'kucoin':
+        return 'kucoin'
+    if service_key.startswith('wifiiot'):
+        return 'sensors'
+    return None
+
+def get_service_ttl(config: Dict[str, Any], service_key: str, default_ttl: int = 600000) -> float:
+    """Gets time in seconds during which service data is considered fresh.
+    Uses 'ttl' of the service if set, otherwise its 'refreshInterval' (both in ms)."""
+    service_config = config.get('services', {}).get(service_key, {})
+    ttl = service_config.get('ttl', service_config.get('refreshInterval', default_ttl))
+    return ttl / 1000.0
+
+def get_service_timeout(config: Dict[str, Any], service_key: str, 
+                        default_timeout: int = 10000) -> Tuple[float, float]:
+    """Gets (connect, read) request timeout in seconds.
+    Uses 'timeout' of the service and its 'connectTimeout' if set (both in ms)."""
+    service_config = config.get('services', {}).get(service_key, {})
+    timeout = service_config.get('timeout', default_timeout)
+    return service_config.get('connectTimeout', timeout) / 1000.0, timeout / 1000.0
@@ -0,0 +1,120 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import os
+import select
+import struct
+import logging
+import threading
+from typing import Callable, Optional
+
+DEFAULT_POLL_INTERVAL = 2000
+# Events of one save, like write and rename of editors, are reported as one change
+DEFAULT_SETTLE_TIME = 200
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct('iIII')
+
+def _init_inotify(directory: str) -> Optional[int]:
+    """Returns inotify descriptor watching directory, None where inotify is not available"""
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError) as e:
+        logging.debug(f"inotify is not available: {e}")
+        return None
+    if fd < 0:
+        logging.debug(f"inotify_init1 failed: {os.strerror(ctypes.get_errno())}")
+        return None
+    if libc.inotify_add_watch(fd, directory.encode(), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+        logging.warning(f"Failed to watch {directory}: {os.strerror(ctypes.get_errno())}")
+        os.close(fd)
+        return None
+    return fd
+
+class ConfigWatcher:
+    """Calls on_change from a background thread when configuration file changes.
+    Uses inotify on the directory of the file, so that files replaced by editors are seen,
+    and polls mtime of the file where inotify is not available."""
+
+    def __init__(self, config_path: str, on_change: Callable[[], None],
+                 poll_interval: int = DEFAULT_POLL_INTERVAL, settle_time: int = DEFAULT_SETTLE_TIME):
+        self.config_path = os.path.abspath(config_path)
+        self.directory, self.name = os.path.split(self.config_path)
+        self.on_change = on_change
+        self.poll_interval = poll_interval / 1000.0
+        self.settle_time = settle_time / 1000.0
+        self.stopped = threading.Event()
+        self.fd: Optional[int] = None
+        self.thread: Optional[threading.Thread] = None
+
+    def _get_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read_events(self) -> bool:
+        """Reads pending inotify events, returns True if any is about the configuration file"""
+        changed = False
+        while True:
+            try:
+                buffer = os.read(self.fd, 4096)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset + INOTIFY_EVENT.size <= len(buffer):
+                _, _, _, length = INOTIFY_EVENT.unpack_from(buffer, offset)
+                name = buffer[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length]
+                changed = changed or name.rstrip(b'\0').decode(errors='replace') == self.name
+                offset += INOTIFY_EVENT.size + length
+
+    def _watch_inotify(self):
+        while not self.stopped.is_set():
+            readable, _, _ = select.select([self.fd], [], [], self.poll_interval)
+            if not readable or not self._read_events():
+                continue
+            self.stopped.wait(self.settle_time)
+            self._read_events()
+            self._notify()
+
+    def _watch_polling(self):
+        mtime = self._get_mtime()
+        while not self.stopped.wait(self.poll_interval):
+            new_mtime = self._get_mtime()
+            if new_mtime != mtime:
+                self.stopped.wait(self.settle_time)
+                mtime = self._get_mtime()
+                self._notify()
+
+    def _notify(self):
+        if self.stopped.is_set():
+            return
+        logging.info(f"Configuration file {self.config_path} changed")
+        try:
+            self.on_change()
+        except Exception as e:
+            logging.error(f"Error handling configuration change: {e}")
+
+    def start(self) -> bool:
+        """Starts watching, returns True if inotify is used"""
+        self.fd = _init_inotify(self.directory)
+        target = self._watch_inotify if self.fd is not None else self._watch_polling
+        self.thread = threading.Thread(target=target, name='config-watcher', daemon=True)
+        self.thread.start()
+        logging.info(f"Watching {self.config_path} with {'inotify' if self.fd is not None else 'polling'}")
+        return self.fd is not None
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.poll_interval + self.settle_time + 1.0)
+            self.thread = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
@@ -1,89 +1,293 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
+import time
 import logging
-from typing import Dict, Any, Optional
-from services.weather_service import fetch_weather_data
-from services.kucoin_service import fetch_kucoin_data
-from services.sensor_service import fetch_all_sensor_data
-from data_storage import load_data, is_valid_value, get_cached_value
+import importlib
+import threading
+from typing import Dict, Any, Optional, List, Callable, Tuple
+from config_loader import get_service_category, get_service_ttl
+from metrics import get_metrics, timed
+from data_storage import (load_data, is_valid_value, get_cached_value, get_value_age, 
+                          get_data_ages, set_service_timestamp, 
+                          is_service_fresh, TIMESTAMPS_KEY, SERVICES_KEY, UNKNOWN_AGE)
+
+DEFAULT_FETCH_DEADLINE = 20000
+DEFAULT_FETCH_WORKERS = 8
+# Services are refetched slightly before their TTL ends so that cron jitter
+# does not make every other run skip the fetch
+FRESHNESS_MARGIN = 30
+# Fetch function of each category as (module, function). Service modules import requests,
+# so they are loaded only when a service actually has to be fetched.
+SERVICE_FETCHERS = {
+    'weather': ('services.weather_service', 'fetch_weather_data'),
+    'kucoin': ('services.kucoin_service', 'fetch_kucoin_data'),
+    'sensors': ('services.sensor_service', 'fetch_sensor_data')
+}
 
 def merge_data_with_cache(current_data: Optional[Dict[str, Any]], 
                          cached_data: Dict[str, Any], 
-                         data_key: str):
+                         data_key: str, now: Optional[float] = None):
     """Merges current data with cached data, using cache if current is invalid.
-    Returns data and dictionary of flags indicating which values are old."""
+    Returns data and dictionary of value ages in seconds (0 for fresh values)."""
     result = {}
-    age_flags = {}
+    ages = {}
+    if now is None:
+        now = time.time()
     
     if current_data:
         for key, value in current_data.items():
             if is_valid_value(value):
                 result[key] = value
-                age_flags[key] = False
+                ages[key] = 0.0
             else:
                 cached_value = get_cached_value(cached_data, data_key, key)
                 if cached_value is not None:
                     result[key] = cached_value
-                    age_flags[key] = True
+                    ages[key] = get_value_age(cached_data, data_key, key, now)
+                    get_metrics().inc('dashboard_cache_fallbacks_total', category=data_key)
                 else:
                     result[key] = value
-                    age_flags[key] = False
+                    ages[key] = 0.0
     else:
         cached_item = cached_data.get(data_key, {})
         if cached_item:
             result = cached_item.copy()
+            get_metrics().inc('dashboard_cache_fallbacks_total', len(result), category=data_key)
             for key in result.keys():
-                age_flags[key] = True
+                ages[key] = get_value_age(cached_data, data_key, key, now)
+    
+    return result, ages
+
+def _store_timestamps(data: Dict[str, Any], category: str, 
+                      ages: Dict[str, float], now: float):
+    """Records fetch time of merged values from their ages"""
+    timestamps = data.setdefault(TIMESTAMPS_KEY, {}).setdefault(category, {})
+    for key, age in ages.items():
+        if age == UNKNOWN_AGE:
+            timestamps.pop(key, None)
+        else:
+            timestamps[key] = now - age
+
+def get_stale_services(config: Dict[str, Any], cached_data: Dict[str, Any], 
+                       service_keys: List[str], now: Optional[float] = None) -> List[str]:
+    """Returns services whose cached data is older than their TTL"""
+    if now is None:
+        now = time.time()
+    return [key for key in service_keys 
+            if not is_service_fresh(cached_data, key, get_service_ttl(config, key) - FRESHNESS_MARGIN, now)]
+
+def get_service_fetcher(service_key: str) -> Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+    """Returns fetch function for service key"""
+    category = get_service_category(service_key)
+    if category not in SERVICE_FETCHERS:
+        return None
+    module_name, function_name = SERVICE_FETCHERS[category]
+    fetcher = getattr(importlib.import_module(module_name), function_name)
+    if category == 'sensors':
+        return lambda config: fetcher(config, service_key)
+    return fetcher
+
+def _fetch_timed(fetcher: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]], service_key: str,
+                 config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Runs fetcher, recording its duration and failure"""
+    metrics = get_metrics()
+    with metrics.timer('dashboard_fetch_duration_seconds', service=service_key):
+        result = fetcher(config)
+    if not result:
+        metrics.inc('dashboard_fetch_failures_total', service=service_key, reason='error')
+    return result
+
+def get_fetch_deadline(config: Dict[str, Any]) -> float:
+    """Returns deadline for whole fetch cycle in seconds"""
+    runtime_config = config.get('runtime', {})
+    return runtime_config.get('fetchDeadline', DEFAULT_FETCH_DEADLINE) / 1000.0
+
+def fetch_services(config: Dict[str, Any], service_keys: List[str],
+                   deadline: Optional[float] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Fetches services concurrently, waiting no longer than deadline seconds.
+    Services that failed or missed the deadline are returned as None."""
+    results = {service_key: None for service_key in service_keys}
+    fetchers = {}
+    for service_key in service_keys:
+        fetcher = get_service_fetcher(service_key)
+        if fetcher is None:
+            logging.warning(f"No fetcher for service {service_key}")
+            continue
+        fetchers[service_key] = fetcher
+    
+    if not fetchers:
+        return results
+    
+    # Only needed when something is fetched, cron runs on fresh cache do not load requests
+    from http_client import get_client
+    
+    if deadline is None:
+        deadline = get_fetch_deadline(config)
+    
+    max_workers = config.get('runtime', {}).get('fetchWorkers', DEFAULT_FETCH_WORKERS)
+    pending = list(fetchers.items())
+    completed: Dict[str, Tuple[Optional[Dict[str, Any]], Optional[Exception]]] = {}
+    finished = threading.Condition()
+    stopped = threading.Event()
+    
+    def fetch_pending():
+        while True:
+            with finished:
+                if stopped.is_set() or not pending:
+                    return
+                service_key, fetcher = pending.pop(0)
+            try:
+                outcome = (_fetch_timed(fetcher, service_key, config), None)
+            except Exception as e:
+                outcome = (None, e)
+            with finished:
+                completed[service_key] = outcome
+                finished.notify()
+    
+    # Workers are daemon threads, unlike those of ThreadPoolExecutor which are joined
+    # at exit, so a hung request can't keep a cron run alive past the deadline
+    for index in range(min(max_workers, len(fetchers))):
+        threading.Thread(target=fetch_pending, name=f'fetch_{index}', daemon=True).start()
+    
+    with finished:
+        finished.wait_for(lambda: len(completed) == len(fetchers), timeout=deadline)
+        # Services not started yet are skipped, results of stragglers are discarded
+        stopped.set()
+        done = dict(completed)
+    
+    for service_key in fetchers:
+        if service_key not in done:
+            logging.warning(f"Service {service_key} missed fetch deadline of {deadline:.1f}s")
+            get_metrics().inc('dashboard_fetch_failures_total', service=service_key, reason='deadline')
+            continue
+        result, error = done[service_key]
+        if error is not None:
+            logging.error(f"Unexpected error fetching {service_key}: {error}")
+            get_metrics().inc('dashboard_fetch_failures_total', service=service_key, reason='error')
+            continue
+        results[service_key] = result
+    
+    get_client(config).save()
+    return results
+
+def _collect_sensor_data(config: Dict[str, Any], 
+                         results: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Combines results of sensor services.
+    Keys of failed services are set to None so that cached values are used."""
+    services_config = config.get('services', {})
+    sensor_results = {key: value for key, value in results.items() 
+                      if get_service_category(key) == 'sensors'}
+    if not any(sensor_results.values()):
+        return {}
     
-    return result, age_flags
+    sensor_data = {}
+    for service_key, service_data in sensor_results.items():
+        if service_data:
+            sensor_data.update(service_data)
+        else:
+            for key in services_config.get(service_key, {}).get('data', {}).keys():
+                sensor_data.setdefault(key, None)
+    return sensor_data
+
+def _group_results(config: Dict[str, Any], 
+                   results: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Groups service results by data category"""
+    fetched = {}
+    if 'weather' in results:
+        fetched['weather'] = results['weather']
+    if 'kucoin' in results:
+        fetched['kucoin'] = results['kucoin']
+    if any(get_service_category(key) == 'sensors' for key in results):
+        fetched['sensors'] = _collect_sensor_data(config, results)
+    return fetched
+
+def get_data_service_keys(config: Dict[str, Any]) -> List[str]:
+    """Returns keys of services that provide dashboard data"""
+    return [key for key in config.get('services', {}).keys() 
+            if get_service_category(key) is not None]
 
+@timed('dashboard_stage_duration_seconds', stage='load')
 def load_all_data(config: Dict[str, Any], use_cache: bool = True):
     """Loads data from all sources, using cache when needed.
-    Returns data and dictionary of data age flags."""
+    Sources whose cached data is still within their TTL are not fetched.
+    Returns data with fetch timestamps and dictionary of value ages in seconds."""
     cached_data = load_data() if use_cache else {}
+    now = time.time()
     
     all_data = {
         'weather': {},
         'kucoin': {},
-        'sensors': {}
-    }
-    data_ages = {
-        'weather': {},
-        'kucoin': {},
-        'sensors': {}
+        'sensors': {},
+        TIMESTAMPS_KEY: {},
+        SERVICES_KEY: dict(cached_data.get(SERVICES_KEY, {}))
     }
     
     logging.info("Loading data from all sources...")
     
-    weather_data = fetch_weather_data(config)
-    if weather_data:
-        all_data['weather'], data_ages['weather'] = merge_data_with_cache(weather_data, cached_data, 'weather')
-    elif use_cache:
-        cached_weather = cached_data.get('weather', {})
-        if cached_weather:
-            all_data['weather'] = cached_weather.copy()
-            for key in cached_weather.keys():
-                data_ages['weather'][key] = True
-    
-    kucoin_data = fetch_kucoin_data(config)
-    if kucoin_data:
-        all_data['kucoin'], data_ages['kucoin'] = merge_data_with_cache(kucoin_data, cached_data, 'kucoin')
-    elif use_cache:
-        cached_kucoin = cached_data.get('kucoin', {})
-        if cached_kucoin:
-            all_data['kucoin'] = cached_kucoin.copy()
-            for key in cached_kucoin.keys():
-                data_ages['kucoin'][key] = True
-    
-    sensor_data = fetch_all_sensor_data(config)
-    if sensor_data:
-        all_data['sensors'], data_ages['sensors'] = merge_data_with_cache(sensor_data, cached_data, 'sensors')
-    elif use_cache:
-        cached_sensors = cached_data.get('sensors', {})
-        if cached_sensors:
-            all_data['sensors'] = cached_sensors.copy()
-            for key in cached_sensors.keys():
-                data_ages['sensors'][key] = True
+    service_keys = get_data_service_keys(config)
+    stale_keys = get_stale_services(config, cached_data, service_keys, now) if use_cache else service_keys
+    fresh_keys = [key for key in service_keys if key not in stale_keys]
+    if fresh_keys:
+        logging.info(f"Using cached data of fresh services: {fresh_keys}")
+    for service_key in fresh_keys:
+        get_metrics().inc('dashboard_cache_hits_total', service=service_key)
     
-    return all_data, data_ages
+    results = fetch_services(config, stale_keys)
+    
+    for category, category_data in _group_results(config, results).items():
+        if category_data:
+            all_data[category], ages = merge_data_with_cache(category_data, cached_data, category, now)
+        elif use_cache:
+            all_data[category], ages = merge_data_with_cache(None, cached_data, category, now)
+        else:
+            continue
+        _store_timestamps(all_data, category, ages, now)
+    
+    services_config = config.get('services', {})
+    for service_key in fresh_keys:
+        category = get_service_category(service_key)
+        cached_category = cached_data.get(category, {})
+        if category == 'sensors':
+            keys = [key for key in services_config[service_key].get('data', {}).keys() if key in cached_category]
+        else:
+            keys = list(cached_category.keys())
+        for key in keys:
+            all_data[category][key] = cached_category[key]
+        _store_timestamps(all_data, category, 
+                          {key: get_value_age(cached_data, category, key, now) for key in keys}, now)
+    
+    for service_key, service_data in results.items():
+        if service_data:
+            set_service_timestamp(all_data, service_key, now)
+    
+    return all_data, get_data_ages(all_data, now)
+
+@timed('dashboard_stage_duration_seconds', stage='load')
+def refresh_data(config: Dict[str, Any], all_data: Dict[str, Any], 
+                 data_ages: Dict[str, Dict[str, float]], service_keys: List[str]):
+    """Fetches only given services and merges them into already loaded data.
+    Previously loaded values are used as cache for failed services."""
+    logging.info(f"Refreshing services: {service_keys}")
+    
+    results = fetch_services(config, service_keys)
+    return merge_results(config, all_data, data_ages, results)
 
+def merge_results(config: Dict[str, Any], all_data: Dict[str, Any], 
+                  data_ages: Dict[str, Dict[str, float]], 
+                  results: Dict[str, Optional[Dict[str, Any]]]):
+    """Merges service results, fetched or pushed by devices, into already loaded data"""
+    now = time.time()
+    
+    for category, category_data in _group_results(config, results).items():
+        if category_data:
+            merged, ages = merge_data_with_cache(category_data, all_data, category, now)
+            all_data.setdefault(category, {}).update(merged)
+            _store_timestamps(all_data, category, ages, now)
+    
+    for service_key, service_data in results.items():
+        if service_data:
+            set_service_timestamp(all_data, service_key, now)
+    
+    data_ages.clear()
+    data_ages.update(get_data_ages(all_data, now))
+    return all_data, data_ages
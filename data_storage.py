@@ -2,10 +2,14 @@
 # -*- coding:utf-8 -*-
 import json
 import os
+import time
 import logging
 from typing import Dict, Any, Optional
 
 DEFAULT_DATA_FILE = 'dashboard_data.json'
+TIMESTAMPS_KEY = '_timestamps'
+SERVICES_KEY = '_services'
+UNKNOWN_AGE = float('inf')
 
 def load_data(data_file: str = DEFAULT_DATA_FILE) -> Dict[str, Any]:
     """Loads saved data from file"""
@@ -50,3 +54,47 @@ def is_valid_value(value: Any) -> bool:
     value_str = str(value).strip()
     return value_str and value_str != 'ERR' and value_str != 'N/A'
 
+def strip_metadata(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns data without fetch timestamps"""
+    return {key: value for key, value in data.items() if not key.startswith('_')}
+
+def get_value_timestamp(data: Dict[str, Any], key: str, sub_key: str) -> Optional[float]:
+    """Gets time when cached value was fetched"""
+    return data.get(TIMESTAMPS_KEY, {}).get(key, {}).get(sub_key)
+
+def get_value_age(data: Dict[str, Any], key: str, sub_key: str, now: Optional[float] = None) -> float:
+    """Gets age of cached value in seconds, UNKNOWN_AGE if it was never timestamped"""
+    timestamp = get_value_timestamp(data, key, sub_key)
+    if timestamp is None:
+        return UNKNOWN_AGE
+    if now is None:
+        now = time.time()
+    return max(now - timestamp, 0.0)
+
+def get_data_ages(data: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+    """Gets ages in seconds of all cached values"""
+    if now is None:
+        now = time.time()
+    data_ages = {}
+    for key, values in strip_metadata(data).items():
+        if isinstance(values, dict):
+            data_ages[key] = {sub_key: get_value_age(data, key, sub_key, now) for sub_key in values.keys()}
+    return data_ages
+
+def get_service_timestamp(data: Dict[str, Any], service_key: str) -> Optional[float]:
+    """Gets time of last successful fetch of service"""
+    return data.get(SERVICES_KEY, {}).get(service_key)
+
+def set_service_timestamp(data: Dict[str, Any], service_key: str, timestamp: float):
+    """Sets time of last successful fetch of service"""
+    data.setdefault(SERVICES_KEY, {})[service_key] = timestamp
+
+def is_service_fresh(data: Dict[str, Any], service_key: str, ttl: float, 
+                     now: Optional[float] = None) -> bool:
+    """Checks if service was fetched less than ttl seconds ago"""
+    timestamp = get_service_timestamp(data, service_key)
+    if timestamp is None:
+        return False
+    if now is None:
+        now = time.time()
+    return 0 <= now - timestamp < ttl
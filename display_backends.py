@@ -0,0 +1,157 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import os
+import sys
+import time
+import logging
+import importlib
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from epd_buffer import pack_buffer, unpack_buffer
+
+libdir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'lib')
+if os.path.exists(libdir):
+    sys.path.append(libdir)
+
+HEADLESS_DISPLAY_TYPE = 'headless'
+HEADLESS_OUTPUTS = ('png', 'raw', 'none')
+DEFAULT_HEADLESS_OUTPUT = 'png'
+DEFAULT_HEADLESS_FILE = 'headless_frame'
+# Native size of epd2in15g, the panel of the example configuration
+DEFAULT_HEADLESS_WIDTH = 160
+DEFAULT_HEADLESS_HEIGHT = 296
+# Native size of waveshare panels, so that frames can be drawn without importing their driver
+PANEL_SIZES = {
+    'epd2in15g': (160, 296)
+}
+# Colour values of waveshare 4-colour drivers
+DRIVER_COLOURS = {
+    'BLACK': 0x000000,
+    'WHITE': 0xffffff,
+    'YELLOW': 0x00ffff,
+    'RED': 0x0000ff
+}
+
+class HeadlessEPD:
+    """Display without a panel, with the interface of waveshare drivers.
+    Frames are written as PNG or raw buffer files and init/refresh take as long as configured."""
+
+    def __init__(self, headless_config: Dict[str, Any]):
+        self.width = headless_config.get('width', DEFAULT_HEADLESS_WIDTH)
+        self.height = headless_config.get('height', DEFAULT_HEADLESS_HEIGHT)
+        self.BLACK = DRIVER_COLOURS['BLACK']
+        self.WHITE = DRIVER_COLOURS['WHITE']
+        self.YELLOW = DRIVER_COLOURS['YELLOW']
+        self.RED = DRIVER_COLOURS['RED']
+
+        self.output = headless_config.get('output', DEFAULT_HEADLESS_OUTPUT)
+        if self.output not in HEADLESS_OUTPUTS:
+            logging.warning(f"Unknown headless output {self.output}, frames are not written")
+            self.output = 'none'
+        self.file = headless_config.get('file', DEFAULT_HEADLESS_FILE)
+        self.init_time = headless_config.get('initTime', 0) / 1000.0
+        self.full_refresh_time = headless_config.get('fullRefreshTime', 0) / 1000.0
+        self.partial_refresh_time = headless_config.get('partialRefreshTime', 0) / 1000.0
+        # Renderer detects partial refresh support by the driver method
+        if headless_config.get('partialRefresh', False):
+            self.display_Partial = self._display_partial
+
+        self.stats = {'init': 0, 'full': 0, 'partial': 0, 'clear': 0, 'busy': 0.0}
+
+    def _wait(self, seconds: float):
+        """Emulates time the panel is busy"""
+        if seconds > 0:
+            time.sleep(seconds)
+            self.stats['busy'] += seconds
+
+    def _write(self, buf: bytes):
+        """Writes frame in configured output format"""
+        if self.output == 'none':
+            return
+        try:
+            path = f"{self.file}.{self.output}"
+            temp_file = f"{path}.tmp"
+            if self.output == 'raw':
+                with open(temp_file, 'wb') as f:
+                    f.write(bytes(buf))
+            else:
+                unpack_buffer(buf, self.width, self.height).save(temp_file, format='PNG')
+            os.replace(temp_file, path)
+            logging.debug(f"Headless frame written to {path}")
+        except IOError as e:
+            logging.error(f"Failed to write headless frame: {e}")
+
+    def init(self) -> int:
+        self.stats['init'] += 1
+        self._wait(self.init_time)
+        return 0
+
+    def getbuffer(self, image) -> bytearray:
+        return pack_buffer(image, self.width, self.height)
+
+    def display(self, buf: bytes):
+        self.stats['full'] += 1
+        self._write(buf)
+        self._wait(self.full_refresh_time)
+
+    def _display_partial(self, buf: bytes, x_start: int, y_start: int, x_end: int, y_end: int):
+        self.stats['partial'] += 1
+        self._write(buf)
+        self._wait(self.partial_refresh_time)
+
+    def Clear(self, color: int = 0x55):
+        self.stats['clear'] += 1
+        self._wait(self.full_refresh_time)
+
+    def sleep(self):
+        pass
+
+def _create_headless(display_type: str, config: Dict[str, Any]) -> HeadlessEPD:
+    return HeadlessEPD(config['display'].get('headless', {}))
+
+# Driver modules imported so far, their GPIO/SPI is released on exit
+_driver_modules: Dict[str, Any] = {}
+
+def _create_waveshare(display_type: str, config: Dict[str, Any]) -> Any:
+    """Imports waveshare driver of display type on first use, so unused drivers cost nothing"""
+    if not display_type.isidentifier():
+        raise ValueError(f"Invalid display type: {display_type!r}")
+    module = _driver_modules.get(display_type)
+    if module is None:
+        module = importlib.import_module(f'waveshare_epd.{display_type}')
+        _driver_modules[display_type] = module
+    return module.EPD()
+
+# Display types without an entry are loaded as waveshare_epd driver modules
+DISPLAY_BACKENDS: Dict[str, Callable[[str, Dict[str, Any]], Any]] = {
+    HEADLESS_DISPLAY_TYPE: _create_headless
+}
+
+def register_backend(display_type: str, factory: Callable[[str, Dict[str, Any]], Any]):
+    """Registers factory(display_type, config) creating display of given epdDisplayType"""
+    DISPLAY_BACKENDS[display_type] = factory
+
+def create_display(config: Dict[str, Any]) -> Any:
+    """Creates display of configured epdDisplayType"""
+    display_type = config['display']['epdDisplayType']
+    factory = DISPLAY_BACKENDS.get(display_type, _create_waveshare)
+    logging.debug(f"Creating {display_type} display")
+    return factory(display_type, config)
+
+def get_panel_size(config: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """Returns native width and height of configured display, None if only its driver knows it"""
+    display_config = config['display']
+    display_type = display_config['epdDisplayType']
+    if display_type == HEADLESS_DISPLAY_TYPE:
+        headless_config = display_config.get('headless', {})
+        return (headless_config.get('width', DEFAULT_HEADLESS_WIDTH),
+                headless_config.get('height', DEFAULT_HEADLESS_HEIGHT))
+    return PANEL_SIZES.get(display_type)
+
+def cleanup_displays():
+    """Releases GPIO/SPI of loaded waveshare drivers"""
+    for display_type, module in _driver_modules.items():
+        try:
+            module.epdconfig.module_exit(cleanup=True)
+        except Exception as e:
+            logging.warning(f"Failed to release {display_type} display: {e}")
@@ -1,69 +1,168 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
 import os
-import sys
 import time
 import logging
 from PIL import Image, ImageDraw, ImageFont
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 
 iconsdir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'icons')
 fontsdir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'fonts')
-libdir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'lib')
-if os.path.exists(libdir):
-    sys.path.append(libdir)
 
-from waveshare_epd import epd2in15g
-from config_loader import get_display_colour
+from display_backends import create_display, get_panel_size, DRIVER_COLOURS
+from config_loader import get_display_colour, get_service_category, get_service_ttl
+from layout_compiler import compile_layout, format_value_text, get_item_categories, LayoutPlan, IconOp
+from epd_buffer import get_palette_colours, build_palette, pack_buffer, PACKED_DISPLAY_TYPES
+from frame_canvas import FrameCanvas, NATIVE_ROTATIONS
+from text_cache import TextCache, DEFAULT_METRICS_CACHE_SIZE, DEFAULT_SPRITE_CACHE_SIZE
+from font_manager import get_font_manager
+from glyph_atlas import GlyphAtlas, get_font_key, DEFAULT_ATLAS_FILE
+from icon_atlas import IconAtlas, DEFAULT_ATLAS_FILE as DEFAULT_ICON_ATLAS_FILE
+from history_store import get_series_name
+from metrics import get_metrics, timed
+from sparkline import HistoryView, Buckets, DEFAULT_SPARKLINE_WIDTH
 
 class DisplayRenderer:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], history: Optional[Any] = None):
         self.config = config
         self.epd_type = config['display']['epdDisplayType']
-        self.epd = epd2in15g.EPD()
+        self._epd = None
         self.old_data_colour = config['display'].get('oldDataColour', 'YELLOW')
+        self.old_data_ages = self._load_old_data_ages()
         self.rotation = config['display'].get('epdDisplayRotation', 0)
+        # Frames are drawn in panel orientation unless rotation is not a multiple of 90
+        self.native_rotation = self.rotation in NATIVE_ROTATIONS
         
+        # In P mode frames are drawn with palette indexes of display.colours
+        self.image_mode = 'P' if config['display'].get('epdColourMode') == 'P' else 'RGB'
+        if self.image_mode == 'P':
+            self.palette_colours = get_palette_colours(config)
+            self.colours = {name: index for index, name in enumerate(self.palette_colours)}
+        else:
+            self.palette_colours = []
+            self.colours = dict(DRIVER_COLOURS)
+        self.background = self._get_colour('WHITE')
+        self.fontmode = ImageDraw.Draw(Image.new(self.image_mode, (1, 1))).fontmode
+        
+        self.font_keys: Dict[str, str] = {}
         self.fonts = self._load_fonts()
         self.line_height = config['layout'].get('lineHeight', 22)
         self.start_x = config['layout'].get('startX', 5)
+        self.layout: Optional[LayoutPlan] = None
+        self.text_cache = TextCache(config['layout'].get('textCacheSize', DEFAULT_METRICS_CACHE_SIZE),
+                                    config['layout'].get('spriteCacheSize', DEFAULT_SPRITE_CACHE_SIZE))
+        self.glyph_atlas = GlyphAtlas(config['layout'].get('glyphAtlasFile', DEFAULT_ATLAS_FILE))
+        # Sprites rasterized for the first frame of a layout are added to the atlas
+        self.atlas_pending = True
+        # Created with the layout, in orientation of its frames
+        self.icon_atlas: Optional[IconAtlas] = None
+        self.history_view = HistoryView(history)
         
+        panel_size = get_panel_size(config)
+        if panel_size is None:
+            panel_size = (self.epd.width, self.epd.height)
+        self.panel_width, self.panel_height = panel_size
         if self.rotation in [90, 270]:
-            self.image_width = self.epd.height
-            self.image_height = self.epd.width
+            self.image_width = self.panel_height
+            self.image_height = self.panel_width
         else:
-            self.image_width = self.epd.width
-            self.image_height = self.epd.height
+            self.image_width = self.panel_width
+            self.image_height = self.panel_height
+    
+    @property
+    def epd(self) -> Any:
+        """Display driver, created on first use so that skipped refreshes never import it"""
+        if self._epd is None:
+            self._epd = create_display(self.config)
+        return self._epd
         
     def _load_fonts(self) -> Dict[str, ImageFont.FreeTypeFont]:
-        """Loads fonts from configuration"""
+        """Loads fonts from configuration, shared with other renderers of the process"""
         fonts = {}
         fonts_config = self.config.get('fonts', {})
+        font_manager = get_font_manager()
+        self.font_keys = {}
         
         for font_name, font_config in fonts_config.items():
             font_file, font_size = font_config
             font_path = os.path.join(fontsdir, font_file)
             try:
-                fonts[font_name] = ImageFont.truetype(font_path, font_size)
+                fonts[font_name] = font_manager.load_font(font_path, font_size)
             except Exception as e:
                 logging.warning(f"Failed to load font {font_name}: {e}")
                 fonts[font_name] = ImageFont.load_default()
+                continue
+            font_key = get_font_key(font_path, font_size, self.fontmode)
+            if font_key:
+                self.font_keys[font_name] = font_key
         
         return fonts
     
+    def _seed_glyph_atlas(self):
+        """Fills text cache with sprites of fonts saved in glyph atlas by previous runs"""
+        seeded = sum(self.glyph_atlas.seed(self.text_cache, self.fonts[font_name], font_key, self.fontmode)
+                     for font_name, font_key in self.font_keys.items())
+        logging.debug(f"Seeded {seeded} sprites from glyph atlas")
+    
+    def _save_glyph_atlas(self):
+        """Adds glyphs and static labels rasterized for the first frame to glyph atlas"""
+        labels: Dict[Any, List[str]] = {}
+        for line in self.get_layout().lines:
+            for item in line.items:
+                if item.static_prefix:
+                    labels.setdefault(item.font, []).append(item.static_prefix)
+        for font_name, font_key in self.font_keys.items():
+            font = self.fonts[font_name]
+            self.glyph_atlas.update(self.text_cache, font, font_key, self.fontmode, labels.get(font, []))
+        self.glyph_atlas.drop_stale(list(self.font_keys.values()))
+        self.glyph_atlas.save()
+        self.atlas_pending = False
+    
+    def _create_icon_atlas(self) -> IconAtlas:
+        """Creates atlas of icons converted to colours and orientation of frames"""
+        layout_config = self.config['layout']
+        return IconAtlas(layout_config.get('iconAtlasFile', DEFAULT_ICON_ATLAS_FILE),
+                         os.path.join(os.path.dirname(iconsdir), layout_config.get('iconsPath', iconsdir)),
+                         self.image_mode, get_palette_colours(self.config),
+                         self.rotation if self.native_rotation else 0,
+                         layout_config.get('iconDither', True))
+    
+    def _load_old_data_ages(self) -> Dict[str, float]:
+        """Gets age in seconds after which values of each category are shown as old.
+        Uses display.oldDataAge (ms) if set, otherwise the longest TTL of category services."""
+        old_data_age = self.config['display'].get('oldDataAge')
+        old_data_ages = {}
+        for service_key in self.config.get('services', {}).keys():
+            category = get_service_category(service_key)
+            if category is None:
+                continue
+            if old_data_age is not None:
+                old_data_ages[category] = old_data_age / 1000.0
+            else:
+                ttl = get_service_ttl(self.config, service_key)
+                old_data_ages[category] = max(old_data_ages.get(category, 0.0), ttl)
+        return old_data_ages
+    
+    def is_old(self, category: str, age: float) -> bool:
+        """Checks if value of given age should be shown as old"""
+        return age > self.old_data_ages.get(category, 0.0)
+    
+    def get_old_flags(self, data_ages: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, bool]]:
+        """Converts value ages to flags indicating which values are old"""
+        return {category: {key: self.is_old(category, age) for key, age in ages.items()}
+                for category, ages in data_ages.items()}
+    
+    def has_old_data(self, data_ages: Dict[str, Dict[str, float]]) -> bool:
+        """Checks if any value is old enough to be shown as old"""
+        return any(self.is_old(category, age) 
+                   for category, ages in data_ages.items() for age in ages.values())
+    
     def _get_colour(self, colour_name: str, is_old_data: bool = False) -> Any:
         """Gets color for display"""
         if is_old_data:
             colour_name = self.old_data_colour
         
-        epd_colour_map = {
-            'BLACK': self.epd.BLACK,
-            'WHITE': self.epd.WHITE,
-            'RED': self.epd.RED,
-            'YELLOW': self.epd.YELLOW
-        }
-        
-        return epd_colour_map.get(colour_name, self.epd.BLACK)
+        return self.colours.get(colour_name, self.colours['BLACK'])
     
     def _format_datetime(self, fmt: str) -> str:
         """Formats current date and time"""
@@ -78,142 +177,192 @@ class DisplayRenderer:
         directions = ['С', 'СВ', 'В', 'ЮВ', 'Ю', 'ЮЗ', 'З', 'СЗ']
         return directions[int((wind_deg / 45) + 0.5) % 8]
     
-    def _get_value(self, data: Dict[str, Any], data_ages: Dict[str, Dict[str, bool]], 
+    def _get_value(self, data: Dict[str, Any], data_ages: Dict[str, Dict[str, float]], 
                    item_type: str, category: str = 'sensors') -> Tuple[Any, bool]:
-        """Gets value from data and flag indicating if it's old"""
+        """Gets value from data and flag indicating if it's older than category threshold"""
         category_data = data.get(category, {})
         
         if category == 'weather':
             if item_type == 'wind_direction' and 'wind_deg' in category_data:
                 value = self._get_wind_direction(category_data['wind_deg'])
-                is_old = data_ages.get(category, {}).get('wind_deg', False)
+                age = data_ages.get(category, {}).get('wind_deg', 0.0)
             else:
                 value = category_data.get(item_type)
-                is_old = data_ages.get(category, {}).get(item_type, False)
+                age = data_ages.get(category, {}).get(item_type, 0.0)
         elif category == 'kucoin':
             pair_data = category_data.get(item_type, {})
             value = pair_data.get('last') if isinstance(pair_data, dict) else None
-            is_old = data_ages.get(category, {}).get(item_type, False)
+            age = data_ages.get(category, {}).get(item_type, 0.0)
         else:
             value = category_data.get(item_type)
-            is_old = data_ages.get(category, {}).get(item_type, False)
+            age = data_ages.get(category, {}).get(item_type, 0.0)
         
         if value is None:
             value = 'N/A'
         
-        return value, is_old
+        return value, self.is_old(category, age)
+    
+    def _get_history(self, item_type: str, category: str, window: int, 
+                     width: int = DEFAULT_SPARKLINE_WIDTH) -> Optional[Buckets]:
+        """Gets history of value over last window ms downsampled to width buckets"""
+        return self.history_view.get_buckets(get_series_name(category, item_type), window, width)
     
     def _format_value(self, value: Any, item_config: Dict[str, Any]) -> str:
         """Formats value for display"""
-        if value is None or value == 'N/A':
-            prefix = item_config.get('prefix', '')
-            return f"{prefix}N/A".strip()
-        
-        prefix = item_config.get('prefix', '')
-        suffix = item_config.get('suffix', '')
-        
-        if isinstance(value, (int, float)):
-            if isinstance(value, float) and value == int(value):
-                value_str = str(int(value))
-            elif isinstance(value, float):
-                value_str = f"{value:.2f}"
-            else:
-                value_str = str(value)
-            return f"{prefix}{value_str}{suffix}".strip()
-        
-        return f"{prefix}{value}{suffix}".strip()
+        return format_value_text(value, item_config.get('prefix', ''), item_config.get('suffix', ''))
+    
+    def _get_text_width(self, font: ImageFont.FreeTypeFont, text: str) -> int:
+        """Measures width of text drawn with font"""
+        return self.text_cache.get_text_width(font, text)
+    
+    def _draw_text(self, canvas: FrameCanvas, x: int, y: int, text: str, 
+                   font: ImageFont.FreeTypeFont, colour: Any, static_prefix: str = ''):
+        """Draws text by blitting cached sprites instead of rasterizing it"""
+        for dx, sprite in self.text_cache.get_text_sprites(font, text, static_prefix, self.fontmode):
+            canvas.draw_mask(x + dx + sprite.offset_x, y + sprite.offset_y, sprite.mask, colour,
+                             sprite.get_mask(canvas.rotation))
+    
+    def _draw_sparkline(self, canvas: FrameCanvas, x: int, y: int, widget: Any, colour: Any):
+        """Draws cached sparkline mask of history series"""
+        sprite = self.history_view.get_sparkline(widget.series, widget.window, widget.width, widget.height)
+        if sprite is not None:
+            canvas.draw_mask(x, y, sprite.mask, colour, sprite.get_mask(canvas.rotation))
     
-    def render(self, data: Dict[str, Any], data_ages: Dict[str, Dict[str, bool]]) -> Image.Image:
+    def _draw_icon(self, canvas: FrameCanvas, x: int, y: int, widget: IconOp, code: Any) -> bool:
+        """Copies icon of code from icon atlas, returns False if there is no such icon"""
+        icon = self.icon_atlas.get(code, widget.width)
+        if icon is None:
+            return False
+        canvas.blit(x, y, icon.width, icon.height, icon.image, icon.mask)
+        return True
+    
+    def update_config(self, config: Dict[str, Any]):
+        """Applies new configuration. Fonts are reloaded only if they changed and compiled
+        layout is rebuilt on next render only if sections or value keys it uses changed."""
+        fonts_changed = config.get('fonts') != self.config.get('fonts')
+        layout_changed = (fonts_changed or any(config.get(section) != self.config.get(section)
+                                               for section in ('display', 'layout', 'dashboard'))
+                          or get_item_categories(config) != get_item_categories(self.config))
+        self.config = config
+        self.old_data_colour = config['display'].get('oldDataColour', 'YELLOW')
+        self.old_data_ages = self._load_old_data_ages()
+        self.line_height = config['layout'].get('lineHeight', 22)
+        self.start_x = config['layout'].get('startX', 5)
+        if fonts_changed:
+            self.fonts = self._load_fonts()
+            self.text_cache.clear()
+        if layout_changed:
+            self.layout = None
+            self.atlas_pending = True
+            self.icon_atlas = None
+        elif self.layout is not None:
+            self.layout.source = config['dashboard'].get('lines', [])
+    
+    def get_layout(self) -> LayoutPlan:
+        """Returns compiled layout, compiling it if configuration lines changed"""
+        if self.layout is None or not self.layout.is_valid_for(self.config):
+            self.layout = compile_layout(self)
+            self._seed_glyph_atlas()
+            if self.icon_atlas is None:
+                self.icon_atlas = self._create_icon_atlas()
+            self.icon_atlas.prepare(self.layout.get_icon_sizes())
+            for line in self.layout.lines:
+                for item in line.items:
+                    self.text_cache.warm_up(item.font, [item.static_prefix], self.fontmode)
+        return self.layout
+    
+    @timed('dashboard_stage_duration_seconds', stage='render')
+    def render(self, data: Dict[str, Any], data_ages: Dict[str, Dict[str, float]]) -> Image.Image:
         """Renders all data on image"""
         
-        image = Image.new('RGB', (self.image_width, self.image_height), self.epd.WHITE)
-        draw = ImageDraw.Draw(image)
+        canvas = FrameCanvas(self.image_mode, (self.image_width, self.image_height),
+                             self.rotation if self.native_rotation else 0, self.background,
+                             build_palette(self.palette_colours) if self.image_mode == 'P' else None)
         
         y_pos = 0
-        lines = self.config['dashboard'].get('lines', [])
-        
-        for line_config in lines:
-            line_start_y = line_config.get('startY', y_pos)
-            if line_start_y >= 0:
-                y_pos = line_start_y
-            
-            line_start_x = line_config.get('startX', self.start_x)
-            x_pos = line_start_x
+        for line in self.get_layout().lines:
+            if line.start_y is not None:
+                y_pos = line.start_y
             
-            items = line_config.get('items', [])
-            
-            for item_config in items:
-                item_type = item_config.get('type')
-                item_x = item_config.get('startY', 0)
-                if item_x > 0:
-                    x_pos = line_start_x + item_x
-                
-                font_name = item_config.get('font', 'font18')
-                font = self.fonts.get(font_name, self.fonts.get('font18'))
-                colour_name = item_config.get('colour', 'BLACK')
+            x_pos = line.start_x
+            for item in line.items:
+                if item.offset_x > 0:
+                    x_pos = line.start_x + item.offset_x
                 
-                if item_type == 'datetime':
-                    value = self._format_datetime(item_config.get('format', '%a - %d %b - %H:%M'))
-                    is_old = False
-                elif item_type == 'sunrise':
-                    value, is_old = self._get_value(data, data_ages, 'sunrise', 'weather')
-                    if value and value != 'N/A':
-                        value = self._format_sun_time(value, item_config.get('format', '%H:%M'))
-                elif item_type == 'sunset':
-                    value, is_old = self._get_value(data, data_ages, 'sunset', 'weather')
-                    if value and value != 'N/A':
-                        value = self._format_sun_time(value, item_config.get('format', '%H:%M'))
-                elif item_type in ['dsw1', 'dsw2', 'bmpt', 'bmpp']:
-                    value, is_old = self._get_value(data, data_ages, item_type, 'sensors')
-                elif item_type in ['temp', 'feels_like', 'humidity', 'pressure', 'wind_speed', 
-                                   'wind_direction', 'clouds', 'description']:
-                    value, is_old = self._get_value(data, data_ages, item_type, 'weather')
-                elif item_type.endswith('-USDC') or item_type in ['BTC-USDC', 'LTC-USDC', 'LINK-USDC', 'SOL-USDC']:
-                    value, is_old = self._get_value(data, data_ages, item_type, 'kucoin')
-                    if value and value != 'N/A' and isinstance(value, (int, float)):
-                        value = f"${value}"
-                else:
-                    value = 'N/A'
-                    is_old = False
+                if isinstance(item.widget, IconOp):
+                    code, _ = item.get_value(data, data_ages)
+                    if self._draw_icon(canvas, x_pos, y_pos, item.widget, code):
+                        x_pos += item.widget.width + item.after_x
+                        continue
+                    # Without data or icon file the code is drawn as text
+                elif item.widget is not None:
+                    _, is_old = item.get_value(data, data_ages)
+                    self._draw_sparkline(canvas, x_pos, y_pos, item.widget, 
+                                         item.old_colour if is_old else item.colour)
+                    x_pos += item.widget.width + item.after_x
+                    continue
                 
-                display_text = self._format_value(value, item_config)
-                colour = self._get_colour(colour_name, is_old)
+                display_text, is_old = item.get_text(data, data_ages)
+                colour = item.old_colour if is_old else item.colour
                 
-                draw.text((x_pos, y_pos), display_text, font=font, fill=colour)
+                self._draw_text(canvas, x_pos, y_pos, display_text, item.font, colour, item.static_prefix)
                 
-                after_x = item_config.get('afterX', 0)
-                try:
-                    bbox = font.getbbox(display_text)
-                    text_width = bbox[2] - bbox[0]
-                except AttributeError:
-                    text_width = font.getsize(display_text)[0]
-                x_pos += text_width + after_x
+                x_pos += self._get_text_width(item.font, display_text) + item.after_x
             
-            after_y = line_config.get('afterY', self.line_height)
-            y_pos += after_y
+            y_pos += line.after_y
             
             if y_pos > self.image_height - 30:
                 break
         
-        if self.rotation != 0:
-            image = image.rotate(-self.rotation, expand=True, fillcolor=self.epd.WHITE)
+        logging.debug(f"Text cache: {self.text_cache.format_stats()}")
+        if self.atlas_pending:
+            self._save_glyph_atlas()
+        
+        image = canvas.image
+        if self.rotation != 0 and not self.native_rotation:
+            image = image.rotate(-self.rotation, expand=True, fillcolor=self.background)
         
         return image
     
+    @timed('dashboard_stage_duration_seconds', stage='init')
     def init_display(self):
         """Initializes display"""
         logging.info("Initializing display")
         self.epd.init()
     
-    def display_image(self, image: Image.Image, full_refresh: bool = True):
-        """Displays image on display"""
-        if full_refresh:
-            self.epd.Clear()
+    @timed('dashboard_stage_duration_seconds', stage='getbuffer')
+    def get_buffer(self, image: Image.Image):
+        """Converts image to display buffer, packing it with NumPy when format is known"""
+        if self.epd_type in PACKED_DISPLAY_TYPES:
+            return pack_buffer(image, self.panel_width, self.panel_height)
+        return self.epd.getbuffer(image)
+    
+    def supports_partial_refresh(self) -> bool:
+        """Checks if display driver can refresh only part of the panel"""
+        return hasattr(self.epd, 'display_Partial') or hasattr(self.epd, 'displayPartial')
+    
+    def display_image(self, image: Image.Image, full_refresh: bool = True, 
+                      region: Optional[Tuple[int, int, int, int]] = None):
+        """Displays image on display.
+        If region is given and driver supports it, only that part of the panel is refreshed."""
+        buffer = self.get_buffer(image)
         
-        try:
-            self.epd.display(self.epd.getbuffer(image))
-        except AttributeError:
-            self.epd.Display(self.epd.getbuffer(image))
+        with get_metrics().timer('dashboard_stage_duration_seconds', stage='display'):
+            if region is not None and not full_refresh:
+                if hasattr(self.epd, 'display_Partial'):
+                    self.epd.display_Partial(buffer, *region)
+                    return
+                if hasattr(self.epd, 'displayPartial'):
+                    self.epd.displayPartial(buffer)
+                    return
+            
+            if full_refresh:
+                self.epd.Clear()
+            
+            try:
+                self.epd.display(buffer)
+            except AttributeError:
+                self.epd.Display(buffer)
     
     def sleep(self):
         """Puts display to sleep mode"""
@@ -11,6 +11,7 @@ import logging
 from waveshare_epd import epd2in15g
 import time
 from PIL import Image,ImageDraw,ImageFont
+from font_manager import load_font
 import requests
 import json
 import os
@@ -156,10 +157,10 @@ weather_possitions = { 'dsw1': 120, 'humidity': 80,'wind_speed': 110, 'pressure'
 br = 22
 epaper = []
 
-font15 = ImageFont.truetype(os.path.join(picdir, 'Font.ttc'), 15)
-font18 = ImageFont.truetype(os.path.join(picdir, 'Font.ttc'), 18)
-font24 = ImageFont.truetype(os.path.join(picdir, 'Font.ttc'), 24)
-font40 = ImageFont.truetype(os.path.join(picdir, 'Font.ttc'), 40)
+font15 = load_font(os.path.join(picdir, 'Font.ttc'), 15)
+font18 = load_font(os.path.join(picdir, 'Font.ttc'), 18)
+font24 = load_font(os.path.join(picdir, 'Font.ttc'), 24)
+font40 = load_font(os.path.join(picdir, 'Font.ttc'), 40)
 
 try:
     logging.info("sensors")
@@ -2,58 +2,253 @@
 # -*- coding:utf-8 -*-
 import sys
 import os
+import copy
+import time
+import argparse
 import logging
+import threading
 
-from config_loader import load_config, validate_config, load_env_file
-from data_loader import load_all_data
-from data_storage import save_data
+from config_loader import load_config, load_config_snapshot, load_env_file, share_unchanged
+from config_watcher import ConfigWatcher
+from data_loader import load_all_data, refresh_data, merge_results, get_data_service_keys
+from data_storage import save_data, strip_metadata, get_data_ages, get_service_timestamp
 from display_renderer import DisplayRenderer
+from display_backends import cleanup_displays
+from frame_diff import FrameDiffer, REFRESH_SKIP, REFRESH_PARTIAL
+from refresh_policy import RefreshPolicy
+from scheduler import ServiceScheduler, MIN_SLEEP
+from json_path import compile_config_paths
+from sensor_registry import apply_sensor_registry
+from sensor_ingest import start_ingest
+from history_store import load_history
+from metrics import get_metrics, load_metrics, DEFAULT_METRICS_HOST
+from startup import measure_import_times, format_startup_report, check_startup, DEFAULT_STARTUP_BUDGET
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+DEFAULT_CONFIG_PATH = 'dashboard.config.json'
+DEFAULT_REDRAW_INTERVAL = 600000
+DEFAULT_LOG_LEVEL = 'DEBUG'
+
+def load_checked_config(config_path: str):
+    """Loads and validates configuration, returns None on failure.
+    Unchanged configuration is loaded from snapshot of previous run without parsing it."""
+    logging.info("Loading configuration...")
+    config = load_config_snapshot(config_path)
+    if not config:
+        logging.error("Failed to load valid configuration")
+        return None
+
+    apply_sensor_registry(config)
+    compile_config_paths(config)
+    return config
+
+def draw(renderer: DisplayRenderer, differ: FrameDiffer, policy: RefreshPolicy, all_data, data_ages):
+    """Renders data and pushes it to the display as decided by the refresh policy.
+    Panel update is skipped when frame did not change and is partial for small changes."""
+    logging.info("Rendering data on display...")
+    display_data = policy.apply_deadbands(all_data)
+    image = renderer.render(display_data, data_ages)
+
+    region = differ.get_changed_region(image)
+    if region is None:
+        # Checked before the policy, so the display driver is not even imported
+        logging.info("Frame unchanged, skipping display refresh")
+        differ.record(image, REFRESH_SKIP)
+        get_metrics().inc('dashboard_refreshes_total', type=REFRESH_SKIP)
+        return
+
+    decision = policy.decide(region, image.size, renderer.supports_partial_refresh)
+    logging.info(f"Refresh: {decision.refresh_type}{' with clear' if decision.clear else ''}, {decision.reason}")
+    if decision.refresh_type != REFRESH_SKIP:
+        renderer.init_display()
+        renderer.display_image(image, full_refresh=decision.clear,
+                               region=region if decision.refresh_type == REFRESH_PARTIAL else None)
+        renderer.sleep()
+    differ.record(image, decision.refresh_type)
+    policy.record(decision, display_data)
+    get_metrics().inc('dashboard_refreshes_total', type=decision.refresh_type)
+
+def reload_config(config_path: str, config, renderer: DisplayRenderer, scheduler: ServiceScheduler,
+                  policy: RefreshPolicy, ingest):
+    """Loads changed configuration and rebuilds only what depends on changed parts.
+    Unchanged parts keep their objects, so compiled layout and decoders stay valid for them.
+    Returns configuration in use, the previous one if the new one is invalid."""
+    new_config = load_checked_config(config_path)
+    if not new_config:
+        logging.error("Keeping previous configuration")
+        return config
+    new_config = share_unchanged(config, new_config)
+    if new_config is config:
+        logging.info("Configuration unchanged")
+        return config
+
+    changed = sorted(key for key in set(config) | set(new_config) if config.get(key) is not new_config.get(key))
+    logging.info(f"Configuration changed: {changed}")
+    renderer.update_config(new_config)
+    policy.update_config(new_config)
+    if ingest:
+        ingest.update_config(new_config)
+    service_keys = get_data_service_keys(new_config)
+    scheduler.update_config(new_config, service_keys)
+    old_services, new_services = config.get('services', {}), new_config.get('services', {})
+    changed_services = [key for key in service_keys
+                        if key in old_services and new_services[key] is not old_services[key]]
+    if changed_services:
+        logging.info(f"Refetching services with changed configuration: {changed_services}")
+        scheduler.mark_due(changed_services)
+    return new_config
+
+def run_once(config_path: str):
+    """Fetches data, draws it once and exits"""
+    config = load_checked_config(config_path)
+    if not config:
+        return
+
+    metrics = load_metrics(config)
+    logging.info("Loading data from all sources...")
+    all_data, data_ages = load_all_data(config, use_cache=True)
+
+    save_data(all_data)
+    history = load_history(config)
+    if history:
+        history.record_data(all_data, data_ages)
+
+    logging.info("Initializing display renderer...")
+    renderer = DisplayRenderer(config, history)
+    draw(renderer, FrameDiffer(), RefreshPolicy(config), all_data, data_ages)
+    if history:
+        history.close()
+    metrics.finish_cycle()
+
+    logging.info("Completed successfully")
+
+def run_daemon(config_path: str):
+    """Keeps renderer warm and refreshes every service on its own refreshInterval.
+    Readings pushed by sensors wake the loop at once and postpone polling of their device.
+    The display is redrawn only when merged data or old value flags change,
+    or when redrawInterval passes."""
+    config = load_checked_config(config_path)
+    if not config:
+        return
+
+    metrics = load_metrics(config)
+    metrics_config = config.get('metrics', {})
+    if metrics_config.get('enabled', False) and metrics_config.get('port'):
+        metrics.start_server(metrics_config['port'], metrics_config.get('host', DEFAULT_METRICS_HOST))
+
+    redraw_interval = config.get('runtime', {}).get('redrawInterval', DEFAULT_REDRAW_INTERVAL) / 1000.0
+    service_keys = get_data_service_keys(config)
+    scheduler = ServiceScheduler(config, service_keys)
+
+    history = load_history(config)
+    logging.info("Initializing display renderer...")
+    renderer = DisplayRenderer(config, history)
+    differ = FrameDiffer(frame_file=None)
+    policy = RefreshPolicy(config)
+
+    all_data, data_ages = load_all_data(config, use_cache=True)
+    now, now_monotonic = time.time(), time.monotonic()
+    for service_key in service_keys:
+        fetched_at = get_service_timestamp(all_data, service_key)
+        if fetched_at is not None:
+            scheduler.mark_fetched([service_key], now=now_monotonic - max(now - fetched_at, 0.0))
+    save_data(all_data)
+    if history:
+        history.record_data(all_data, data_ages)
+
+    draw(renderer, differ, policy, all_data, data_ages)
+    drawn_state = copy.deepcopy((strip_metadata(policy.apply_deadbands(all_data)),
+                                 renderer.get_old_flags(data_ages)))
+    last_draw = time.monotonic()
+    metrics.finish_cycle()
+
+    # Set by pushed readings and configuration changes to end the wait early
+    wake = threading.Event()
+    reload_requested = threading.Event()
+
+    def request_reload():
+        reload_requested.set()
+        wake.set()
+
+    ingest = start_ingest(config, wake)
+    if config.get('runtime', {}).get('configReload', True):
+        ConfigWatcher(config_path, request_reload).start()
+    logging.info("Daemon started")
+    while True:
+        wait_time = min(scheduler.seconds_until_next(),
+                        max(last_draw + redraw_interval - time.monotonic(), 0.0))
+        if ingest:
+            ingest.wait(max(wait_time, MIN_SLEEP))
+        else:
+            wake.wait(max(wait_time, MIN_SLEEP))
+            wake.clear()
+
+        if reload_requested.is_set():
+            reload_requested.clear()
+            config = reload_config(config_path, config, renderer, scheduler, policy, ingest)
+            redraw_interval = config.get('runtime', {}).get('redrawInterval', DEFAULT_REDRAW_INTERVAL) / 1000.0
+
+        readings = ingest.drain() if ingest else {}
+        if readings:
+            merge_results(config, all_data, data_ages, readings)
+            scheduler.mark_fetched(list(readings.keys()))
+
+        due_services = scheduler.due_services()
+        if due_services:
+            refresh_data(config, all_data, data_ages, due_services)
+            scheduler.mark_fetched(due_services)
+        if due_services or readings:
+            save_data(all_data)
+            if history:
+                history.record_data(all_data, data_ages)
+
+        data_ages = get_data_ages(all_data)
+        # Values moving within their deadband do not wake the panel
+        state = (strip_metadata(policy.apply_deadbands(all_data)), renderer.get_old_flags(data_ages))
+        redraw_due = time.monotonic() - last_draw >= redraw_interval
+        if state != drawn_state or redraw_due:
+            draw(renderer, differ, policy, all_data, data_ages)
+            drawn_state = copy.deepcopy(state)
+            last_draw = time.monotonic()
+        else:
+            logging.debug("Data unchanged, skipping redraw")
+        metrics.finish_cycle()
+
+def run_startup_report(config_path: str):
+    """Measures import time of a fresh start against runtime.startupBudget (ms)"""
+    config = load_config(config_path) or {}
+    budget = config.get('runtime', {}).get('startupBudget', DEFAULT_STARTUP_BUDGET)
+    entries = measure_import_times()
+    print(format_startup_report(entries, budget))
+    if not check_startup(entries, budget):
+        sys.exit(1)
 
 def main():
+    parser = argparse.ArgumentParser(description='E-paper dashboard')
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH, help='path to configuration file')
+    parser.add_argument('--daemon', action='store_true',
+                        help='keep running and refresh services on their refreshInterval')
+    parser.add_argument('--log-level', default=DEFAULT_LOG_LEVEL,
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='logging level')
+    parser.add_argument('--startup-report', action='store_true',
+                        help='print import time of startup and exit with status 1 if it exceeds budget')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log_level),
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.startup_report:
+        run_startup_report(args.config)
+        return
+
     load_env_file()
     try:
-        config_path = 'dashboard.config.json'
-        
-        logging.info("Loading configuration...")
-        config = load_config(config_path)
-        if not config:
-            logging.error("Failed to load configuration")
-            return
-        
-        if not validate_config(config):
-            logging.error("Configuration is invalid")
-            return
-        
-        logging.info("Loading data from all sources...")
-        all_data, data_ages = load_all_data(config, use_cache=True)
-        
-        save_data(all_data)
-        
-        logging.info("Initializing display renderer...")
-        renderer = DisplayRenderer(config)
-        renderer.init_display()
-        
-        logging.info("Rendering data on display...")
-        image = renderer.render(all_data, data_ages)
-        
-        needs_full_refresh = any(
-            any(ages.values()) if isinstance(ages, dict) and ages else False 
-            for ages in data_ages.values()
-        )
-        renderer.display_image(image, full_refresh=needs_full_refresh)
-        renderer.sleep()
-        
-        logging.info("Completed successfully")
-        
+        if args.daemon:
+            run_daemon(args.config)
+        else:
+            run_once(args.config)
+
     except KeyboardInterrupt:
         logging.info("Interrupted by user")
-        try:
-            from waveshare_epd import epd2in15g
-            epd2in15g.epdconfig.module_exit(cleanup=True)
-        except:
-            pass
+        cleanup_displays()
         sys.exit(0)
     except Exception as e:
         logging.error(f"Critical error: {e}", exc_info=True)
@@ -61,4 +256,3 @@ def main():
 
 if __name__ == '__main__':
     main()
-
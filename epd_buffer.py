@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+from PIL import Image
+from typing import Dict, Any, List, Optional
+
+from startup import lazy_import
+
+# NumPy is loaded when the first frame is packed, not at startup
+np = lazy_import('numpy')
+
+COLOUR_RGB = {
+    'BLACK': (0, 0, 0),
+    'WHITE': (255, 255, 255),
+    'YELLOW': (255, 255, 0),
+    'RED': (255, 0, 0)
+}
+# Order of colours in the 2 bit per pixel buffer of 4-colour panels
+PANEL_COLOURS = ['BLACK', 'WHITE', 'YELLOW', 'RED']
+DEFAULT_COLOURS = ['WHITE', 'BLACK', 'RED', 'YELLOW']
+
+def get_palette_colours(config: Dict[str, Any]) -> List[str]:
+    """Gets palette colour names from display.colours configuration"""
+    colours = config.get('display', {}).get('colours', DEFAULT_COLOURS)
+    return [name for name in colours if name in COLOUR_RGB]
+
+def build_palette(colour_names: List[str]) -> List[int]:
+    """Builds flat RGB palette for P-mode images"""
+    palette = []
+    for name in colour_names:
+        palette.extend(COLOUR_RGB[name])
+    return palette + [0, 0, 0] * (256 - len(colour_names))
+
+def _get_panel_palette_image() -> Image.Image:
+    """Returns palette image used to quantize frames to panel colours"""
+    pal_image = Image.new('P', (1, 1))
+    pal_image.putpalette(build_palette(PANEL_COLOURS))
+    return pal_image
+
+def _get_panel_lut(image: Image.Image) -> Optional[List[int]]:
+    """Maps palette indexes of image to panel colour codes.
+    Returns None if image palette has colours the panel can not show."""
+    palette = image.getpalette()
+    if palette is None:
+        return None
+    rgb_codes = {COLOUR_RGB[name]: code for code, name in enumerate(PANEL_COLOURS)}
+    used = image.getcolors(256) or []
+    lut = [0] * 256
+    for _, index in used:
+        code = rgb_codes.get(tuple(palette[index * 3:index * 3 + 3]))
+        if code is None:
+            return None
+        lut[index] = code
+    return lut
+
+def to_panel_codes(image: Image.Image, width: int, height: int) -> bytes:
+    """Converts image to one panel colour code (0-3) per byte, rotating it like the driver does"""
+    if image.size == (height, width) and image.size != (width, height):
+        image = image.rotate(90, expand=True)
+    if image.size != (width, height):
+        raise ValueError(f"Invalid image dimensions: {image.size}, expected {(width, height)}")
+
+    if image.mode == 'P':
+        lut = _get_panel_lut(image)
+        if lut is not None:
+            return image.tobytes().translate(bytes(lut))
+
+    return image.convert('RGB').quantize(palette=_get_panel_palette_image()).tobytes('raw')
+
+def pack_2bpp(codes: bytes, width: int, height: int) -> bytearray:
+    """Packs panel colour codes into 4 pixels per byte, rows padded to whole bytes"""
+    row_bytes = (width + 3) // 4
+    if np is not None:
+        pixels = np.frombuffer(codes, dtype=np.uint8).reshape(height, width)
+        if width % 4:
+            pixels = np.pad(pixels, ((0, 0), (0, row_bytes * 4 - width)))
+        quads = pixels.reshape(height, row_bytes, 4)
+        packed = (quads[:, :, 0] << 6) | (quads[:, :, 1] << 4) | (quads[:, :, 2] << 2) | quads[:, :, 3]
+        return bytearray(packed.tobytes())
+
+    buf = bytearray(row_bytes * height)
+    pad = bytes(row_bytes * 4 - width)
+    idx = 0
+    for row in range(height):
+        row_codes = codes[row * width:(row + 1) * width] + pad
+        for i in range(0, len(row_codes), 4):
+            buf[idx] = (row_codes[i] << 6) | (row_codes[i + 1] << 4) | (row_codes[i + 2] << 2) | row_codes[i + 3]
+            idx += 1
+    return buf
+
+def pack_buffer(image: Image.Image, width: int, height: int) -> bytearray:
+    """Produces 4-colour panel buffer, same as getbuffer of the waveshare driver.
+    P-mode images with panel colours are packed without quantization."""
+    return pack_2bpp(to_panel_codes(image, width, height), width, height)
+
+def unpack_buffer(buf: bytes, width: int, height: int) -> Image.Image:
+    """Converts 4-colour panel buffer back to P-mode image in panel orientation"""
+    row_bytes = (width + 3) // 4
+    if np is not None:
+        packed = np.frombuffer(bytes(buf), dtype=np.uint8).reshape(height, row_bytes)
+        quads = np.stack([packed >> 6, (packed >> 4) & 3, (packed >> 2) & 3, packed & 3], axis=-1)
+        codes = quads.reshape(height, row_bytes * 4)[:, :width].tobytes()
+    else:
+        codes = bytearray(width * height)
+        idx = 0
+        for row in range(height):
+            for column in range(width):
+                byte = buf[row * row_bytes + column // 4]
+                codes[idx] = (byte >> (6 - 2 * (column % 4))) & 3
+                idx += 1
+    image = Image.frombytes('P', (width, height), bytes(codes))
+    image.putpalette(build_palette(PANEL_COLOURS))
+    return image
+
+# Display types whose buffer format is produced by pack_buffer
+PACKED_DISPLAY_TYPES = frozenset(['epd2in15g'])
@@ -0,0 +1,63 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import os
+import logging
+import threading
+from PIL import ImageFont
+from typing import Dict, Any, Optional, Tuple
+
+class FontManager:
+    """Fonts shared by all renderers of the process.
+    Every font file is opened once and its other sizes are derived from the first face.
+    Faces are opened by path, so FreeType maps the file and all sizes share its pages,
+    where loading from bytes would copy the whole file for every size."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fonts: Dict[Tuple[str, int], Any] = {}
+        # First face of every file, sizes are derived from it
+        self.faces: Dict[str, Any] = {}
+        # Font object: (path, size), to key caches kept outside the process
+        self.sources: Dict[int, Tuple[str, int]] = {}
+
+    def load_font(self, path: str, size: int) -> Any:
+        """Returns font of given size, raising OSError if the file can't be loaded"""
+        key = (os.path.abspath(path), size)
+        with self.lock:
+            font = self.fonts.get(key)
+            if font is not None:
+                return font
+            face = self.faces.get(key[0])
+            if face is None:
+                font = self.faces[key[0]] = ImageFont.truetype(key[0], size)
+            else:
+                font = face.font_variant(size=size)
+            self.fonts[key] = font
+            self.sources[id(font)] = key
+            return font
+
+    def get_source(self, font: Any) -> Optional[Tuple[str, int]]:
+        """Returns (path, size) of font loaded by the manager"""
+        return self.sources.get(id(font))
+
+    def get_stats(self) -> Dict[str, int]:
+        return {'files': len(self.faces), 'fonts': len(self.fonts)}
+
+    def clear(self):
+        with self.lock:
+            self.fonts.clear()
+            self.faces.clear()
+            self.sources.clear()
+
+_font_manager = FontManager()
+
+def get_font_manager() -> FontManager:
+    return _font_manager
+
+def load_font(path: str, size: int) -> Any:
+    """Returns shared font of given size, falling back to default font if it can't be loaded"""
+    try:
+        return _font_manager.load_font(path, size)
+    except OSError as e:
+        logging.warning(f"Failed to load font {path} size {size}: {e}")
+        return ImageFont.load_default()
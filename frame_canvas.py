@@ -0,0 +1,69 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+from PIL import Image, ImageDraw
+from typing import Any, List, Optional, Tuple
+
+_Transpose = getattr(Image, 'Transpose', Image)
+
+# Transposition equal to image.rotate(-rotation, expand=True) for each supported rotation
+ROTATION_TRANSPOSE = {
+    90: _Transpose.ROTATE_270,
+    180: _Transpose.ROTATE_180,
+    270: _Transpose.ROTATE_90
+}
+NATIVE_ROTATIONS = frozenset([0]) | frozenset(ROTATION_TRANSPOSE)
+
+def rotate_mask(mask: Image.Image, rotation: int) -> Image.Image:
+    """Rotates mask clockwise by rotation degrees"""
+    if rotation == 0:
+        return mask
+    return mask.transpose(ROTATION_TRANSPOSE[rotation])
+
+class FrameCanvas:
+    """Frame in panel orientation which is drawn on with layout coordinates.
+    Masks are rotated instead of the finished frame, so no full-frame copy is made."""
+
+    def __init__(self, mode: str, size: Tuple[int, int], rotation: int, background: Any,
+                 palette: Optional[List[int]] = None):
+        if rotation not in NATIVE_ROTATIONS:
+            raise ValueError(f"Unsupported rotation: {rotation}")
+        self.width, self.height = size
+        self.rotation = rotation
+        if rotation in (90, 270):
+            native_size = (self.height, self.width)
+        else:
+            native_size = size
+        self.image = Image.new(mode, native_size, background)
+        if palette is not None:
+            self.image.putpalette(palette)
+        self.draw = ImageDraw.Draw(self.image)
+
+    def transform_box(self, x: int, y: int, width: int, height: int) -> Tuple[int, int]:
+        """Maps top left corner of layout box to top left corner of the box in the frame"""
+        if self.rotation == 90:
+            return self.height - y - height, x
+        if self.rotation == 180:
+            return self.width - x - width, self.height - y - height
+        if self.rotation == 270:
+            return y, self.width - x - width
+        return x, y
+
+    def draw_mask(self, x: int, y: int, mask: Image.Image, fill: Any,
+                  rotated_mask: Optional[Image.Image] = None):
+        """Fills pixels of mask placed at layout position with colour.
+        rotated_mask can be passed when mask was already rotated to panel orientation."""
+        if rotated_mask is None:
+            rotated_mask = rotate_mask(mask, self.rotation)
+        self.draw.bitmap(self.transform_box(x, y, mask.width, mask.height), rotated_mask, fill=fill)
+
+    def paste(self, x: int, y: int, image: Image.Image, rotated_image: Optional[Image.Image] = None):
+        """Copies image placed at layout position into frame"""
+        if rotated_image is None:
+            rotated_image = rotate_mask(image, self.rotation)
+        self.image.paste(rotated_image, self.transform_box(x, y, image.width, image.height))
+
+    def blit(self, x: int, y: int, width: int, height: int, rotated_image: Image.Image,
+             rotated_mask: Image.Image):
+        """Copies pixels of image already in panel orientation where mask is set,
+        placing box of width x height at layout position"""
+        self.image.paste(rotated_image, self.transform_box(x, y, width, height), rotated_mask)
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import os
+import json
+import logging
+from PIL import Image, ImageChops
+from typing import Dict, Any, Optional, Tuple
+
+DEFAULT_FRAME_FILE = 'last_frame.png'
+DEFAULT_STATS_FILE = 'frame_stats.json'
+DEFAULT_PARTIAL_REFRESH_AREA = 0.5
+# Partial windows are aligned to whole bytes of 1 bit per pixel drivers
+REGION_ALIGN = 8
+
+REFRESH_SKIP = 'skip'
+REFRESH_PARTIAL = 'partial'
+REFRESH_FULL = 'full'
+
+Region = Tuple[int, int, int, int]
+
+def _index_image(image: Image.Image) -> Image.Image:
+    """Returns image suitable for ImageChops, palette images are compared by index"""
+    if image.mode == 'P':
+        return Image.frombytes('L', image.size, image.tobytes())
+    return image
+
+def align_region(region: Region, size: Tuple[int, int], align: int = REGION_ALIGN) -> Region:
+    """Expands region horizontally to byte boundaries"""
+    x0, y0, x1, y1 = region
+    x0 = x0 - x0 % align
+    x1 = min(x1 + (-x1) % align, size[0])
+    return x0, y0, x1, y1
+
+def get_region_area(region: Region, size: Tuple[int, int]) -> float:
+    """Returns part of frame covered by region"""
+    x0, y0, x1, y1 = region
+    return (x1 - x0) * (y1 - y0) / float(size[0] * size[1])
+
+def choose_refresh(region: Optional[Region], size: Tuple[int, int], partial_supported: bool,
+                   max_partial_area: float = DEFAULT_PARTIAL_REFRESH_AREA) -> str:
+    """Chooses refresh type for changed region of frame"""
+    if region is None:
+        return REFRESH_SKIP
+    if partial_supported and get_region_area(region, size) <= max_partial_area:
+        return REFRESH_PARTIAL
+    return REFRESH_FULL
+
+class FrameDiffer:
+    """Keeps last frame pushed to the panel and finds what changed in the next one.
+    Last frame is kept in memory and, if frame_file is set, persisted between runs."""
+
+    def __init__(self, frame_file: Optional[str] = DEFAULT_FRAME_FILE,
+                 stats_file: Optional[str] = DEFAULT_STATS_FILE):
+        self.frame_file = frame_file
+        self.stats_file = stats_file
+        self.last_frame = self._load_frame()
+        self.stats = self._load_stats()
+
+    def _load_frame(self) -> Optional[Image.Image]:
+        """Loads last frame from disk"""
+        if not self.frame_file or not os.path.exists(self.frame_file):
+            return None
+        try:
+            with Image.open(self.frame_file) as frame:
+                frame.load()
+                return frame.copy()
+        except (IOError, OSError) as e:
+            logging.warning(f"Failed to load last frame from {self.frame_file}: {e}")
+            return None
+
+    def _load_stats(self) -> Dict[str, int]:
+        """Loads refresh statistics from disk"""
+        stats = {'frames': 0, REFRESH_SKIP: 0, REFRESH_PARTIAL: 0, REFRESH_FULL: 0}
+        if not self.stats_file or not os.path.exists(self.stats_file):
+            return stats
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                stats.update(json.load(f))
+        except (json.JSONDecodeError, IOError) as e:
+            logging.warning(f"Failed to load frame stats from {self.stats_file}: {e}")
+        return stats
+
+    def get_changed_region(self, image: Image.Image) -> Optional[Region]:
+        """Returns bounding box of changed pixels, None if frame is identical.
+        Whole frame is returned when there is no comparable previous frame."""
+        full_region = (0, 0, image.width, image.height)
+        last_frame = self.last_frame
+        if last_frame is None or last_frame.size != image.size or last_frame.mode != image.mode:
+            return full_region
+
+        if last_frame.tobytes() == image.tobytes():
+            return None
+
+        region = ImageChops.difference(_index_image(last_frame), _index_image(image)).getbbox()
+        if region is None:
+            return None
+        return align_region(region, image.size)
+
+    def record(self, image: Image.Image, refresh_type: str):
+        """Remembers frame shown on the panel and counts refresh type"""
+        self.stats['frames'] += 1
+        self.stats[refresh_type] = self.stats.get(refresh_type, 0) + 1
+
+        if refresh_type != REFRESH_SKIP:
+            self.last_frame = image.copy()
+            if self.frame_file:
+                try:
+                    self.last_frame.save(self.frame_file, format='PNG')
+                except (IOError, OSError) as e:
+                    logging.error(f"Failed to save last frame to {self.frame_file}: {e}")
+
+        self._save_stats()
+        logging.info(f"Frame stats: {self.format_stats()}")
+
+    def _save_stats(self):
+        """Saves refresh statistics to disk"""
+        if not self.stats_file:
+            return
+        try:
+            with open(self.stats_file, 'w', encoding='utf-8') as f:
+                json.dump(self.stats, f, indent=2)
+        except IOError as e:
+            logging.error(f"Failed to save frame stats to {self.stats_file}: {e}")
+
+    def get_avoided_refreshes(self) -> int:
+        """Returns number of full refreshes avoided by skipping or partial refresh"""
+        return self.stats.get(REFRESH_SKIP, 0) + self.stats.get(REFRESH_PARTIAL, 0)
+
+    def format_stats(self) -> str:
+        """Formats refresh statistics for logging"""
+        return (f"{self.stats['frames']} frames, {self.stats.get(REFRESH_SKIP, 0)} skipped, "
+                f"{self.stats.get(REFRESH_PARTIAL, 0)} partial, {self.stats.get(REFRESH_FULL, 0)} full, "
+                f"{self.get_avoided_refreshes()} full refreshes avoided")
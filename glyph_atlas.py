@@ -0,0 +1,122 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import os
+import marshal
+import logging
+import PIL
+from PIL import Image
+from typing import Dict, Any, Optional, List, Tuple
+
+from text_cache import TextCache, Sprite, GLYPH_CHARS
+
+DEFAULT_ATLAS_FILE = 'glyph_atlas.bin'
+ATLAS_VERSION = 1
+
+# Sprite as [advance, offset_x, offset_y, width, height, mask bytes], without mask for blank text
+Entry = List[Any]
+
+def get_font_key(path: str, size: int, fontmode: str) -> Optional[str]:
+    """Returns key of rasterized font, changing whenever its file or Pillow changes"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{os.path.basename(path)}:{size}:{fontmode}:{stat.st_size}:{stat.st_mtime_ns}:{PIL.__version__}"
+
+def _to_entry(advance: float, sprite: Sprite) -> Entry:
+    if sprite.mask is None:
+        return [advance, 0, 0, 0, 0, b'']
+    width, height = sprite.mask.size
+    return [advance, sprite.offset_x, sprite.offset_y, width, height, sprite.mask.tobytes()]
+
+def _to_sprite(entry: Entry) -> Tuple[float, Sprite]:
+    advance, offset_x, offset_y, width, height, pixels = entry
+    if not width:
+        return advance, Sprite(None, 0, 0)
+    return advance, Sprite(Image.frombytes('L', (width, height), pixels), offset_x, offset_y)
+
+class GlyphAtlas:
+    """Glyphs of values and static label sprites of dashboard fonts rasterized by previous runs.
+    Seeding a text cache from it replaces rasterization at startup with copying pixels."""
+
+    def __init__(self, atlas_file: Optional[str] = DEFAULT_ATLAS_FILE):
+        self.atlas_file = atlas_file
+        # Font key: {'glyphs': {char: entry}, 'texts': {text: entry}, 'glyphsMatch': bool}
+        self.fonts: Dict[str, Dict[str, Dict[str, Entry]]] = self._load()
+        self.dirty = False
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, Entry]]]:
+        if not self.atlas_file or not os.path.exists(self.atlas_file):
+            return {}
+        try:
+            with open(self.atlas_file, 'rb') as f:
+                atlas = marshal.loads(f.read())
+            if atlas.get('version') != ATLAS_VERSION:
+                return {}
+            return atlas['fonts']
+        except (EOFError, ValueError, TypeError, KeyError, AttributeError, IOError) as e:
+            logging.warning(f"Failed to load glyph atlas from {self.atlas_file}: {e}")
+            return {}
+
+    def save(self) -> bool:
+        """Saves atlas if fonts were added to it"""
+        if not self.atlas_file or not self.dirty:
+            return False
+        try:
+            temp_file = f"{self.atlas_file}.tmp"
+            with open(temp_file, 'wb') as f:
+                f.write(marshal.dumps({'version': ATLAS_VERSION, 'fonts': self.fonts}))
+            os.replace(temp_file, self.atlas_file)
+            self.dirty = False
+            return True
+        except (IOError, ValueError) as e:
+            logging.error(f"Failed to save glyph atlas to {self.atlas_file}: {e}")
+            return False
+
+    def seed(self, text_cache: TextCache, font: Any, font_key: str, fontmode: str) -> int:
+        """Puts glyphs and sprites of font into text cache, returns number of entries"""
+        entries = self.fonts.get(font_key)
+        if not entries:
+            return 0
+        for char, entry in entries['glyphs'].items():
+            text_cache.add_glyph(font, char, fontmode, *_to_sprite(entry))
+        for text, entry in entries['texts'].items():
+            advance, sprite = _to_sprite(entry)
+            text_cache.add_sprite(font, text, fontmode, sprite, advance)
+        if 'glyphsMatch' in entries:
+            text_cache.set_glyphs_match(font, fontmode, entries['glyphsMatch'])
+        return len(entries['glyphs']) + len(entries['texts'])
+
+    def update(self, text_cache: TextCache, font: Any, font_key: str, fontmode: str,
+               labels: List[str]) -> bool:
+        """Adds glyphs of values, sprites of static labels and result of the glyph check of font
+        from text cache, returns True if atlas changed. Other texts, like dates or descriptions,
+        are dropped, so the atlas does not grow with data."""
+        glyphs, texts = text_cache.get_font_sprites(font, fontmode)
+        entries = self.fonts.setdefault(font_key, {'glyphs': {}, 'texts': {}})
+        changed = False
+        for char, (advance, sprite) in glyphs.items():
+            if char in GLYPH_CHARS and char not in entries['glyphs']:
+                entries['glyphs'][char] = _to_entry(advance, sprite)
+                changed = True
+        stale = [text for text in entries['texts'] if text not in labels]
+        for text in stale:
+            del entries['texts'][text]
+        for text in labels:
+            if text in texts and text not in entries['texts']:
+                entries['texts'][text] = _to_entry(*texts[text])
+                changed = True
+        match = text_cache.get_glyphs_match(font, fontmode)
+        if match is not None and entries.get('glyphsMatch') != match:
+            entries['glyphsMatch'] = match
+            changed = True
+        changed = changed or bool(stale)
+        self.dirty = self.dirty or changed
+        return changed
+
+    def drop_stale(self, font_keys: List[str]):
+        """Drops fonts not in font_keys, like sizes no longer configured or replaced files"""
+        stale = [key for key in self.fonts if key not in font_keys]
+        for key in stale:
+            del self.fonts[key]
+        self.dirty = self.dirty or bool(stale)
@@ -0,0 +1,212 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import time
+import sqlite3
+import logging
+from typing import Dict, Any, Optional, List, Tuple
+
+from data_storage import strip_metadata
+
+DEFAULT_HISTORY_FILE = 'history.db'
+DEFAULT_RAW_RETENTION = 2 * 24 * 3600 * 1000
+DEFAULT_RETENTION = 30 * 24 * 3600 * 1000
+DEFAULT_BUCKET = 3600 * 1000
+DEFAULT_COMPACT_INTERVAL = 3600 * 1000
+
+# Raw samples are kept for rawRetention, older ones are folded into buckets
+# with min/max/sum/count which are kept for retention
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS samples (
+    series_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (series_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollups (
+    series_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    sum REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (series_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+def get_series_name(category: str, key: str) -> str:
+    """Returns history series name of data value, like 'sensors.dsw1'"""
+    return f"{category}.{key}"
+
+def get_numeric_value(value: Any) -> Optional[float]:
+    """Returns value as float if it can be recorded, KuCoin pairs are recorded by last price"""
+    if isinstance(value, dict):
+        value = value.get('last')
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+def get_fresh_values(data: Dict[str, Any], data_ages: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    """Returns numeric values fetched in this cycle by series name"""
+    values = {}
+    for category, category_data in strip_metadata(data).items():
+        if not isinstance(category_data, dict):
+            continue
+        ages = data_ages.get(category, {})
+        for key, value in category_data.items():
+            if ages.get(key) != 0.0:
+                continue
+            number = get_numeric_value(value)
+            if number is not None:
+                values[get_series_name(category, key)] = number
+    return values
+
+class HistoryStore:
+    """SQLite time series of dashboard values with bounded retention.
+    Times are unix seconds in the interface and stored as integer seconds."""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_FILE, raw_retention: int = DEFAULT_RAW_RETENTION,
+                 retention: int = DEFAULT_RETENTION, bucket: int = DEFAULT_BUCKET,
+                 compact_interval: int = DEFAULT_COMPACT_INTERVAL):
+        self.path = path
+        self.raw_retention = raw_retention / 1000.0
+        self.retention = retention / 1000.0
+        self.bucket = max(int(bucket / 1000), 1)
+        self.compact_interval = compact_interval / 1000.0
+        # Incremented on every write, lets readers cache query results
+        self.version = 0
+
+        self.connection = sqlite3.connect(path)
+        # auto_vacuum has to be set before tables are created to take effect
+        self.connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.series_ids: Dict[str, int] = {name: series_id for series_id, name
+                                           in self.connection.execute("SELECT id, name FROM series")}
+
+    def close(self):
+        self.connection.close()
+
+    def _get_series_id(self, name: str) -> int:
+        series_id = self.series_ids.get(name)
+        if series_id is None:
+            self.connection.execute("INSERT OR IGNORE INTO series (name) VALUES (?)", (name,))
+            series_id = self.connection.execute("SELECT id FROM series WHERE name = ?", (name,)).fetchone()[0]
+            self.series_ids[name] = series_id
+        return series_id
+
+    def record(self, values: Dict[str, float], timestamp: Optional[float] = None) -> int:
+        """Appends values of series taken at timestamp, returns number of new samples"""
+        if not values:
+            return 0
+        if timestamp is None:
+            timestamp = time.time()
+        ts = int(timestamp)
+        with self.connection:
+            rows = [(self._get_series_id(name), ts, value) for name, value in values.items()]
+            before = self.connection.total_changes
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO samples (series_id, ts, value) VALUES (?, ?, ?)", rows)
+            added = self.connection.total_changes - before
+        if added:
+            self.version += 1
+        return added
+
+    def record_data(self, data: Dict[str, Any], data_ages: Dict[str, Dict[str, float]],
+                    timestamp: Optional[float] = None) -> int:
+        """Records values fetched in this cycle and compacts history when it is due"""
+        added = self.record(get_fresh_values(data, data_ages), timestamp)
+        self.compact_if_due(timestamp)
+        return added
+
+    def query(self, name: str, start: float, end: Optional[float] = None) -> List[Tuple[int, float, float, float]]:
+        """Returns (ts, min, max, mean) rows of series between start and end ordered by time.
+        Raw samples have equal min, max and mean, older data comes from buckets."""
+        series_id = self.series_ids.get(name)
+        if series_id is None:
+            return []
+        if end is None:
+            end = time.time()
+        return self.connection.execute(
+            "SELECT ts, min, max, sum / count FROM rollups WHERE series_id = ? AND ts >= ? AND ts <= ? "
+            "UNION ALL "
+            "SELECT ts, value, value, value FROM samples WHERE series_id = ? AND ts >= ? AND ts <= ? "
+            "ORDER BY ts",
+            (series_id, int(start) - int(start) % self.bucket, int(end), series_id, int(start), int(end))
+        ).fetchall()
+
+    def get_latest(self, name: str) -> Optional[Tuple[int, float]]:
+        """Returns time and value of newest raw sample of series"""
+        series_id = self.series_ids.get(name)
+        if series_id is None:
+            return None
+        return self.connection.execute(
+            "SELECT ts, value FROM samples WHERE series_id = ? ORDER BY ts DESC LIMIT 1", (series_id,)
+        ).fetchone()
+
+    def compact(self, now: Optional[float] = None):
+        """Folds raw samples older than raw retention into buckets and drops data older than retention"""
+        if now is None:
+            now = time.time()
+        raw_cutoff = int(now - self.raw_retention)
+        raw_cutoff -= raw_cutoff % self.bucket
+        cutoff = int(now - self.retention)
+
+        with self.connection:
+            # Buckets already exist when late samples arrive or bucket size was changed
+            self.connection.execute(
+                "INSERT INTO rollups (series_id, ts, min, max, sum, count) "
+                "SELECT series_id, ts - ts % ? AS bucket, MIN(value), MAX(value), SUM(value), COUNT(*) "
+                "FROM samples WHERE ts < ? GROUP BY series_id, bucket "
+                "ON CONFLICT (series_id, ts) DO UPDATE SET "
+                "min = MIN(min, excluded.min), max = MAX(max, excluded.max), "
+                "sum = sum + excluded.sum, count = count + excluded.count",
+                (self.bucket, raw_cutoff))
+            self.connection.execute("DELETE FROM samples WHERE ts < ?", (raw_cutoff,))
+            self.connection.execute("DELETE FROM rollups WHERE ts < ?", (cutoff,))
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('compacted', ?)", (now,))
+        self.connection.execute("PRAGMA incremental_vacuum")
+        self.version += 1
+
+    def compact_if_due(self, now: Optional[float] = None) -> bool:
+        """Compacts history if compactInterval passed since last compaction"""
+        if now is None:
+            now = time.time()
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'compacted'").fetchone()
+        if row is not None and 0 <= now - row[0] < self.compact_interval:
+            return False
+        self.compact(now)
+        return True
+
+    def get_stats(self) -> Dict[str, int]:
+        """Returns number of series, raw samples and buckets"""
+        return {
+            'series': len(self.series_ids),
+            'samples': self.connection.execute("SELECT COUNT(*) FROM samples").fetchone()[0],
+            'rollups': self.connection.execute("SELECT COUNT(*) FROM rollups").fetchone()[0]
+        }
+
+def load_history(config: Dict[str, Any]) -> Optional[HistoryStore]:
+    """Opens history store from configuration history section, None if it is disabled or fails"""
+    history_config = config.get('history', {})
+    if not history_config.get('enabled', False):
+        return None
+    try:
+        return HistoryStore(
+            path=history_config.get('file', DEFAULT_HISTORY_FILE),
+            raw_retention=history_config.get('rawRetention', DEFAULT_RAW_RETENTION),
+            retention=history_config.get('retention', DEFAULT_RETENTION),
+            bucket=history_config.get('bucket', DEFAULT_BUCKET),
+            compact_interval=history_config.get('compactInterval', DEFAULT_COMPACT_INTERVAL)
+        )
+    except sqlite3.Error as e:
+        logging.error(f"Failed to open history store: {e}")
+        return None
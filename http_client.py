@@ -0,0 +1,157 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import json
+import os
+import hashlib
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from requests.models import PreparedRequest
+from requests.structures import CaseInsensitiveDict
+from typing import Dict, Any, Optional
+
+DEFAULT_TIMEOUT = 10000
+DEFAULT_POOL_CONNECTIONS = 8
+DEFAULT_POOL_SIZE = 4
+DEFAULT_CACHE_FILE = 'http_cache.json'
+# Larger bodies are not worth keeping on disk for conditional requests
+MAX_CACHED_BODY = 256 * 1024
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_cache_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Returns key of request URL, hashed so that API keys in query are not stored"""
+    request = PreparedRequest()
+    request.prepare_url(url, params)
+    return hashlib.sha1(request.url.encode('utf-8')).hexdigest()
+
+class HttpClient:
+    """Shared HTTP session with keep-alive connection pools limited per host.
+    ETag and Last-Modified validators are kept on disk together with response bodies,
+    so that unchanged resources are answered with 304 and served from the cache."""
+
+    def __init__(self, pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 cache_file: Optional[str] = DEFAULT_CACHE_FILE):
+        self.session = requests.Session()
+        # pool_size connections per host are kept alive. Requests beyond them do not wait
+        # for a free one, which a hung request abandoned at the deadline may never release,
+        # their extra connections are closed instead of returned to the pool.
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_size, pool_block=False)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.cache_file = cache_file
+        self.entries = self._load_entries()
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.not_modified = 0
+
+    def _load_entries(self) -> Dict[str, Dict[str, Any]]:
+        """Loads validators and bodies saved by previous runs"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logging.warning(f"Failed to load HTTP cache from {self.cache_file}: {e}")
+            return {}
+
+    def save(self) -> bool:
+        """Saves validators to cache file if they changed"""
+        if not self.cache_file:
+            return False
+        with self.lock:
+            if not self.dirty:
+                return False
+            entries = dict(self.entries)
+            self.dirty = False
+        try:
+            temp_file = f"{self.cache_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(temp_file, self.cache_file)
+            logging.debug(f"HTTP cache saved to {self.cache_file}")
+            return True
+        except IOError as e:
+            logging.error(f"Failed to save HTTP cache to {self.cache_file}: {e}")
+            return False
+
+    def _store(self, key: str, response: requests.Response):
+        """Remembers validators and body of response"""
+        headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+        if 'ETag' not in headers and 'Last-Modified' not in headers:
+            if key in self.entries:
+                with self.lock:
+                    self.entries.pop(key, None)
+                    self.dirty = True
+            return
+        content = response.content
+        if len(content) > MAX_CACHED_BODY:
+            return
+        with self.lock:
+            self.entries[key] = {
+                'headers': headers,
+                'encoding': response.encoding,
+                # latin-1 maps every byte to one character, so any body survives JSON
+                'body': content.decode('latin-1')
+            }
+            self.dirty = True
+
+    def _cached_response(self, response: requests.Response, entry: Dict[str, Any]) -> requests.Response:
+        """Turns 304 response into 200 response with cached body"""
+        cached = requests.Response()
+        cached.status_code = 200
+        cached.reason = 'OK'
+        cached.url = response.url
+        cached.request = response.request
+        cached.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        cached.encoding = entry.get('encoding')
+        cached._content = entry['body'].encode('latin-1')
+        response.close()
+        return cached
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None,
+            timeout: Any = DEFAULT_TIMEOUT / 1000.0, stream: bool = False) -> requests.Response:
+        """Sends GET request through the pooled session.
+        Streamed responses are not read whole, so they skip conditional caching."""
+        if stream:
+            return self.session.get(url, params=params, timeout=timeout, stream=True)
+
+        key = get_cache_key(url, params)
+        entry = self.entries.get(key)
+        headers = {}
+        if entry:
+            if 'ETag' in entry['headers']:
+                headers['If-None-Match'] = entry['headers']['ETag']
+            if 'Last-Modified' in entry['headers']:
+                headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+
+        response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+        if response.status_code == 304 and entry:
+            self.not_modified += 1
+            logging.debug(f"Not modified: {response.url}")
+            return self._cached_response(response, entry)
+        if response.ok:
+            self._store(key, response)
+        return response
+
+    def close(self):
+        """Closes pooled connections"""
+        self.session.close()
+
+def get_client(config: Dict[str, Any]) -> HttpClient:
+    """Returns client shared by all services, created from runtime configuration"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            runtime_config = config.get('runtime', {})
+            _client = HttpClient(
+                pool_connections=runtime_config.get('httpPoolConnections', DEFAULT_POOL_CONNECTIONS),
+                pool_size=runtime_config.get('httpPoolSize', DEFAULT_POOL_SIZE),
+                cache_file=runtime_config.get('httpCacheFile', DEFAULT_CACHE_FILE)
+            )
+        return _client
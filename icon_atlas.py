@@ -0,0 +1,205 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import os
+import mmap
+import struct
+import marshal
+import logging
+import PIL
+from PIL import Image
+from typing import Dict, Any, Optional, List, Tuple
+
+from epd_buffer import COLOUR_RGB
+from frame_canvas import rotate_mask
+
+DEFAULT_ATLAS_FILE = 'icon_atlas.bin'
+DEFAULT_ICON_SIZE = 24
+ATLAS_MAGIC = b'EPIA'
+ATLAS_VERSION = 1
+# Magic, version and length of the marshalled index which is followed by pixel data
+ATLAS_HEADER = struct.Struct('<4sHI')
+# Pixels more transparent than this are not drawn
+ALPHA_THRESHOLD = 128
+
+_Resampling = getattr(Image, 'Resampling', Image)
+_Dither = getattr(Image, 'Dither', Image)
+
+# Icon as [offset in pixel data, width, height] in layout orientation
+IndexEntry = List[int]
+
+class IconSprite:
+    """Icon converted to frame colours, with its mask, both in panel orientation"""
+    __slots__ = ('width', 'height', 'image', 'mask')
+
+    def __init__(self, width: int, height: int, image: Image.Image, mask: Image.Image):
+        self.width = width
+        self.height = height
+        self.image = image
+        self.mask = mask
+
+def _get_palette_image(colours: List[str]) -> Image.Image:
+    """Returns image whose palette has only given colours, in their order"""
+    palette_image = Image.new('P', (1, 1))
+    palette_image.putpalette([channel for name in colours for channel in COLOUR_RGB[name]])
+    return palette_image
+
+def convert_icon(path: str, size: int, mode: str, colours: List[str], rotation: int,
+                 dither: bool = True) -> Tuple[bytes, bytes]:
+    """Converts icon file to raw pixels of frame mode and mask at size x size, rotated to panel.
+    Colours outside of palette are dithered with Floyd-Steinberg if dither is set."""
+    with Image.open(path) as image:
+        image = image.convert('RGBA')
+    if image.size != (size, size):
+        image = image.resize((size, size), _Resampling.LANCZOS)
+    mask = image.getchannel('A').point(lambda alpha: 255 if alpha >= ALPHA_THRESHOLD else 0)
+    rgb = Image.alpha_composite(Image.new('RGBA', image.size, COLOUR_RGB['WHITE'] + (255,)), image).convert('RGB')
+
+    palette_rgb = {COLOUR_RGB[name] for name in colours}
+    # Icons drawn only with panel colours are copied as they are
+    needs_dither = dither and any(colour not in palette_rgb for _, colour in rgb.getcolors(size * size))
+    pixels = rgb.quantize(palette=_get_palette_image(colours),
+                          dither=_Dither.FLOYDSTEINBERG if needs_dither else _Dither.NONE)
+    if mode != 'P':
+        pixels = pixels.convert(mode)
+    return rotate_mask(pixels, rotation).tobytes(), rotate_mask(mask, rotation).tobytes()
+
+class IconAtlas:
+    """Icons converted once to frame colours at the sizes used by the layout.
+    They are packed into one file which is memory-mapped, so frames only copy their pixels
+    and icon files are decoded and resampled only when they or the display change."""
+
+    def __init__(self, atlas_file: Optional[str], icons_path: str, mode: str, colours: List[str],
+                 rotation: int, dither: bool = True):
+        self.atlas_file = atlas_file
+        self.icons_path = icons_path
+        self.mode = mode
+        self.colours = colours
+        self.rotation = rotation
+        self.dither = dither
+        self.bytes_per_pixel = len(Image.new(mode, (1, 1)).tobytes())
+        # (icon code, size): sprite
+        self.icons: Dict[Tuple[str, int], IconSprite] = {}
+        self.key: Optional[Tuple[Any, ...]] = None
+        self.mmap: Optional[mmap.mmap] = None
+
+    def _get_icon_files(self) -> Dict[str, str]:
+        """Maps icon codes, like 01d, to their files"""
+        try:
+            names = os.listdir(self.icons_path)
+        except OSError as e:
+            logging.warning(f"Failed to list icons in {self.icons_path}: {e}")
+            return {}
+        return {os.path.splitext(name)[0]: os.path.join(self.icons_path, name)
+                for name in sorted(names) if name.lower().endswith('.png')}
+
+    def _get_key(self, icon_files: Dict[str, str], sizes: List[int]) -> Tuple[Any, ...]:
+        """Returns key of atlas contents, changing whenever icons or the way they are drawn change"""
+        files = []
+        for code, path in icon_files.items():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((code, stat.st_size, stat.st_mtime_ns))
+        return (self.mode, tuple(self.colours), self.rotation, self.dither, tuple(sizes),
+                PIL.__version__, tuple(files))
+
+    def _get_rotated_size(self, width: int, height: int) -> Tuple[int, int]:
+        return (height, width) if self.rotation in (90, 270) else (width, height)
+
+    def _build(self, icon_files: Dict[str, str], sizes: List[int]) -> Tuple[Dict[str, IndexEntry], bytearray]:
+        """Converts all icons at all sizes, returns index and packed pixel data"""
+        index = {}
+        data = bytearray()
+        for code, path in icon_files.items():
+            for size in sizes:
+                try:
+                    pixels, mask = convert_icon(path, size, self.mode, self.colours, self.rotation, self.dither)
+                except (OSError, ValueError) as e:
+                    logging.warning(f"Failed to convert icon {path}: {e}")
+                    break
+                index[f"{code}:{size}"] = [len(data), size, size]
+                data += pixels
+                data += mask
+        logging.info(f"Converted {len(index)} icons to {self.mode} {'/'.join(self.colours)} at sizes {sizes}")
+        return index, data
+
+    def _save(self, key: Tuple[Any, ...], index: Dict[str, IndexEntry], data: bytearray) -> bool:
+        try:
+            packed_index = marshal.dumps({'key': key, 'icons': index})
+            temp_file = f"{self.atlas_file}.tmp"
+            with open(temp_file, 'wb') as f:
+                f.write(ATLAS_HEADER.pack(ATLAS_MAGIC, ATLAS_VERSION, len(packed_index)))
+                f.write(packed_index)
+                f.write(data)
+            os.replace(temp_file, self.atlas_file)
+            return True
+        except (IOError, ValueError) as e:
+            logging.error(f"Failed to save icon atlas to {self.atlas_file}: {e}")
+            return False
+
+    def _map(self, key: Tuple[Any, ...]) -> bool:
+        """Memory-maps atlas file if it was built with given key"""
+        if not self.atlas_file or not os.path.exists(self.atlas_file):
+            return False
+        try:
+            with open(self.atlas_file, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Failed to map icon atlas {self.atlas_file}: {e}")
+            return False
+        try:
+            magic, version, index_length = ATLAS_HEADER.unpack_from(mapped, 0)
+            if magic != ATLAS_MAGIC or version != ATLAS_VERSION:
+                mapped.close()
+                return False
+            atlas = marshal.loads(mapped[ATLAS_HEADER.size:ATLAS_HEADER.size + index_length])
+            if atlas.get('key') != key:
+                mapped.close()
+                return False
+        except (struct.error, EOFError, ValueError, TypeError, AttributeError) as e:
+            logging.warning(f"Failed to load icon atlas from {self.atlas_file}: {e}")
+            mapped.close()
+            return False
+        self.icons = self._get_sprites(atlas['icons'], memoryview(mapped)[ATLAS_HEADER.size + index_length:])
+        self.mmap = mapped
+        return True
+
+    def _get_sprites(self, index: Dict[str, IndexEntry], data: memoryview) -> Dict[Tuple[str, int], IconSprite]:
+        """Creates sprites on packed pixel data. Palette and mask images share the memory,
+        RGB images are copied once since Pillow keeps them with 4 bytes per pixel."""
+        icons = {}
+        for name, (offset, width, height) in index.items():
+            code, size = name.rsplit(':', 1)
+            rotated_size = self._get_rotated_size(width, height)
+            pixels_length = width * height * self.bytes_per_pixel
+            mask_offset = offset + pixels_length
+            image = Image.frombuffer(self.mode, rotated_size, data[offset:mask_offset], 'raw', self.mode, 0, 1)
+            mask = Image.frombuffer('L', rotated_size, data[mask_offset:mask_offset + width * height], 'raw', 'L', 0, 1)
+            icons[(code, int(size))] = IconSprite(width, height, image, mask)
+        return icons
+
+    def prepare(self, sizes: List[int]) -> int:
+        """Makes icons of given sizes available, converting them only if atlas file is missing
+        or outdated. Returns number of icons."""
+        sizes = sorted(set(sizes))
+        if not sizes:
+            return 0
+        icon_files = self._get_icon_files()
+        key = self._get_key(icon_files, sizes)
+        if key == self.key:
+            return len(self.icons)
+
+        # Sprites of the previous mapping keep it open until they are released
+        self.mmap = None
+        if not self._map(key):
+            index, data = self._build(icon_files, sizes)
+            if not (self.atlas_file and self._save(key, index, data) and self._map(key)):
+                self.icons = self._get_sprites(index, memoryview(bytes(data)))
+        self.key = key
+        logging.debug(f"Icon atlas: {len(self.icons)} icons")
+        return len(self.icons)
+
+    def get(self, code: Any, size: int) -> Optional[IconSprite]:
+        """Returns sprite of icon code at size, None if there is no such icon"""
+        return self.icons.get((code, size)) if isinstance(code, str) else None
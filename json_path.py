@@ -0,0 +1,85 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import re
+import logging
+from functools import lru_cache
+from typing import Dict, Any, Tuple, Union
+
+_MISSING = object()
+_STEP_PATTERN = re.compile(r'([^.\[\]]+)|\[(-?\d+)\]|(\.)')
+
+class JsonPath:
+    """Compiled path like 'main.temp' or 'weather[0].description'.
+    Keys and list indexes are resolved once, so lookups only walk the data."""
+    __slots__ = ('path', 'steps')
+
+    def __init__(self, path: str, steps: Tuple[Union[str, int], ...]):
+        self.path = path
+        self.steps = steps
+
+    def resolve(self, data: Any) -> Any:
+        """Returns value at path, raising KeyError, IndexError or TypeError if it is missing"""
+        current = data
+        for step in self.steps:
+            current = current[step]
+        return current
+
+    def get(self, data: Any, default: Any = None) -> Any:
+        """Returns value at path or default if it is missing"""
+        try:
+            return self.resolve(data)
+        except (KeyError, IndexError, TypeError):
+            return default
+
+    def __repr__(self) -> str:
+        return f"JsonPath({self.path!r})"
+
+def parse_path(path: str) -> Tuple[Union[str, int], ...]:
+    """Splits path into dictionary keys and list indexes.
+    Raises ValueError for malformed paths such as 'weather[x]'."""
+    steps = []
+    pos = 0
+    # Keys may only start the path or follow a dot, dots and indexes follow a key or index
+    after_dot = True
+    for match in _STEP_PATTERN.finditer(path):
+        if match.start() != pos:
+            break
+        key, index, dot = match.groups()
+        if key is not None and not after_dot:
+            break
+        if key is None and after_dot and (dot or steps):
+            break
+        if index is not None:
+            steps.append(int(index))
+        elif key is not None:
+            steps.append(key)
+        after_dot = bool(dot)
+        pos = match.end()
+    else:
+        if steps and not after_dot and pos == len(path):
+            return tuple(steps)
+    raise ValueError(f"Invalid path: {path!r}")
+
+@lru_cache(maxsize=1024)
+def compile_path(path: str) -> JsonPath:
+    """Returns compiled path, each distinct path is parsed only once"""
+    return JsonPath(path, parse_path(path))
+
+def get_json_value(data: Any, path: str, default: Any = _MISSING) -> Any:
+    """Extracts value from JSON by path, returning default instead of raising if it is given"""
+    if default is _MISSING:
+        return compile_path(path).resolve(data)
+    return compile_path(path).get(data, default)
+
+def compile_config_paths(config: Dict[str, Any]) -> int:
+    """Compiles value paths of all services ahead of first response, logging malformed ones.
+    Returns number of compiled paths."""
+    compiled = 0
+    for service_key, service_config in config.get('services', {}).items():
+        for key, value_config in service_config.get('data', {}).items():
+            try:
+                compile_path(value_config.get('path', key))
+                compiled += 1
+            except ValueError as e:
+                logging.warning(f"Service {service_key} value {key}: {e}")
+    return compiled
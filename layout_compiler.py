@@ -0,0 +1,264 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import logging
+from functools import partial
+from typing import Dict, Any, List, Optional, Callable, Tuple, Union
+
+from config_loader import get_service_category
+from history_store import get_series_name
+from sparkline import get_trend, DEFAULT_WINDOW, DEFAULT_SPARKLINE_WIDTH, DEFAULT_SPARKLINE_HEIGHT
+from icon_atlas import DEFAULT_ICON_SIZE
+
+DEFAULT_FONT = 'font18'
+DEFAULT_DATETIME_FORMAT = '%a - %d %b - %H:%M'
+DEFAULT_TIME_FORMAT = '%H:%M'
+
+def format_number(value: Any) -> str:
+    """Formats number for display, whole floats without decimals"""
+    if isinstance(value, float) and value == int(value):
+        return str(int(value))
+    elif isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+def format_value_text(value: Any, prefix: str, suffix: str) -> str:
+    """Formats value with prefix and suffix for display"""
+    if value is None or value == 'N/A':
+        return f"{prefix}N/A".strip()
+
+    if isinstance(value, (int, float)):
+        return f"{prefix}{format_number(value)}{suffix}".strip()
+
+    return f"{prefix}{value}{suffix}".strip()
+
+class ItemOp:
+    """Pre-resolved draw operation of one dashboard item"""
+    __slots__ = ('item_type', 'offset_x', 'after_x', 'font', 'colour', 'old_colour',
+                 'get_value', 'prefix', 'suffix', 'static_prefix', 'widget')
+
+    def __init__(self, item_type: str, offset_x: int, after_x: int, font: Any, colour: Any,
+                 old_colour: Any, get_value: Callable, prefix: str, suffix: str,
+                 widget: Optional[Union['SparklineOp', 'IconOp']] = None):
+        self.item_type = item_type
+        self.offset_x = offset_x
+        self.after_x = after_x
+        self.font = font
+        self.colour = colour
+        self.old_colour = old_colour
+        self.get_value = get_value
+        self.prefix = prefix
+        self.suffix = suffix
+        # Part of drawn text which does not depend on data
+        self.static_prefix = prefix.lstrip()
+        # Graphic drawn instead of text
+        self.widget = widget
+
+    def get_text(self, data: Dict[str, Any], data_ages: Dict[str, Dict[str, float]]) -> Tuple[str, bool]:
+        """Returns text to draw and flag indicating if it's old"""
+        value, is_old = self.get_value(data, data_ages)
+        return format_value_text(value, self.prefix, self.suffix), is_old
+
+class SparklineOp:
+    """History series drawn as sparkline of given size in pixels"""
+    __slots__ = ('series', 'window', 'width', 'height')
+
+    def __init__(self, series: str, window: int, width: int, height: int):
+        self.series = series
+        self.window = window
+        self.width = width
+        self.height = height
+
+class IconOp:
+    """Icon named by item value drawn from icon atlas at given size in pixels"""
+    __slots__ = ('width', 'height')
+
+    def __init__(self, size: int):
+        self.width = size
+        self.height = size
+
+class LinePlan:
+    """Pre-resolved dashboard line"""
+    __slots__ = ('start_y', 'start_x', 'after_y', 'items')
+
+    def __init__(self, start_y: Optional[int], start_x: int, after_y: int, items: List[ItemOp]):
+        self.start_y = start_y
+        self.start_x = start_x
+        self.after_y = after_y
+        self.items = items
+
+class LayoutPlan:
+    """Compiled dashboard.lines, valid while configuration lines are unchanged"""
+    __slots__ = ('lines', 'source')
+
+    def __init__(self, lines: List[LinePlan], source: Any):
+        self.lines = lines
+        self.source = source
+
+    def is_valid_for(self, config: Dict[str, Any]) -> bool:
+        """Checks if plan was compiled from lines of given configuration"""
+        return config.get('dashboard', {}).get('lines') is self.source
+
+    def get_icon_sizes(self) -> List[int]:
+        """Returns sizes of icons drawn by the layout"""
+        return [item.widget.width for line in self.lines for item in line.items
+                if isinstance(item.widget, IconOp)]
+
+def get_item_categories(config: Dict[str, Any]) -> Dict[str, str]:
+    """Maps data keys configured in services to their data category"""
+    categories = {}
+    for service_key, service_config in config.get('services', {}).items():
+        category = get_service_category(service_key)
+        if category is None:
+            continue
+        for key in service_config.get('data', {}).keys():
+            categories.setdefault(key, category)
+        for pair in service_config.get('pairs', []):
+            categories.setdefault(pair, category)
+    if 'wind_deg' in categories:
+        categories.setdefault('wind_direction', categories['wind_deg'])
+    return categories
+
+def _get_datetime(renderer, fmt: str, data: Dict[str, Any], data_ages: Dict[str, Dict[str, float]]):
+    return renderer._format_datetime(fmt), False
+
+def _get_sun_time(renderer, key: str, fmt: str, data: Dict[str, Any], data_ages: Dict[str, Dict[str, float]]):
+    value, is_old = renderer._get_value(data, data_ages, key, 'weather')
+    if value and value != 'N/A':
+        value = renderer._format_sun_time(value, fmt)
+    return value, is_old
+
+def _get_price(renderer, key: str, data: Dict[str, Any], data_ages: Dict[str, Dict[str, float]]):
+    value, is_old = renderer._get_value(data, data_ages, key, 'kucoin')
+    if value and value != 'N/A' and isinstance(value, (int, float)):
+        value = f"${value}"
+    return value, is_old
+
+def _get_unknown(data: Dict[str, Any], data_ages: Dict[str, Dict[str, float]]):
+    return 'N/A', False
+
+def _get_minmax(renderer, key: str, category: str, window: int, separator: str,
+                data: Dict[str, Any], data_ages: Dict[str, Dict[str, float]]):
+    _, is_old = renderer._get_value(data, data_ages, key, category)
+    buckets = renderer._get_history(key, category, window)
+    if buckets is None or buckets.is_empty():
+        return 'N/A', is_old
+    low, high = buckets.get_range()
+    return f"{format_number(low)}{separator}{format_number(high)}", is_old
+
+def _get_trend(renderer, key: str, category: str, window: int, threshold: float,
+               data: Dict[str, Any], data_ages: Dict[str, Dict[str, float]]):
+    _, is_old = renderer._get_value(data, data_ages, key, category)
+    buckets = renderer._get_history(key, category, window)
+    trend = get_trend(buckets, threshold) if buckets is not None else None
+    return trend or 'N/A', is_old
+
+def _get_key_state(renderer, key: str, category: str,
+                   data: Dict[str, Any], data_ages: Dict[str, Dict[str, float]]):
+    _, is_old = renderer._get_value(data, data_ages, key, category)
+    return None, is_old
+
+def _get_key_category(key: Optional[str], categories: Dict[str, str]) -> Optional[str]:
+    category = categories.get(key)
+    if category is None and key and key.endswith('-USDC'):
+        category = 'kucoin'
+    return category
+
+# Items drawing history of the sensor key or KuCoin pair in 'key' over 'window' ms, e.g.
+#   {"type": "sparkline", "key": "dsw1", "window": 86400000, "width": 100, "height": 20}
+#   {"type": "minmax", "key": "BTC-USDC", "window": 86400000, "separator": "/"}
+#   {"type": "trend", "key": "bmpp", "window": 10800000, "threshold": 0.5, "font": "font24"}
+HISTORY_ITEM_TYPES = frozenset(['sparkline', 'minmax', 'trend'])
+
+def compile_history_item(renderer, item_config: Dict[str, Any],
+                         categories: Dict[str, str]) -> Tuple[Callable, Optional[SparklineOp]]:
+    """Returns value getter and sparkline of item drawing history of its 'key' value"""
+    item_type = item_config.get('type')
+    key = item_config.get('key')
+    category = _get_key_category(key, categories)
+    if category is None:
+        logging.warning(f"Unknown {item_type} key: {key}")
+        return _get_unknown, None
+
+    window = item_config.get('window', DEFAULT_WINDOW)
+    if item_type == 'minmax':
+        return partial(_get_minmax, renderer, key, category, window, item_config.get('separator', '/')), None
+    if item_type == 'trend':
+        return partial(_get_trend, renderer, key, category, window, item_config.get('threshold', 0.0)), None
+    widget = SparklineOp(get_series_name(category, key), window,
+                         item_config.get('width', DEFAULT_SPARKLINE_WIDTH),
+                         item_config.get('height', DEFAULT_SPARKLINE_HEIGHT))
+    return partial(_get_key_state, renderer, key, category), widget
+
+ICON_ITEM_TYPES = frozenset(['weather_icon'])
+
+def compile_icon_item(renderer, item_config: Dict[str, Any],
+                      categories: Dict[str, str]) -> Tuple[Callable, IconOp]:
+    """Returns value getter of icon code and icon drawn for it"""
+    item_type = item_config.get('type')
+    category = categories.get(item_type, 'weather')
+    size = item_config.get('size', renderer.config['layout'].get('iconSize', DEFAULT_ICON_SIZE))
+    return partial(renderer._get_value, item_type=item_type, category=category), IconOp(size)
+
+def compile_value_getter(renderer, item_config: Dict[str, Any],
+                         categories: Dict[str, str]) -> Callable:
+    """Returns function (data, data_ages) -> (value, is_old) for item type"""
+    item_type = item_config.get('type')
+
+    if item_type == 'datetime':
+        return partial(_get_datetime, renderer, item_config.get('format', DEFAULT_DATETIME_FORMAT))
+    if item_type in ('sunrise', 'sunset'):
+        return partial(_get_sun_time, renderer, item_type, item_config.get('format', DEFAULT_TIME_FORMAT))
+
+    category = _get_key_category(item_type, categories)
+    if category == 'kucoin':
+        return partial(_get_price, renderer, item_type)
+    if category is not None:
+        return partial(renderer._get_value, item_type=item_type, category=category)
+
+    logging.warning(f"Unknown dashboard item type: {item_type}")
+    return _get_unknown
+
+def compile_layout(renderer) -> LayoutPlan:
+    """Compiles configuration dashboard.lines into plan of pre-resolved draw operations"""
+    config = renderer.config
+    source = config['dashboard'].get('lines', [])
+    categories = get_item_categories(config)
+    old_colour = renderer._get_colour(renderer.old_data_colour)
+    default_font = renderer.fonts.get(DEFAULT_FONT)
+
+    lines = []
+    for line_config in source:
+        start_y = line_config.get('startY')
+        if start_y is not None and start_y < 0:
+            start_y = None
+
+        items = []
+        for item_config in line_config.get('items', []):
+            if item_config.get('type') in HISTORY_ITEM_TYPES:
+                get_value, widget = compile_history_item(renderer, item_config, categories)
+            elif item_config.get('type') in ICON_ITEM_TYPES:
+                get_value, widget = compile_icon_item(renderer, item_config, categories)
+            else:
+                get_value, widget = compile_value_getter(renderer, item_config, categories), None
+            items.append(ItemOp(
+                item_type=item_config.get('type'),
+                offset_x=item_config.get('startY', 0),
+                after_x=item_config.get('afterX', 0),
+                font=renderer.fonts.get(item_config.get('font', DEFAULT_FONT), default_font),
+                colour=renderer._get_colour(item_config.get('colour', 'BLACK')),
+                old_colour=old_colour,
+                get_value=get_value,
+                prefix=item_config.get('prefix', ''),
+                suffix=item_config.get('suffix', ''),
+                widget=widget
+            ))
+
+        lines.append(LinePlan(
+            start_y=start_y,
+            start_x=line_config.get('startX', renderer.start_x),
+            after_y=line_config.get('afterY', renderer.line_height),
+            items=items
+        ))
+
+    logging.debug(f"Compiled layout: {len(lines)} lines, {sum(len(line.items) for line in lines)} items")
+    return LayoutPlan(lines, source)
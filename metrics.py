@@ -0,0 +1,258 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+# Histogram bucket bounds in ms, from panel-free stages to slow full refreshes
+DEFAULT_BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+DEFAULT_METRICS_HOST = '127.0.0.1'
+
+METRIC_HELP = {
+    'dashboard_stage_duration_seconds': 'Duration of refresh cycle stages',
+    'dashboard_fetch_duration_seconds': 'Duration of service fetches',
+    'dashboard_fetch_failures_total': 'Service fetches which failed or missed the deadline',
+    'dashboard_cache_hits_total': 'Services not fetched because their cached data was fresh',
+    'dashboard_cache_fallbacks_total': 'Values taken from cache because the fetched value was missing',
+    'dashboard_refreshes_total': 'Display refreshes by type',
+    'dashboard_breaker_state': 'Circuit breaker of endpoint, 0 closed, 1 open, 2 half open',
+    'dashboard_breaker_opened_total': 'Times circuit breaker of endpoint opened',
+    'dashboard_breaker_rejections_total': 'Calls not made because circuit breaker of endpoint was open',
+    'dashboard_pushed_readings_total': 'Sensor readings pushed to ingest listeners',
+    'dashboard_cycles_total': 'Completed refresh cycles',
+    'dashboard_last_cycle_timestamp_seconds': 'Time of last completed refresh cycle'
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _get_labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = [(key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for key, value in pairs]
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Histogram:
+    """Observation counts per bucket, bounds in seconds.
+    Counts are per bucket and made cumulative on export."""
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: List[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    """Counters, gauges and histograms of refresh cycles.
+    State is kept in state_file between runs, so that cron runs add up like a long running process."""
+
+    def __init__(self, state_file: Optional[str] = None, textfile: Optional[str] = None,
+                 buckets: List[float] = DEFAULT_BUCKETS):
+        self.state_file = state_file
+        self.textfile = textfile
+        self.bounds = [bucket / 1000.0 for bucket in sorted(buckets)]
+        self.lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.server = None
+        self._load_state()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _get_labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self.lock:
+            self.gauges[(name, _get_labels(labels))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Adds value in seconds to histogram"""
+        key = (name, _get_labels(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.bounds)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observes duration of with block, also when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def get_counter(self, name: str, **labels) -> float:
+        return self.counters.get((name, _get_labels(labels)), 0)
+
+    def get_histogram(self, name: str, **labels) -> Optional[Histogram]:
+        return self.histograms.get((name, _get_labels(labels)))
+
+    def finish_cycle(self):
+        """Counts completed cycle and persists state and text file"""
+        self.inc('dashboard_cycles_total')
+        self.set_gauge('dashboard_last_cycle_timestamp_seconds', time.time())
+        self.save()
+        self.write_textfile()
+
+    def format_prometheus(self) -> str:
+        """Formats all metrics in Prometheus text exposition format"""
+        with self.lock:
+            families: Dict[str, Tuple[str, List[str]]] = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                families.setdefault(name, ('counter', []))[1].append(
+                    f"{name}{_format_labels(labels)} {_format_number(value)}")
+            for (name, labels), value in sorted(self.gauges.items()):
+                families.setdefault(name, ('gauge', []))[1].append(
+                    f"{name}{_format_labels(labels)} {_format_number(value)}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                samples = families.setdefault(name, ('histogram', []))[1]
+                cumulative = 0
+                for bound, count in zip(histogram.bounds + [None], histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound is None else _format_number(bound)
+                    samples.append(f"{name}_bucket{_format_labels(labels, ('le', le))} {cumulative}")
+                samples.append(f"{name}_sum{_format_labels(labels)} {_format_number(histogram.sum)}")
+                samples.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+        lines = []
+        for name, (metric_type, samples) in families.items():
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+    def _write_file(self, path: str, text: str) -> bool:
+        """Replaces file atomically, so that readers never see half written metrics"""
+        try:
+            temp_file = f"{path}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(temp_file, path)
+            return True
+        except IOError as e:
+            logging.error(f"Failed to write metrics to {path}: {e}")
+            return False
+
+    def write_textfile(self) -> bool:
+        """Writes metrics for node_exporter textfile collector"""
+        if not self.textfile:
+            return False
+        return self._write_file(self.textfile, self.format_prometheus())
+
+    def save(self) -> bool:
+        """Saves state for next run"""
+        if not self.state_file:
+            return False
+        with self.lock:
+            state = {
+                'counters': [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                'gauges': [[name, dict(labels), value] for (name, labels), value in self.gauges.items()],
+                'histograms': [[name, dict(labels), histogram.counts, histogram.sum, histogram.count]
+                               for (name, labels), histogram in self.histograms.items()],
+                'bounds': self.bounds
+            }
+        return self._write_file(self.state_file, json.dumps(state))
+
+    def _load_state(self):
+        """Loads state of previous runs, histograms with other buckets are dropped"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            for name, labels, value in state.get('counters', []):
+                self.counters[(name, _get_labels(labels))] = value
+            for name, labels, value in state.get('gauges', []):
+                self.gauges[(name, _get_labels(labels))] = value
+            if state.get('bounds') == self.bounds:
+                for name, labels, counts, total, count in state.get('histograms', []):
+                    histogram = Histogram(self.bounds)
+                    histogram.counts, histogram.sum, histogram.count = counts, total, count
+                    self.histograms[(name, _get_labels(labels))] = histogram
+        except (json.JSONDecodeError, IOError, ValueError, TypeError) as e:
+            logging.warning(f"Failed to load metrics state from {self.state_file}: {e}")
+
+    def start_server(self, port: int, host: str = DEFAULT_METRICS_HOST) -> bool:
+        """Serves metrics on http://host:port/metrics from a background thread"""
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.format_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            logging.error(f"Failed to start metrics server on {host}:{port}: {e}")
+            return False
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True).start()
+        logging.info(f"Serving metrics on http://{host}:{self.server.server_address[1]}/metrics")
+        return True
+
+    def stop_server(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+_metrics = Metrics()
+
+def get_metrics() -> Metrics:
+    """Returns metrics of this process, kept only in memory until load_metrics is called"""
+    return _metrics
+
+def load_metrics(config: Dict[str, Any]) -> Metrics:
+    """Sets up metrics from configuration metrics section, loading state of previous runs"""
+    global _metrics
+    metrics_config = config.get('metrics', {})
+    if metrics_config.get('enabled', False):
+        _metrics = Metrics(metrics_config.get('stateFile'), metrics_config.get('textfile'),
+                           metrics_config.get('buckets', DEFAULT_BUCKETS))
+    return _metrics
+
+def timed(name: str, **labels) -> Callable:
+    """Decorator observing duration of every call in histogram"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _metrics.timer(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
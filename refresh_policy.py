@@ -0,0 +1,170 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import os
+import json
+import time
+import logging
+from typing import Dict, Any, Optional, Tuple, Callable
+
+from frame_diff import (choose_refresh, get_region_area, Region, DEFAULT_PARTIAL_REFRESH_AREA,
+                        REFRESH_SKIP, REFRESH_PARTIAL, REFRESH_FULL)
+from history_store import get_numeric_value
+
+# Defaults draw every change and never skip refreshes. A panel refreshed every few minutes
+# can hide noise and limit wear with e.g.
+#   "refreshPolicy": {"deadbands": {"sensors": 0.1, "sensors.bmpp": 0.5, "weather.temp": 0.2,
+#                                   "kucoin.BTC-USDC": 50},
+#                     "clearEvery": 24, "dailyRefreshBudget": 288}
+# Values within their deadband are not redrawn, and once the budget is spent the panel
+# keeps the last frame until midnight.
+DEFAULT_STATE_FILE = 'refresh_state.json'
+DEFAULT_MIN_CHANGED_AREA = 0.0
+DEFAULT_MAX_PARTIAL_REFRESHES = 10
+# Full refreshes between panel clears and refreshes per day, 0 is unlimited
+DEFAULT_CLEAR_EVERY = 0
+DEFAULT_DAILY_REFRESH_BUDGET = 0
+
+class RefreshDecision:
+    """Refresh type chosen for a frame, with Clear() before full refresh if clear is set"""
+    __slots__ = ('refresh_type', 'clear', 'reason')
+
+    def __init__(self, refresh_type: str, clear: bool = False, reason: str = ''):
+        self.refresh_type = refresh_type
+        self.clear = clear
+        self.reason = reason
+
+    def __repr__(self) -> str:
+        return f"RefreshDecision({self.refresh_type!r}, clear={self.clear}, reason={self.reason!r})"
+
+class RefreshPolicy:
+    """Decides how the panel is refreshed from display.refreshPolicy configuration.
+    Values within their deadband of the last drawn value are drawn unchanged, small changes
+    are skipped or refreshed partially, and counters persisted between runs force periodic
+    full refreshes against ghosting and keep refreshes within the daily budget."""
+
+    def __init__(self, config: Dict[str, Any], state_file: Optional[str] = DEFAULT_STATE_FILE):
+        self.state_file = state_file
+        self.state = self._load_state()
+        self.update_config(config)
+
+    def update_config(self, config: Dict[str, Any]):
+        display_config = config.get('display', {})
+        policy_config = display_config.get('refreshPolicy', {})
+        self.deadbands: Dict[str, float] = policy_config.get('deadbands', {})
+        self.partial_area = display_config.get('partialRefreshArea', DEFAULT_PARTIAL_REFRESH_AREA)
+        self.min_changed_area = policy_config.get('minChangedArea', DEFAULT_MIN_CHANGED_AREA)
+        self.max_partial_refreshes = policy_config.get('maxPartialRefreshes', DEFAULT_MAX_PARTIAL_REFRESHES)
+        self.clear_every = policy_config.get('clearEvery', DEFAULT_CLEAR_EVERY)
+        self.daily_budget = policy_config.get('dailyRefreshBudget', DEFAULT_DAILY_REFRESH_BUDGET)
+
+    def _load_state(self) -> Dict[str, Any]:
+        """Loads counters and drawn values of previous runs"""
+        state = {'day': None, 'refreshes_today': 0, 'partials_since_full': 0,
+                 'fulls_since_clear': 0, 'drawn': {}}
+        if not self.state_file or not os.path.exists(self.state_file):
+            return state
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state.update(json.load(f))
+        except (json.JSONDecodeError, IOError) as e:
+            logging.warning(f"Failed to load refresh state from {self.state_file}: {e}")
+        return state
+
+    def _save_state(self):
+        if not self.state_file:
+            return
+        try:
+            temp_file = f"{self.state_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, ensure_ascii=False)
+            os.replace(temp_file, self.state_file)
+        except IOError as e:
+            logging.error(f"Failed to save refresh state to {self.state_file}: {e}")
+
+    def get_deadband(self, category: str, key: str) -> float:
+        """Returns deadband of 'category.key', falling back to the one of whole category"""
+        deadband = self.deadbands.get(f"{category}.{key}")
+        if deadband is None:
+            deadband = self.deadbands.get(category, 0.0)
+        return deadband
+
+    def apply_deadbands(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns data to draw, with values which moved less than their deadband
+        replaced by the value drawn last, so that they do not change the frame"""
+        if not self.deadbands:
+            return data
+        drawn = self.state['drawn']
+        result = dict(data)
+        for category, category_data in data.items():
+            drawn_category = drawn.get(category)
+            if not drawn_category or not isinstance(category_data, dict):
+                continue
+            filtered = None
+            for key, value in category_data.items():
+                if key not in drawn_category:
+                    continue
+                deadband = self.get_deadband(category, key)
+                new_value, old_value = get_numeric_value(value), get_numeric_value(drawn_category[key])
+                if (deadband and new_value is not None and old_value is not None
+                        and new_value != old_value and abs(new_value - old_value) < deadband):
+                    if filtered is None:
+                        filtered = dict(category_data)
+                    filtered[key] = drawn_category[key]
+            if filtered is not None:
+                result[category] = filtered
+        return result
+
+    def _check_day(self, now: float):
+        day = time.strftime('%Y-%m-%d', time.localtime(now))
+        if self.state['day'] != day:
+            self.state['day'] = day
+            self.state['refreshes_today'] = 0
+
+    def decide(self, region: Optional[Region], size: Tuple[int, int], partial_supported: Callable[[], bool],
+               now: Optional[float] = None) -> RefreshDecision:
+        """Chooses refresh for changed region of frame. partial_supported is called only
+        when the panel is refreshed, so skipped refreshes do not load the display driver."""
+        if region is None:
+            return RefreshDecision(REFRESH_SKIP, reason='frame unchanged')
+        if now is None:
+            now = time.time()
+        self._check_day(now)
+
+        whole_frame = region == (0, 0, size[0], size[1])
+        if not whole_frame and get_region_area(region, size) < self.min_changed_area:
+            return RefreshDecision(REFRESH_SKIP, reason='change below minChangedArea')
+        if self.daily_budget and self.state['refreshes_today'] >= self.daily_budget:
+            return RefreshDecision(REFRESH_SKIP, reason='daily refresh budget spent')
+
+        refresh_type = choose_refresh(region, size, partial_supported(), self.partial_area)
+        if refresh_type == REFRESH_PARTIAL:
+            if self.state['partials_since_full'] < self.max_partial_refreshes:
+                return RefreshDecision(REFRESH_PARTIAL, reason='small change')
+            reason = f"{self.state['partials_since_full']} partial refreshes since full"
+        else:
+            reason = 'large change'
+
+        clear = bool(self.clear_every) and self.state['fulls_since_clear'] + 1 >= self.clear_every
+        return RefreshDecision(REFRESH_FULL, clear, reason)
+
+    def record(self, decision: RefreshDecision, data: Dict[str, Any], now: Optional[float] = None):
+        """Counts refresh pushed to the panel and remembers drawn values for deadbands"""
+        if decision.refresh_type == REFRESH_SKIP:
+            return
+        if now is None:
+            now = time.time()
+        self._check_day(now)
+        state = self.state
+        state['refreshes_today'] += 1
+        if decision.refresh_type == REFRESH_PARTIAL:
+            state['partials_since_full'] += 1
+        else:
+            state['partials_since_full'] = 0
+            state['fulls_since_clear'] = 0 if decision.clear else state['fulls_since_clear'] + 1
+
+        if self.deadbands:
+            state['drawn'] = {category: {key: value for key, value in category_data.items()
+                                         if self.get_deadband(category, key)}
+                              for category, category_data in data.items()
+                              if isinstance(category_data, dict) and not category.startswith('_')}
+        self._save_state()
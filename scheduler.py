@@ -0,0 +1,62 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import time
+import logging
+from typing import Dict, Any, List, Optional, Callable
+
+DEFAULT_REFRESH_INTERVAL = 600000
+MIN_SLEEP = 1.0
+
+class ServiceScheduler:
+    """Keeps track of when each service has to be fetched again,
+    based on its refreshInterval (ms) from configuration"""
+    
+    def __init__(self, config: Dict[str, Any], service_keys: List[str],
+                 clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.intervals = {}
+        self.next_due = {}
+        self.update_config(config, service_keys)
+    
+    def update_config(self, config: Dict[str, Any], service_keys: List[str]):
+        """Updates intervals from configuration, new services become due immediately"""
+        services_config = config.get('services', {})
+        now = self.clock()
+        intervals = {}
+        for service_key in service_keys:
+            interval = services_config.get(service_key, {}).get('refreshInterval', DEFAULT_REFRESH_INTERVAL)
+            intervals[service_key] = max(interval / 1000.0, MIN_SLEEP)
+        
+        self.next_due = {key: self.next_due.get(key, now) for key in intervals}
+        self.intervals = intervals
+        logging.debug(f"Service refresh intervals: {self.intervals}")
+    
+    def due_services(self, now: Optional[float] = None) -> List[str]:
+        """Returns services which have to be fetched now"""
+        if now is None:
+            now = self.clock()
+        return [key for key, due in self.next_due.items() if due <= now]
+    
+    def mark_fetched(self, service_keys: List[str], now: Optional[float] = None):
+        """Schedules next fetch for given services"""
+        if now is None:
+            now = self.clock()
+        for service_key in service_keys:
+            if service_key in self.intervals:
+                self.next_due[service_key] = now + self.intervals[service_key]
+    
+    def mark_due(self, service_keys: List[str], now: Optional[float] = None):
+        """Makes given services due now, for example when their configuration changed"""
+        if now is None:
+            now = self.clock()
+        for service_key in service_keys:
+            if service_key in self.next_due:
+                self.next_due[service_key] = now
+    
+    def seconds_until_next(self, now: Optional[float] = None) -> float:
+        """Returns number of seconds until next service is due"""
+        if not self.next_due:
+            return DEFAULT_REFRESH_INTERVAL / 1000.0
+        if now is None:
+            now = self.clock()
+        return max(min(self.next_due.values()) - now, 0.0)
@@ -0,0 +1,178 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+from metrics import get_metrics
+from sensor_registry import get_sensor_service_keys
+
+DEFAULT_INGEST_HOST = '127.0.0.1'
+DEFAULT_INGEST_PORT = 8081
+DEFAULT_MQTT_PORT = 1883
+DEFAULT_MQTT_TOPIC = 'wifiiot/+/sensors'
+# Readings arriving within debounce of the first one are drawn together
+DEFAULT_DEBOUNCE = 1000
+MAX_READING_SIZE = 4096
+
+class SensorIngest:
+    """Receives readings pushed by sensor devices as 'key:value;' text.
+    Devices POST to /sensors/<service_key> or publish to MQTT topic wifiiot/<service_key>/sensors.
+    Readings are decoded like polled responses and kept until the daemon drains them."""
+
+    def __init__(self, config: Dict[str, Any], event: Optional[threading.Event] = None):
+        self.lock = threading.Lock()
+        # Shared with other sources waking the daemon, like configuration changes
+        self.event = event or threading.Event()
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.server = None
+        self.mqtt_client = None
+        self.update_config(config)
+
+    def update_config(self, config: Dict[str, Any]):
+        self.config = config
+        self.service_keys = set(get_sensor_service_keys(config))
+        self.debounce = config.get('ingest', {}).get('debounce', DEFAULT_DEBOUNCE) / 1000.0
+
+    def ingest(self, service_key: str, text: str) -> bool:
+        """Decodes reading of device and queues it, returns False if it is not usable"""
+        from services.sensor_service import parse_sensor_text
+        from services.value_decoder import get_decoder
+        if service_key not in self.service_keys:
+            logging.warning(f"Reading pushed for unknown sensor service {service_key}")
+            get_metrics().inc('dashboard_pushed_readings_total', service='unknown', result='rejected')
+            return False
+
+        sensor_data = get_decoder(self.config, service_key).decode(parse_sensor_text(text.strip()), flat=True)
+        if all(value is None for value in sensor_data.values()):
+            logging.warning(f"No values decoded from reading pushed by {service_key}")
+            get_metrics().inc('dashboard_pushed_readings_total', service=service_key, result='rejected')
+            return False
+
+        with self.lock:
+            # Values missing from this reading keep those of earlier pending readings
+            pending = self.pending.setdefault(service_key, {})
+            pending.update((key, value) for key, value in sensor_data.items() if value is not None)
+        get_metrics().inc('dashboard_pushed_readings_total', service=service_key, result='accepted')
+        logging.debug(f"Reading pushed by {service_key}: {sensor_data}")
+        self.event.set()
+        return True
+
+    def wait(self, timeout: float) -> bool:
+        """Sleeps up to timeout seconds, returning early with True when a reading arrives.
+        After the first reading waits debounce seconds more, so that readings pushed
+        together are drawn together."""
+        if not self.event.wait(max(timeout, 0.0)):
+            return False
+        time.sleep(min(self.debounce, max(timeout, 0.0)))
+        return True
+
+    def drain(self) -> Dict[str, Dict[str, Any]]:
+        """Returns queued readings by service key and clears the queue"""
+        with self.lock:
+            self.event.clear()
+            readings, self.pending = self.pending, {}
+        return readings
+
+    def start_server(self, port: int = DEFAULT_INGEST_PORT, host: str = DEFAULT_INGEST_HOST) -> bool:
+        """Accepts readings on http://host:port/sensors/<service_key> from a background thread"""
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        ingest = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                parts = self.path.split('?')[0].strip('/').split('/')
+                if len(parts) != 2 or parts[0] != 'sensors':
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > MAX_READING_SIZE:
+                    self.send_error(413)
+                    return
+                text = self.rfile.read(length).decode('utf-8', errors='replace')
+                if not ingest.ingest(parts[1], text):
+                    self.send_error(404 if parts[1] not in ingest.service_keys else 400)
+                    return
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            logging.error(f"Failed to start sensor ingest server on {host}:{port}: {e}")
+            return False
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='ingest', daemon=True).start()
+        logging.info(f"Accepting sensor readings on http://{host}:{self.server.server_address[1]}/sensors/")
+        return True
+
+    def start_mqtt(self, host: str, port: int = DEFAULT_MQTT_PORT, topic: str = DEFAULT_MQTT_TOPIC) -> bool:
+        """Subscribes to readings on MQTT broker, uses optional paho-mqtt package.
+        Service key is the topic level matched by '+'."""
+        try:
+            import paho.mqtt.client as mqtt
+        except ImportError:
+            logging.warning("paho-mqtt is not installed, MQTT sensor ingest is disabled")
+            return False
+
+        levels = topic.split('/')
+        if '+' not in levels:
+            logging.error(f"MQTT topic {topic} has no '+' level for service key")
+            return False
+        key_level = levels.index('+')
+
+        def on_connect(client, userdata, flags, reason_code, properties=None):
+            client.subscribe(topic)
+
+        def on_message(client, userdata, message):
+            message_levels = message.topic.split('/')
+            if len(message_levels) == len(levels) and len(message.payload) <= MAX_READING_SIZE:
+                self.ingest(message_levels[key_level], message.payload.decode('utf-8', errors='replace'))
+
+        if hasattr(mqtt, 'CallbackAPIVersion'):
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        else:
+            client = mqtt.Client()
+        client.on_connect = on_connect
+        client.on_message = on_message
+        try:
+            client.connect(host, port)
+        except OSError as e:
+            logging.error(f"Failed to connect to MQTT broker {host}:{port}: {e}")
+            return False
+        client.loop_start()
+        self.mqtt_client = client
+        logging.info(f"Subscribed to sensor readings on mqtt://{host}:{port}/{topic}")
+        return True
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.mqtt_client is not None:
+            self.mqtt_client.loop_stop()
+            self.mqtt_client.disconnect()
+            self.mqtt_client = None
+
+def start_ingest(config: Dict[str, Any], event: Optional[threading.Event] = None) -> Optional[SensorIngest]:
+    """Starts listeners enabled in ingest section of configuration, None if none is enabled.
+    event is set whenever a reading arrives."""
+    ingest_config = config.get('ingest', {})
+    if not ingest_config.get('enabled', False):
+        return None
+
+    ingest = SensorIngest(config, event)
+    started = False
+    if ingest_config.get('port'):
+        started = ingest.start_server(ingest_config['port'], ingest_config.get('host', DEFAULT_INGEST_HOST))
+    mqtt_config = ingest_config.get('mqtt', {})
+    if mqtt_config.get('enabled', False):
+        started = ingest.start_mqtt(mqtt_config.get('host', DEFAULT_INGEST_HOST),
+                                    mqtt_config.get('port', DEFAULT_MQTT_PORT),
+                                    mqtt_config.get('topic', DEFAULT_MQTT_TOPIC)) or started
+    return ingest if started else None
@@ -0,0 +1,253 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import os
+import json
+import time
+import socket
+import logging
+import ipaddress
+import threading
+from urllib.parse import urlsplit
+from typing import Dict, Any, Optional, List, Tuple
+
+from config_loader import get_service_category
+
+DEFAULT_DEVICES_FILE = 'sensor_devices.json'
+DEFAULT_DISCOVERY_TTL = 86400000
+DEFAULT_SENSOR_PORT = 80
+DEFAULT_SENSOR_PATH = '/sensors'
+DEFAULT_SWEEP_TIMEOUT = 300
+DEFAULT_SWEEP_WORKERS = 64
+DEFAULT_MDNS_SERVICE = '_wifiiot._tcp.local.'
+DEFAULT_MDNS_TIMEOUT = 3000
+# Service configuration of discovered devices, values are decoded as floats
+DEFAULT_DEVICE_SERVICE = {
+    'responseType': 'text',
+    'refreshInterval': 600000,
+    'timeout': 5000,
+    'connectTimeout': 2000
+}
+
+def get_device_id(host: str, port: int = DEFAULT_SENSOR_PORT) -> str:
+    """Returns service key of discovered device, like 'wifiiot_192_168_0_57'.
+    It starts with 'wifiiot' so that the device is fetched like configured sensors."""
+    device_id = f"wifiiot_{host.replace('.', '_').replace('-', '_')}"
+    return device_id if port == DEFAULT_SENSOR_PORT else f"{device_id}_{port}"
+
+def get_sensor_service_keys(config: Dict[str, Any]) -> List[str]:
+    """Returns keys of sensor services in configuration order"""
+    return [key for key in config.get('services', {}).keys() if get_service_category(key) == 'sensors']
+
+def namespace_sensor_keys(config: Dict[str, Any]) -> int:
+    """Renames sensor values declared by more than one device to 'service_key.key'.
+    The first device keeps the plain key, so that layouts written for it keep working,
+    instead of devices overwriting values of each other. Returns number of renamed values."""
+    services = config.get('services', {})
+    owners: Dict[str, str] = {}
+    renamed = 0
+    for service_key in get_sensor_service_keys(config):
+        data_config = services[service_key].get('data', {})
+        if not any(key in owners for key in data_config):
+            owners.update((key, service_key) for key in data_config)
+            continue
+        namespaced = {}
+        for key, value_config in data_config.items():
+            if key in owners:
+                new_key = f"{service_key}.{key}"
+                logging.warning(f"Sensor value {key} of {service_key} is also set by {owners[key]}, "
+                                f"using {new_key}")
+                value_config = dict(value_config, path=value_config.get('path', key))
+                key = new_key
+                renamed += 1
+            owners[key] = service_key
+            namespaced[key] = value_config
+        services[service_key] = dict(services[service_key], data=namespaced)
+    return renamed
+
+def probe_device(config: Dict[str, Any], url: str, timeout: float) -> Optional[List[str]]:
+    """Returns value keys of sensor answering at url, None if nothing answers like a sensor"""
+    parts = urlsplit(url)
+    try:
+        socket.create_connection((parts.hostname, parts.port or DEFAULT_SENSOR_PORT), timeout).close()
+    except OSError:
+        return None
+
+    import requests
+    from http_client import get_client
+    from services.sensor_service import parse_sensor_text
+    try:
+        response = get_client(config).get(url, timeout=(timeout, timeout * 4))
+        response.raise_for_status()
+        keys = list(parse_sensor_text(response.text.strip()).keys())
+    except requests.RequestException as e:
+        logging.debug(f"No sensor at {url}: {e}")
+        return None
+    return keys or None
+
+def sweep_subnet(config: Dict[str, Any], subnet: str, port: int = DEFAULT_SENSOR_PORT,
+                 path: str = DEFAULT_SENSOR_PATH, timeout: float = DEFAULT_SWEEP_TIMEOUT / 1000.0,
+                 workers: int = DEFAULT_SWEEP_WORKERS) -> Dict[str, List[str]]:
+    """Probes every host of subnet concurrently, returns value keys of sensors by URL"""
+    from concurrent.futures import ThreadPoolExecutor
+    try:
+        hosts = [str(host) for host in ipaddress.ip_network(subnet, strict=False).hosts()]
+    except ValueError as e:
+        logging.error(f"Invalid sensor subnet {subnet}: {e}")
+        return {}
+
+    urls = [f"http://{host}{'' if port == DEFAULT_SENSOR_PORT else f':{port}'}{path}" for host in hosts]
+    logging.info(f"Sweeping {len(urls)} hosts of {subnet} for sensors")
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls))), thread_name_prefix='sweep') as executor:
+        found = zip(urls, executor.map(lambda url: probe_device(config, url, timeout), urls))
+        return {url: keys for url, keys in found if keys}
+
+def browse_mdns(service_type: str = DEFAULT_MDNS_SERVICE,
+                timeout: float = DEFAULT_MDNS_TIMEOUT / 1000.0) -> List[Tuple[str, int]]:
+    """Returns (address, port) of devices announcing service_type.
+    Uses optional zeroconf package, without it nothing is found."""
+    try:
+        from zeroconf import Zeroconf, ServiceBrowser
+    except ImportError:
+        logging.warning("zeroconf is not installed, mDNS discovery is skipped")
+        return []
+
+    names = []
+    zeroconf = Zeroconf()
+    try:
+        class Listener:
+            def add_service(self, zc, type_, name):
+                names.append(name)
+
+            def update_service(self, zc, type_, name):
+                pass
+
+            def remove_service(self, zc, type_, name):
+                pass
+
+        ServiceBrowser(zeroconf, service_type, Listener())
+        time.sleep(timeout)
+        devices = []
+        for name in list(names):
+            info = zeroconf.get_service_info(service_type, name, int(timeout * 1000))
+            if info and info.parsed_addresses():
+                devices.append((info.parsed_addresses()[0], info.port))
+        return devices
+    finally:
+        zeroconf.close()
+
+class SensorRegistry:
+    """Sensor devices found on the LAN by subnet sweep or mDNS.
+    Found devices are kept in cache_file and searched for again only after ttl,
+    so that cron runs do not sweep the network every time."""
+
+    def __init__(self, discovery_config: Dict[str, Any]):
+        self.subnets: List[str] = discovery_config.get('subnets', [])
+        self.port = discovery_config.get('port', DEFAULT_SENSOR_PORT)
+        self.path = discovery_config.get('path', DEFAULT_SENSOR_PATH)
+        self.mdns = discovery_config.get('mdns', False)
+        self.mdns_service = discovery_config.get('mdnsService', DEFAULT_MDNS_SERVICE)
+        self.cache_file = discovery_config.get('cacheFile', DEFAULT_DEVICES_FILE)
+        self.ttl = discovery_config.get('ttl', DEFAULT_DISCOVERY_TTL) / 1000.0
+        self.sweep_timeout = discovery_config.get('sweepTimeout', DEFAULT_SWEEP_TIMEOUT) / 1000.0
+        self.sweep_workers = discovery_config.get('sweepWorkers', DEFAULT_SWEEP_WORKERS)
+        self.service = dict(DEFAULT_DEVICE_SERVICE, **discovery_config.get('service', {}))
+        self.value_type = self.service.pop('type', 'float')
+        self.digits = self.service.pop('round', 2)
+        self.lock = threading.Lock()
+        # Device id: URL and value keys it answered with
+        self.devices: Dict[str, Dict[str, Any]] = {}
+        self.discovered_at = 0.0
+        self._load_state()
+
+    def _load_state(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.devices = state.get('devices', {})
+            self.discovered_at = state.get('discovered_at', 0.0)
+        except (json.JSONDecodeError, IOError) as e:
+            logging.warning(f"Failed to load sensor devices from {self.cache_file}: {e}")
+
+    def _save_state(self):
+        if not self.cache_file:
+            return
+        try:
+            temp_file = f"{self.cache_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'devices': self.devices, 'discovered_at': self.discovered_at}, f)
+            os.replace(temp_file, self.cache_file)
+        except IOError as e:
+            logging.error(f"Failed to save sensor devices to {self.cache_file}: {e}")
+
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.time()) - self.discovered_at >= self.ttl
+
+    def discover(self, config: Dict[str, Any], force: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Searches for devices if cached ones are older than ttl, returns devices by id"""
+        with self.lock:
+            if not force and not self.is_stale():
+                return self.devices
+
+            found: Dict[str, List[str]] = {}
+            for subnet in self.subnets:
+                found.update(sweep_subnet(config, subnet, self.port, self.path,
+                                          self.sweep_timeout, self.sweep_workers))
+            if self.mdns:
+                for host, port in browse_mdns(self.mdns_service):
+                    url = f"http://{host}:{port}{self.path}"
+                    keys = probe_device(config, url, self.sweep_timeout)
+                    if keys:
+                        found[url] = keys
+
+            devices = {}
+            for url, keys in found.items():
+                parts = urlsplit(url)
+                devices[get_device_id(parts.hostname, parts.port or DEFAULT_SENSOR_PORT)] = {'url': url, 'keys': keys}
+            logging.info(f"Found {len(devices)} sensor devices")
+            self.devices = devices
+            self.discovered_at = time.time()
+            self._save_state()
+            return self.devices
+
+    def get_services(self, configured_urls: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Returns service configuration of devices not configured already.
+        Values of every device are namespaced as 'device_id.key'."""
+        configured = set(configured_urls or [])
+        services = {}
+        for device_id, device in sorted(self.devices.items()):
+            if device['url'] in configured:
+                continue
+            data = {}
+            for key in device['keys']:
+                value_config = {'path': key, 'type': self.value_type}
+                if self.value_type == 'float' and self.digits is not None:
+                    value_config['round'] = self.digits
+                data[f"{device_id}.{key}"] = value_config
+            services[device_id] = dict(self.service, url=device['url'], data=data)
+        return services
+
+_registry: Optional[SensorRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_registry(config: Dict[str, Any]) -> SensorRegistry:
+    """Returns registry shared by all runs of this process"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = SensorRegistry(config.get('sensorDiscovery', {}))
+        return _registry
+
+def apply_sensor_registry(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Adds discovered devices to services of configuration and namespaces values
+    which more than one device declares. Discovery runs only when enabled."""
+    if config.get('sensorDiscovery', {}).get('enabled', False):
+        services = config.setdefault('services', {})
+        registry = get_registry(config)
+        registry.discover(config)
+        configured_urls = [services[key].get('url') for key in get_sensor_service_keys(config)]
+        for device_id, service_config in registry.get_services(configured_urls).items():
+            services.setdefault(device_id, service_config)
+    namespace_sensor_keys(config)
+    return config
@@ -2,66 +2,166 @@
 # -*- coding:utf-8 -*-
 import requests
 import logging
-from typing import Dict, Any, Optional
-
-def format_value(value: Any, value_config: Dict[str, Any]) -> Any:
-    """Formats value according to configuration"""
-    value_type = value_config.get('type', 'string')
-    if value_type == 'int':
-        return int(float(value))
-    elif value_type == 'float':
-        result = float(value)
-        if 'round' in value_config:
-            return round(result, value_config['round'])
-        return result
-    return str(value)
+import codecs
+import json
+import threading
+from typing import Dict, Any, Optional, List, Iterable, Iterator
+from config_loader import get_service_timeout
+from http_client import HttpClient, get_client
+from services.value_decoder import compile_field, get_decoder
+
+FETCH_MODE_SYMBOLS = 'symbols'
+FETCH_MODE_ALL_TICKERS = 'allTickers'
+DEFAULT_SYMBOL_URL = 'https://api.kucoin.com/api/v1/market/stats'
+STREAM_CHUNK_SIZE = 16384
+CHANGE_RATE_FIELD = compile_field('change_rate', {'path': 'changeRate', 'type': 'float'})
+CHANGE_PRICE_FIELD = compile_field('change_price', {'path': 'changePrice', 'type': 'float'})
+
+def iter_stream_tickers(chunks: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """Incrementally parses allTickers response, yielding tickers as soon as they are complete.
+    Raises ValueError with API message if response has no ticker list."""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    head = ''
+    in_list = False
+
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+
+        if not in_list:
+            marker = buffer.find('"ticker"')
+            start = buffer.find('[', marker) if marker >= 0 else -1
+            if start < 0:
+                continue
+            head = buffer[:marker]
+            if '"code"' in head and '"200000"' not in head:
+                break
+            buffer = buffer[start + 1:]
+            in_list = True
+
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                ticker, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break
+            yield ticker
+        buffer = buffer[pos:]
+
+    if in_list:
+        raise ValueError("KuCoin ticker list is truncated")
+    try:
+        message = json.loads(head or buffer).get('msg', 'Unknown error')
+    except ValueError:
+        message = 'Unknown error'
+    raise ValueError(f"KuCoin API error: {message}")
+
+def fetch_tickers_stream(client: HttpClient, url: str, pairs: List[str],
+                         timeout: Any) -> Dict[str, Dict[str, Any]]:
+    """Fetches allTickers and stops reading as soon as every pair has been seen"""
+    wanted = set(pairs)
+    tickers = {}
+    with client.get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        for ticker in iter_stream_tickers(response.iter_content(chunk_size=STREAM_CHUNK_SIZE)):
+            symbol = ticker.get('symbol')
+            if symbol in wanted:
+                tickers[symbol] = ticker
+                if len(tickers) == len(wanted):
+                    break
+
+    missing = wanted - set(tickers)
+    if missing:
+        logging.warning(f"KuCoin pairs not found in allTickers: {sorted(missing)}")
+    return tickers
+
+def fetch_symbol_ticker(client: HttpClient, url: str, symbol: str,
+                        timeout: Any) -> Optional[Dict[str, Any]]:
+    """Fetches 24h stats of one symbol, they have the same fields as allTickers entries"""
+    try:
+        response = client.get(url, params={'symbol': symbol}, timeout=timeout)
+        response.raise_for_status()
+        symbol_raw = response.json()
+
+        if symbol_raw.get('code') != '200000' or not symbol_raw.get('data'):
+            logging.error(f"KuCoin API error for {symbol}: {symbol_raw.get('msg', 'Unknown error')}")
+            return None
+        return symbol_raw['data']
+    except (requests.RequestException, ValueError) as e:
+        logging.error(f"Error fetching KuCoin ticker {symbol}: {e}")
+        return None
+
+def fetch_tickers_by_symbol(client: HttpClient, url: str, pairs: List[str],
+                            timeout: Any) -> Dict[str, Dict[str, Any]]:
+    """Fetches tickers of configured pairs in parallel. Daemon threads are used
+    like in fetch_services, so a hung request does not delay exit past the deadline."""
+    tickers = {}
+
+    def fetch_pair(pair: str):
+        tickers[pair] = fetch_symbol_ticker(client, url, pair, timeout)
+
+    threads = [threading.Thread(target=fetch_pair, args=(pair,), name=f"kucoin-{pair}", daemon=True)
+               for pair in pairs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {pair: tickers[pair] for pair in pairs if tickers.get(pair)}
 
 def fetch_kucoin_data(config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    """Fetches cryptocurrency data from KuCoin API"""
+    """Fetches cryptocurrency data from KuCoin API.
+    In 'symbols' mode only configured pairs are requested, pairs which failed
+    and 'allTickers' mode read the bulk endpoint until all pairs are found."""
     service_config = config.get('services', {}).get('kucoin', {})
     url = service_config.get('url', '')
     pairs = service_config.get('pairs', [])
-    data_config = service_config.get('data', {})
-    
+    fetch_mode = service_config.get('fetchMode', FETCH_MODE_ALL_TICKERS)
+
     if not url:
         logging.error("KuCoin URL not set in configuration")
         return None
-    
+
+    client = get_client(config)
+    timeout = get_service_timeout(config, 'kucoin')
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        kucoin_raw = response.json()
-        
-        if kucoin_raw.get('code') != '200000':
-            logging.error(f"KuCoin API error: {kucoin_raw.get('msg', 'Unknown error')}")
-            return None
-        
-        ticker_data = kucoin_raw.get('data', {}).get('ticker', [])
-        ticker_dict = {ticker.get('symbol'): ticker for ticker in ticker_data}
-        
+        ticker_dict = {}
+        if fetch_mode == FETCH_MODE_SYMBOLS:
+            ticker_dict = fetch_tickers_by_symbol(client, service_config.get('symbolUrl', DEFAULT_SYMBOL_URL),
+                                                  pairs, timeout)
+
+        missing_pairs = [pair for pair in pairs if pair not in ticker_dict]
+        if missing_pairs:
+            ticker_dict.update(fetch_tickers_stream(client, url, missing_pairs, timeout))
+
+        decoder = get_decoder(config, 'kucoin')
         kucoin_data = {}
         for pair in pairs:
-            if pair in ticker_dict:
-                ticker = ticker_dict[pair]
-                pair_config = data_config.get(pair, {})
-                
-                price_key = pair_config.get('path', 'last')
-                if price_key in ticker:
-                    price_value = ticker[price_key]
-                    formatted_price = format_value(price_value, pair_config)
-                    
-                    kucoin_data[pair] = {
-                        'last': formatted_price,
-                        'change_rate': float(ticker.get('changeRate', 0)),
-                        'change_price': float(ticker.get('changePrice', 0))
-                    }
-        
+            ticker = ticker_dict.get(pair)
+            price_field = decoder.get_field(pair) or compile_field(pair, {'path': 'last'})
+            price = decoder.decode_field(price_field, ticker, flat=True) if ticker else None
+            if price is None:
+                # Pair is left for the cache
+                kucoin_data[pair] = None
+                continue
+            kucoin_data[pair] = {
+                'last': price,
+                'change_rate': decoder.decode_field(CHANGE_RATE_FIELD, ticker, flat=True) or 0.0,
+                'change_price': decoder.decode_field(CHANGE_PRICE_FIELD, ticker, flat=True) or 0.0
+            }
+
         logging.info(f"KuCoin data received: {list(kucoin_data.keys())}")
         return kucoin_data
     except requests.RequestException as e:
         logging.error(f"Error fetching KuCoin data: {e}")
         return None
+    except ValueError as e:
+        logging.error(f"Error reading KuCoin tickers: {e}")
+        return None
     except Exception as e:
         logging.error(f"Unexpected error processing KuCoin data: {e}")
         return None
-
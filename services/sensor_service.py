@@ -3,6 +3,10 @@
 import requests
 import logging
 from typing import Dict, Any, Optional, List
+from config_loader import get_service_timeout
+from http_client import get_client
+from circuit_breaker import get_breakers, get_endpoint
+from services.value_decoder import get_decoder
 
 def parse_sensor_text(text: str) -> Dict[str, str]:
     """Parses sensor text data in format 'key1:value1;key2:value2'"""
@@ -18,89 +22,53 @@ def parse_sensor_text(text: str) -> Dict[str, str]:
     
     return sensor_dict
 
-def format_value(value: str, value_config: Dict[str, Any]) -> Any:
-    """Formats value according to configuration"""
-    if not value:
-        return None
-    
-    value_type = value_config.get('type', 'string')
-    try:
-        if value_type == 'int':
-            return int(float(value))
-        elif value_type == 'float':
-            result = float(value)
-            if 'round' in value_config:
-                return round(result, value_config['round'])
-            return result
-    except (ValueError, TypeError):
-        pass
-    
-    return str(value)
-
 def fetch_sensor_data(config: Dict[str, Any], service_key: str) -> Optional[Dict[str, str]]:
     """Fetches sensor data from specified service"""
     service_config = config.get('services', {}).get(service_key, {})
     url = service_config.get('url', '')
-    data_config = service_config.get('data', {})
     response_type = service_config.get('responseType', 'text')
     logging.info(f"Fetching sensor data from {url}")
     if not url:
         logging.error(f"URL for {service_key} not set in configuration")
         return None
     
+    breakers = get_breakers(config)
+    endpoint = get_endpoint(url)
+    allowed, probe = breakers.allow(endpoint)
+    if not allowed:
+        logging.info(f"Breaker of {endpoint} is open, using cached data of {service_key}")
+        return None
+    timeout = breakers.get_timeout(get_service_timeout(config, service_key), probe)
+    
     try:
-        response = requests.get(url, timeout=10)
+        response = get_client(config).get(url, timeout=timeout)
         response.raise_for_status()
         logging.info(f"Getted")
+        decoder = get_decoder(config, service_key)
         sensor_data = {}
         if response_type == 'text':
             raw_text = response.text.strip()
             logging.info(f"Raw text: {raw_text}")
             parsed = parse_sensor_text(raw_text)
             logging.info(f"Parsed: {parsed}")
-            for key, value_config in data_config.items():
-                path = value_config.get('path', key)
-                logging.info(f"Path: {path}")
-                if path in parsed:
-                    raw_value = parsed[path]
-                    logging.info(f"Raw value: {raw_value}")
-                    sensor_data[key] = format_value(raw_value, value_config)
+            sensor_data = decoder.decode(parsed, flat=True)
         elif response_type == 'json':
-            raw_json = response.json()
-            for key, value_config in data_config.items():
-                path = value_config.get('path', key)
-                try:
-                    if '.' in path:
-                        parts = path.split('.')
-                        current = raw_json
-                        for part in parts:
-                            current = current[part]
-                        raw_value = current
-                    else:
-                        raw_value = raw_json[path]
-                    sensor_data[key] = format_value(str(raw_value), value_config)
-                except (KeyError, TypeError):
-                    logging.warning(f"Failed to extract {key} from sensor data")
-        sensor_data[key] = None
+            sensor_data = decoder.decode(response.json())
+        
+        # Device answered, so its breaker closes even if no value could be decoded
+        breakers.record_success(endpoint)
+        if all(value is None for value in sensor_data.values()):
+            logging.error(f"No values decoded from sensor data {service_key}")
+            return None
         
         logging.info(f"Sensor data {service_key} received: {list(sensor_data.keys())}")
         return sensor_data
     except requests.RequestException as e:
         logging.error(f"Error fetching sensor data {service_key}: {e}")
+        breakers.record_failure(endpoint)
         return None
     except Exception as e:
         logging.error(f"Unexpected error processing sensor data {service_key}: {e}")
+        # Also ends a probe, which would otherwise keep the breaker from probing again
+        breakers.record_failure(endpoint)
         return None
-
-def fetch_all_sensor_data(config: Dict[str, Any]) -> Dict[str, Any]:
-    """Fetches data from all sensor sources"""
-    all_sensor_data = {}
-    logging.info(f"Fetching all sensor data")
-    service_keys = [key for key in config.get('services', {}).keys() if key.startswith('wifiiot')]
-    logging.info(f"Service keys: {service_keys}")
-    for service_key in service_keys:
-        sensor_data = fetch_sensor_data(config, service_key)
-        if sensor_data:
-            all_sensor_data.update(sensor_data)
-    
-    return all_sensor_data
@@ -0,0 +1,130 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import logging
+from operator import itemgetter
+from typing import Dict, Any, Optional, Callable, Tuple
+from json_path import JsonPath, compile_path
+
+def _to_int(value: Any) -> int:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return int(float(value))
+
+def compile_converter(value_type: str, digits: Optional[int] = None) -> Callable[[Any], Any]:
+    """Returns converter of raw value to configured type, with rounding resolved once.
+    Converters raise ValueError or TypeError for values which can't be converted."""
+    if value_type == 'float':
+        if digits is None:
+            return float
+
+        def convert(value: Any) -> float:
+            return round(float(value), digits)
+        return convert
+    if value_type == 'int':
+        return _to_int
+    # Unknown types are decoded as strings
+    return str
+
+def _raise_invalid_path(raw_path: str) -> Callable[[Any], Any]:
+    def get(raw: Any) -> Any:
+        raise ValueError(f"Invalid path: {raw_path!r}")
+    return get
+
+def compile_getter(raw_path: str, path: Optional[JsonPath]) -> Callable[[Any], Any]:
+    """Returns function extracting value at path from response"""
+    if path is None:
+        return _raise_invalid_path(raw_path)
+    if len(path.steps) == 1:
+        return itemgetter(path.steps[0])
+    if len(path.steps) == 2:
+        first, second = path.steps
+        return lambda raw: raw[first][second]
+    return path.resolve
+
+class ValueField:
+    """Compiled configuration of one service value"""
+    __slots__ = ('key', 'raw_path', 'get', 'get_flat', 'convert')
+
+    def __init__(self, key: str, raw_path: str, get: Callable[[Any], Any],
+                 convert: Callable[[Any], Any]):
+        self.key = key
+        self.raw_path = raw_path
+        self.get = get
+        # Reads values of flat responses, whose keys are whole paths, like parsed sensor text
+        self.get_flat = itemgetter(raw_path)
+        self.convert = convert
+
+    def read(self, raw: Any, flat: bool = False) -> Any:
+        """Extracts and decodes value from response, raising if it can't"""
+        value = self.get_flat(raw) if flat else self.get(raw)
+        if value is None or value == '':
+            return None
+        return self.convert(value)
+
+def compile_field(key: str, value_config: Dict[str, Any]) -> ValueField:
+    """Compiles value configuration with 'path', 'type' and 'round'"""
+    raw_path = value_config.get('path', key)
+    try:
+        path = compile_path(raw_path)
+    except ValueError:
+        path = None
+    value_type = value_config.get('type', 'string')
+    digits = value_config.get('round') if value_type == 'float' else None
+    return ValueField(key, raw_path, compile_getter(raw_path, path), compile_converter(value_type, digits))
+
+# Compiled value as (key, getter, converter)
+DecodeOp = Tuple[str, Callable[[Any], Any], Callable[[Any], Any]]
+
+class ServiceDecoder:
+    """Decodes service response into configured values.
+    Values which are missing or can't be converted are None and logged as warnings,
+    so that cached values are used for them."""
+    __slots__ = ('service_key', 'source', 'fields', 'by_key', 'ops', 'flat_ops')
+
+    def __init__(self, service_key: str, source: Any, fields: Tuple[ValueField, ...]):
+        self.service_key = service_key
+        self.source = source
+        self.fields = fields
+        self.by_key = {field.key: field for field in fields}
+        self.ops: Tuple[DecodeOp, ...] = tuple((field.key, field.get, field.convert) for field in fields)
+        self.flat_ops: Tuple[DecodeOp, ...] = tuple((field.key, field.get_flat, field.convert) for field in fields)
+
+    def get_field(self, key: str) -> Optional[ValueField]:
+        """Returns compiled field of configured value"""
+        return self.by_key.get(key)
+
+    def decode_field(self, field: ValueField, raw: Any, flat: bool = False) -> Any:
+        """Decodes one value, returning None on failure"""
+        try:
+            return field.read(raw, flat)
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError) as e:
+            logging.warning(f"Failed to decode {field.key} of {self.service_key}: {e!r}")
+            return None
+
+    def decode(self, raw: Any, flat: bool = False) -> Dict[str, Any]:
+        """Decodes all configured values from response"""
+        result = {}
+        try:
+            for key, get, convert in (self.flat_ops if flat else self.ops):
+                value = get(raw)
+                result[key] = None if value is None or value == '' else convert(value)
+            return result
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError):
+            # Values are decoded one by one to keep the others and log the failed ones
+            return {field.key: self.decode_field(field, raw, flat) for field in self.fields}
+
+def compile_decoder(service_key: str, data_config: Dict[str, Dict[str, Any]]) -> ServiceDecoder:
+    """Compiles data configuration of service"""
+    fields = tuple(compile_field(key, value_config) for key, value_config in data_config.items())
+    return ServiceDecoder(service_key, data_config, fields)
+
+_decoders: Dict[str, ServiceDecoder] = {}
+
+def get_decoder(config: Dict[str, Any], service_key: str) -> ServiceDecoder:
+    """Returns decoder of service, compiled again only when its data configuration is replaced"""
+    data_config = config.get('services', {}).get(service_key, {}).get('data', {})
+    decoder = _decoders.get(service_key)
+    if decoder is None or decoder.source is not data_config:
+        decoder = compile_decoder(service_key, data_config)
+        _decoders[service_key] = decoder
+    return decoder
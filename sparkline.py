@@ -0,0 +1,190 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import time
+from PIL import Image
+from typing import Dict, Any, Optional, List, Tuple
+
+from text_cache import Sprite
+from startup import lazy_import
+
+# NumPy is loaded when the first history is downsampled, not at startup
+np = lazy_import('numpy')
+
+DEFAULT_WINDOW = 24 * 3600 * 1000
+DEFAULT_SPARKLINE_WIDTH = 100
+DEFAULT_SPARKLINE_HEIGHT = 20
+TREND_UP = '↑'
+TREND_DOWN = '↓'
+TREND_FLAT = '→'
+
+class Buckets:
+    """History downsampled to one bucket per pixel column.
+    Columns without samples have count 0."""
+    __slots__ = ('mins', 'maxs', 'means', 'counts')
+
+    def __init__(self, mins: Any, maxs: Any, means: Any, counts: Any):
+        self.mins = mins
+        self.maxs = maxs
+        self.means = means
+        self.counts = counts
+
+    def get_filled(self) -> List[int]:
+        """Returns indexes of columns which have samples"""
+        if np is not None and isinstance(self.counts, np.ndarray):
+            return np.flatnonzero(self.counts).tolist()
+        return [index for index, count in enumerate(self.counts) if count]
+
+    def is_empty(self) -> bool:
+        return not self.get_filled()
+
+    def get_range(self) -> Tuple[float, float]:
+        """Returns lowest and highest value of all buckets"""
+        filled = self.get_filled()
+        return float(min(self.mins[index] for index in filled)), float(max(self.maxs[index] for index in filled))
+
+    def get_first_last(self) -> Tuple[float, float]:
+        """Returns means of first and last filled buckets"""
+        filled = self.get_filled()
+        return float(self.means[filled[0]]), float(self.means[filled[-1]])
+
+def _get_columns(timestamps: List[int], start: float, end: float, width: int) -> List[int]:
+    span = max(end - start, 1)
+    return [min(max(int((ts - start) * width / span), 0), width - 1) for ts in timestamps]
+
+def downsample(rows: List[Tuple[int, float, float, float]], start: float, end: float, width: int) -> Buckets:
+    """Reduces time ordered (ts, min, max, mean) rows to width min/max/mean buckets"""
+    if np is not None:
+        if not rows:
+            zeros = np.zeros(width)
+            return Buckets(zeros, zeros, zeros, np.zeros(width, dtype=np.int64))
+        table = np.asarray(rows, dtype=np.float64)
+        span = max(end - start, 1)
+        columns = np.clip(((table[:, 0] - start) * width / span).astype(np.int64), 0, width - 1)
+        # Rows are ordered by time, so every column is one contiguous run
+        starts = np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]])
+        counts = np.diff(np.r_[starts, len(columns)])
+        mins = np.zeros(width)
+        maxs = np.zeros(width)
+        means = np.zeros(width)
+        filled = np.zeros(width, dtype=np.int64)
+        target = columns[starts]
+        mins[target] = np.minimum.reduceat(table[:, 1], starts)
+        maxs[target] = np.maximum.reduceat(table[:, 2], starts)
+        means[target] = np.add.reduceat(table[:, 3], starts) / counts
+        filled[target] = counts
+        return Buckets(mins, maxs, means, filled)
+
+    mins = [0.0] * width
+    maxs = [0.0] * width
+    sums = [0.0] * width
+    counts = [0] * width
+    for column, (_, low, high, mean) in zip(_get_columns([row[0] for row in rows], start, end, width), rows):
+        if counts[column]:
+            mins[column] = min(mins[column], low)
+            maxs[column] = max(maxs[column], high)
+        else:
+            mins[column], maxs[column] = low, high
+        sums[column] += mean
+        counts[column] += 1
+    means = [total / count if count else 0.0 for total, count in zip(sums, counts)]
+    return Buckets(mins, maxs, means, counts)
+
+def render_sparkline(buckets: Buckets, width: int, height: int) -> Optional[Image.Image]:
+    """Draws buckets as min/max band joined column to column into L mask"""
+    if buckets.is_empty():
+        return None
+    low, high = buckets.get_range()
+    scale = (height - 1) / (high - low) if high > low else 0.0
+
+    def to_row(value: float) -> int:
+        return int(round((high - value) * scale)) if scale else (height - 1) // 2
+
+    if np is not None:
+        filled = buckets.counts > 0
+        columns = np.flatnonzero(filled)
+        tops = np.rint((high - buckets.maxs[columns]) * scale).astype(np.int64)
+        bottoms = np.rint((high - buckets.mins[columns]) * scale).astype(np.int64)
+        middles = np.rint((high - buckets.means[columns]) * scale).astype(np.int64)
+        if not scale:
+            tops[:] = bottoms[:] = middles[:] = (height - 1) // 2
+        # Extend each column to the previous one so that the line has no gaps
+        tops[1:] = np.minimum(tops[1:], middles[:-1])
+        bottoms[1:] = np.maximum(bottoms[1:], middles[:-1])
+        rows = np.arange(height)[:, None]
+        pixels = np.zeros((height, width), dtype=np.uint8)
+        pixels[:, columns] = ((rows >= tops) & (rows <= bottoms)) * 255
+        return Image.frombuffer('L', (width, height), pixels.tobytes(), 'raw', 'L', 0, 1)
+
+    mask = Image.new('L', (width, height), 0)
+    pixels = mask.load()
+    previous = None
+    for column in range(width):
+        if not buckets.counts[column]:
+            continue
+        top, bottom = to_row(buckets.maxs[column]), to_row(buckets.mins[column])
+        if previous is not None:
+            top, bottom = min(top, previous), max(bottom, previous)
+        for row in range(top, bottom + 1):
+            pixels[column, row] = 255
+        previous = to_row(buckets.means[column])
+    return mask
+
+def get_trend(buckets: Buckets, threshold: float = 0.0) -> Optional[str]:
+    """Returns arrow showing if value went up or down over the window by more than threshold"""
+    if buckets.is_empty():
+        return None
+    first, last = buckets.get_first_last()
+    if last - first > threshold:
+        return TREND_UP
+    if first - last > threshold:
+        return TREND_DOWN
+    return TREND_FLAT
+
+class HistoryView:
+    """Downsampled history of series for widgets, cached until new samples are recorded"""
+
+    def __init__(self, history: Optional[Any] = None):
+        self.history = history
+        self.buckets: Dict[Tuple[str, int, int], Buckets] = {}
+        self.masks: Dict[Tuple[str, int, int, int], Optional[Sprite]] = {}
+        self.version = None
+
+    def set_history(self, history: Optional[Any]):
+        self.history = history
+        self.clear()
+
+    def clear(self):
+        self.buckets.clear()
+        self.masks.clear()
+
+    def _check_version(self):
+        if self.history.version != self.version:
+            self.clear()
+            self.version = self.history.version
+
+    def get_buckets(self, series: str, window: int, width: int,
+                    now: Optional[float] = None) -> Optional[Buckets]:
+        """Returns series of last window ms downsampled to width buckets"""
+        if self.history is None:
+            return None
+        self._check_version()
+        key = (series, window, width)
+        buckets = self.buckets.get(key)
+        if buckets is None:
+            if now is None:
+                now = time.time()
+            start = now - window / 1000.0
+            buckets = downsample(self.history.query(series, start, now), start, now, width)
+            self.buckets[key] = buckets
+        return buckets
+
+    def get_sparkline(self, series: str, window: int, width: int, height: int) -> Optional[Sprite]:
+        """Returns sprite of sparkline, None if series has no samples in window"""
+        buckets = self.get_buckets(series, window, width)
+        if buckets is None:
+            return None
+        key = (series, window, width, height)
+        if key not in self.masks:
+            mask = render_sparkline(buckets, width, height)
+            self.masks[key] = Sprite(mask, 0, 0) if mask is not None else None
+        return self.masks[key]
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import os
+import re
+import sys
+import importlib.util
+from typing import Dict, Any, List, Optional
+
+DEFAULT_STARTUP_MODULE = 'epaper_dashboard_v1'
+DEFAULT_STARTUP_BUDGET = 100
+# Modules loaded only by the stage which needs them, never at startup
+LAZY_MODULES = ('requests', 'urllib3', 'numpy', 'waveshare_epd')
+
+_IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+def lazy_import(name: str) -> Optional[Any]:
+    """Returns module which is executed on first attribute access, None if it is not installed.
+    Optional dependencies imported this way cost nothing until they are used."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+def is_loaded(name: str) -> bool:
+    """Checks if module was executed, lazy modules which were never used do not count"""
+    module = sys.modules.get(name)
+    return module is not None and type(module).__name__ != '_LazyModule'
+
+class ImportTime:
+    """One line of -X importtime output, times in ms"""
+    __slots__ = ('module', 'self_ms', 'cumulative_ms', 'depth')
+
+    def __init__(self, module: str, self_ms: float, cumulative_ms: float, depth: int):
+        self.module = module
+        self.self_ms = self_ms
+        self.cumulative_ms = cumulative_ms
+        self.depth = depth
+
+def parse_import_times(text: str) -> List[ImportTime]:
+    """Parses stderr of python -X importtime"""
+    entries = []
+    for line in text.splitlines():
+        match = _IMPORT_TIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append(ImportTime(module, int(self_us) / 1000.0, int(cumulative_us) / 1000.0,
+                                      len(indent) // 2))
+    return entries
+
+def measure_import_times(module: str = DEFAULT_STARTUP_MODULE) -> List[ImportTime]:
+    """Imports module in a fresh interpreter with -X importtime and returns its import times.
+    Interpreter startup imports (site, encodings) are not included."""
+    import subprocess
+    repo_dir = os.path.dirname(os.path.realpath(__file__))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=repo_dir, capture_output=True, text=True, check=True)
+    entries = parse_import_times(result.stderr)
+    for index, entry in enumerate(entries):
+        # Lines are written when a module finishes, so the module's own line follows its imports
+        if entry.depth == 0 and entry.module == module:
+            first = index
+            while first > 0 and entries[first - 1].depth > 0:
+                first -= 1
+            return entries[first:index + 1]
+    return entries
+
+def get_startup_stats(entries: List[ImportTime]) -> Dict[str, Any]:
+    """Returns total import time and loaded modules which should have been lazy"""
+    total = sum(entry.cumulative_ms for entry in entries if entry.depth == 0)
+    loaded = {entry.module.split('.')[0] for entry in entries}
+    return {
+        'total_ms': total,
+        'modules': len(entries),
+        'eager': [name for name in LAZY_MODULES if name in loaded]
+    }
+
+def format_startup_report(entries: List[ImportTime], budget: float = DEFAULT_STARTUP_BUDGET,
+                          top: int = 10) -> str:
+    """Formats summary of import times with the slowest top level imports"""
+    stats = get_startup_stats(entries)
+    lines = [f"Startup imports: {stats['total_ms']:.1f} ms of {budget:.0f} ms budget, "
+             f"{stats['modules']} modules"]
+    slowest = sorted((entry for entry in entries if entry.depth <= 1),
+                     key=lambda entry: entry.cumulative_ms, reverse=True)
+    for entry in slowest[:top]:
+        lines.append(f"  {entry.cumulative_ms:8.1f} ms  {'  ' * entry.depth}{entry.module}")
+    if stats['eager']:
+        lines.append(f"Imported at startup but should be lazy: {', '.join(stats['eager'])}")
+    return '\n'.join(lines)
+
+def check_startup(entries: List[ImportTime], budget: float = DEFAULT_STARTUP_BUDGET) -> bool:
+    """Checks that startup fits the budget and imports no lazy module"""
+    stats = get_startup_stats(entries)
+    return stats['total_ms'] <= budget and not stats['eager']
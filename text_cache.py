@@ -0,0 +1,273 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import logging
+from collections import OrderedDict
+from PIL import Image, ImageChops, ImageDraw
+from typing import Dict, Any, List, Optional, Tuple
+
+from frame_canvas import rotate_mask
+
+DEFAULT_METRICS_CACHE_SIZE = 1024
+DEFAULT_SPRITE_CACHE_SIZE = 256
+# Characters of changing values which are composed from single glyph sprites
+GLYPH_CHARS = frozenset('0123456789.,-+$%')
+# Texts about as long as drawn values which together contain every ordered pair of glyph
+# characters, so that kerning or subpixel positioning of any pair shows up
+_GLYPH_SEQUENCE = ''.join(first + ''.join(first + second for second in sorted(GLYPH_CHARS)[index + 1:])
+                          for index, first in enumerate(sorted(GLYPH_CHARS))) + min(GLYPH_CHARS)
+GLYPH_SAMPLES = [_GLYPH_SEQUENCE[start:start + 9] for start in range(0, len(_GLYPH_SEQUENCE) - 1, 8)]
+
+# (font, fontmode): whether glyphs composed side by side equal ImageDraw.text, kept for the
+# process like the fonts shared by renderers
+_glyph_fonts: Dict[Tuple[Any, str], bool] = {}
+# Sprites are rasterized with extra border so that no ink is clipped
+SPRITE_PADDING = 4
+
+class LRUCache:
+    """Bounded mapping which evicts least recently used entries and counts hits"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: Any, value: Any):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+class Sprite:
+    """Pre-rasterized text mask and its offset from the text origin"""
+    __slots__ = ('mask', 'offset_x', 'offset_y', 'rotated')
+
+    def __init__(self, mask: Optional[Image.Image], offset_x: int, offset_y: int):
+        self.mask = mask
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+        self.rotated = {0: mask}
+
+    def get_mask(self, rotation: int) -> Image.Image:
+        """Returns mask rotated to panel orientation, rotating it only once"""
+        mask = self.rotated.get(rotation)
+        if mask is None:
+            mask = rotate_mask(self.mask, rotation)
+            self.rotated[rotation] = mask
+        return mask
+
+def rasterize_text(font: Any, text: str, fontmode: str = 'L') -> Sprite:
+    """Rasterizes text into mask equal to the one ImageDraw.text would draw"""
+    left, top, right, bottom = font.getbbox(text)
+    origin_x = SPRITE_PADDING - left
+    origin_y = SPRITE_PADDING - top
+    canvas = Image.new('L', (right - left + 2 * SPRITE_PADDING, bottom - top + 2 * SPRITE_PADDING), 0)
+    draw = ImageDraw.Draw(canvas)
+    draw.fontmode = fontmode
+    draw.text((origin_x, origin_y), text, font=font, fill=255)
+
+    ink_box = canvas.getbbox()
+    if ink_box is None:
+        return Sprite(None, 0, 0)
+    return Sprite(canvas.crop(ink_box), ink_box[0] - origin_x, ink_box[1] - origin_y)
+
+def merge_sprites(pieces: List[Tuple[int, Sprite]]) -> Sprite:
+    """Merges sprites placed at pen offsets into one sprite, as drawing them one by one would"""
+    if not pieces:
+        return Sprite(None, 0, 0)
+    left = min(dx + sprite.offset_x for dx, sprite in pieces)
+    top = min(sprite.offset_y for _, sprite in pieces)
+    right = max(dx + sprite.offset_x + sprite.mask.width for dx, sprite in pieces)
+    bottom = max(sprite.offset_y + sprite.mask.height for _, sprite in pieces)
+    canvas = Image.new('L', (right - left, bottom - top), 0)
+    for dx, sprite in pieces:
+        x, y = dx + sprite.offset_x - left, sprite.offset_y - top
+        box = (x, y, x + sprite.mask.width, y + sprite.mask.height)
+        canvas.paste(ImageChops.lighter(canvas.crop(box), sprite.mask), box)
+    return Sprite(canvas, left, top)
+
+class TextCache:
+    """Caches text metrics and pre-rasterized text sprites.
+    Static labels are kept as whole sprites, values are composed from glyph sprites."""
+
+    def __init__(self, metrics_size: int = DEFAULT_METRICS_CACHE_SIZE,
+                 sprite_size: int = DEFAULT_SPRITE_CACHE_SIZE):
+        self.metrics = LRUCache(metrics_size)
+        self.sprites = LRUCache(sprite_size)
+        self.layouts = LRUCache(sprite_size)
+        self.glyphs: Dict[Tuple[Any, str, str], Tuple[float, Sprite]] = {}
+        self.glyph_hits = 0
+        self.glyph_misses = 0
+
+    def clear(self):
+        """Drops all cached metrics and sprites, for example when fonts are reloaded"""
+        self.metrics.clear()
+        self.sprites.clear()
+        self.layouts.clear()
+        self.glyphs.clear()
+
+    def get_text_width(self, font: Any, text: str) -> int:
+        """Measures width of text ink"""
+        key = (font, text)
+        width = self.metrics.get(key)
+        if width is None:
+            try:
+                bbox = font.getbbox(text)
+                width = bbox[2] - bbox[0]
+            except AttributeError:
+                width = font.getsize(text)[0]
+            self.metrics.put(key, width)
+        return width
+
+    def get_advance(self, font: Any, text: str) -> float:
+        """Measures horizontal pen advance of text"""
+        key = (font, text, 'advance')
+        advance = self.metrics.get(key)
+        if advance is None:
+            advance = font.getlength(text)
+            self.metrics.put(key, advance)
+        return advance
+
+    def get_sprite(self, font: Any, text: str, fontmode: str = 'L') -> Sprite:
+        """Returns sprite of whole text"""
+        key = (font, text, fontmode)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = rasterize_text(font, text, fontmode)
+            self.sprites.put(key, sprite)
+        return sprite
+
+    def get_glyph(self, font: Any, char: str, fontmode: str = 'L') -> Tuple[float, Sprite]:
+        """Returns advance and sprite of single character"""
+        key = (font, char, fontmode)
+        glyph = self.glyphs.get(key)
+        if glyph is None:
+            self.glyph_misses += 1
+            glyph = (font.getlength(char), rasterize_text(font, char, fontmode))
+            self.glyphs[key] = glyph
+        else:
+            self.glyph_hits += 1
+        return glyph
+
+    def add_glyph(self, font: Any, char: str, fontmode: str, advance: float, sprite: Sprite):
+        """Adds glyph rasterized elsewhere, like one loaded from glyph atlas"""
+        self.glyphs[(font, char, fontmode)] = (advance, sprite)
+
+    def glyphs_match(self, font: Any, fontmode: str = 'L') -> bool:
+        """Checks once per font if texts composed from glyphs are pixel-identical to texts
+        drawn whole. Fonts with kerning or subpixel positioning of glyphs draw values whole."""
+        key = (font, fontmode)
+        match = _glyph_fonts.get(key)
+        if match is None:
+            match = True
+            for text in GLYPH_SAMPLES:
+                composed = merge_sprites(self._compose_glyphs(font, text, 0.0, fontmode))
+                whole = rasterize_text(font, text, fontmode)
+                if ((composed.offset_x, composed.offset_y) != (whole.offset_x, whole.offset_y)
+                        or composed.mask.tobytes() != whole.mask.tobytes()):
+                    logging.info(f"Glyphs of font {getattr(font, 'path', font)}:{getattr(font, 'size', '')} "
+                                 f"do not line up in {text!r}, values are drawn as whole texts")
+                    match = False
+                    break
+            _glyph_fonts[key] = match
+        return match
+
+    def get_glyphs_match(self, font: Any, fontmode: str) -> Optional[bool]:
+        """Returns result of glyphs_match, None if font was not checked yet"""
+        return _glyph_fonts.get((font, fontmode))
+
+    def set_glyphs_match(self, font: Any, fontmode: str, match: bool):
+        """Sets result of glyphs_match checked elsewhere, like one loaded from glyph atlas"""
+        _glyph_fonts[(font, fontmode)] = match
+
+    def add_sprite(self, font: Any, text: str, fontmode: str, sprite: Sprite, advance: float):
+        """Adds text sprite rasterized elsewhere together with its advance"""
+        self.sprites.put((font, text, fontmode), sprite)
+        self.metrics.put((font, text, 'advance'), advance)
+
+    def get_font_sprites(self, font: Any, fontmode: str) -> Tuple[Dict[str, Tuple[float, Sprite]],
+                                                                   Dict[str, Tuple[float, Sprite]]]:
+        """Returns glyphs and text sprites of font with their advances"""
+        glyphs = {char: glyph for (glyph_font, char, glyph_mode), glyph in self.glyphs.items()
+                  if glyph_font is font and glyph_mode == fontmode}
+        texts = {text: (self.get_advance(font, text), sprite)
+                 for (sprite_font, text, sprite_mode), sprite in list(self.sprites.entries.items())
+                 if sprite_font is font and sprite_mode == fontmode}
+        return glyphs, texts
+
+    def warm_up(self, font: Any, labels: List[str], fontmode: str = 'L'):
+        """Rasterizes static labels and glyphs of font ahead of first frame"""
+        for label in labels:
+            if label:
+                self.get_sprite(font, label, fontmode)
+                self.get_advance(font, label)
+        for char in GLYPH_CHARS:
+            self.get_glyph(font, char, fontmode)
+
+    def _compose_glyphs(self, font: Any, text: str, pen_x: float,
+                        fontmode: str) -> List[Tuple[int, Sprite]]:
+        """Places glyph sprites of text side by side starting at pen_x"""
+        pieces = []
+        for char in text:
+            advance, glyph = self.get_glyph(font, char, fontmode)
+            if glyph.mask is not None:
+                pieces.append((int(round(pen_x)), glyph))
+            pen_x += advance
+        return pieces
+
+    def _compose(self, font: Any, text: str, static_prefix: str,
+                 fontmode: str) -> List[Tuple[int, Sprite]]:
+        """Splits text into static prefix sprite, glyph sprites and sprite of the rest"""
+        pieces = []
+        pen_x = 0.0
+        rest = text
+        if static_prefix and text.startswith(static_prefix) and len(text) > len(static_prefix):
+            pieces.append((0, self.get_sprite(font, static_prefix, fontmode)))
+            pen_x = self.get_advance(font, static_prefix)
+            rest = text[len(static_prefix):]
+
+        if all(char in GLYPH_CHARS for char in rest) and self.glyphs_match(font, fontmode):
+            pieces.extend(self._compose_glyphs(font, rest, pen_x, fontmode))
+        else:
+            pieces.append((int(round(pen_x)), self.get_sprite(font, rest, fontmode)))
+
+        return [(dx, sprite) for dx, sprite in pieces if sprite.mask is not None]
+
+    def get_text_sprites(self, font: Any, text: str, static_prefix: str = '',
+                         fontmode: str = 'L') -> List[Tuple[int, Sprite]]:
+        """Returns sprites making up text with their pen offsets from text origin"""
+        key = (font, text, static_prefix, fontmode)
+        pieces = self.layouts.get(key)
+        if pieces is None:
+            pieces = self._compose(font, text, static_prefix, fontmode)
+            self.layouts.put(key, pieces)
+        return pieces
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Returns hit and miss counters of all caches"""
+        return {
+            'metrics': self.metrics.get_stats(),
+            'sprites': self.sprites.get_stats(),
+            'layouts': self.layouts.get_stats(),
+            'glyphs': {'size': len(self.glyphs), 'hits': self.glyph_hits, 'misses': self.glyph_misses}
+        }
+
+    def format_stats(self) -> str:
+        """Formats cache counters for logging"""
+        return ', '.join(f"{name} {stats['hits']}/{stats['hits'] + stats['misses']} hits ({stats['size']} cached)"
+                         for name, stats in self.get_stats().items())